@@ -1,6 +1,7 @@
 # config.py
 
 import logging
+import os
 from pathlib import Path
 
 # 1. إعدادات المسارات الأساسية (Paths)
@@ -30,6 +31,17 @@ MOVE_THRESHOLD = 0.00005
 # (اختياري) فترة الحفظ إن أردتِ استخدامها بدل رقم ثابت في main.py
 SAVE_INTERVAL = 5
 
+# خدمة قراءة GPS في الخلفية (services/gps_ingestor.py)
+# النقطة تُحفظ فقط إذا تحرك الجهاز MOVE_THRESHOLD_METERS ومرت SAVE_INTERVAL ثانية،
+# أو تغيرت حالة المحمية (دخول / خروج)، أو مرت GPS_HEARTBEAT_SECONDS بدون حفظ (الجهاز واقف)
+GPS_INGEST_ENABLED = False
+GPS_SIMULATE = True            # False → قراءة NMEA من SERIAL_PORT (يحتاج pyserial)
+GPS_DEVICE_ID = None           # officer_id المسجل مع نقاط هذا الجهاز
+MOVE_THRESHOLD_METERS = 5.0
+GPS_HEARTBEAT_SECONDS = 60
+GPS_BATCH_SIZE = 20            # الكتابة في officer_tracking دفعة واحدة
+GPS_FLUSH_SECONDS = 10
+
 # مسار صوت التنبيه (مرن داخل مجلد المشروع)
 ALERT_SOUND = str(BASE_DIR / "app/gps_alert.mp3")
 
@@ -47,6 +59,112 @@ DB_CONFIG = {
 # موديل الـ Embeddings للبحث في الـ PDF
 EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
 
+# Backend الـ Embeddings: "torch" (HuggingFaceEmbeddings) أو "onnx" (int8 عبر onnxruntime)
+# onnx: يُصدَّر الموديل مرة واحدة إلى ONNX_MODEL_DIR ثم يعمل بدون torch
+EMBEDDING_BACKEND = "torch"
+ONNX_MODEL_DIR = MODELS_DIR / "onnx"
+ONNX_INTRA_OP_THREADS = 4
+
+# كاش الـ Embeddings على القرص (LRU بحد أقصى لعدد المتجهات)
+EMBEDDING_CACHE_DIR = VECTORSTORE_DIR / "embedding_cache"
+EMBEDDING_CACHE_MAX_ENTRIES = 50000
+
+# تجميع البحث الدلالي للطلبات المتزامنة → services/retrieval_batcher.py
+# نافذة انتظار قصيرة ثم embeddings + index.search واحد للدفعة كلها
+RETRIEVAL_BATCH_ENABLED = True
+RETRIEVAL_BATCH_WINDOW_MS = 4
+RETRIEVAL_BATCH_MAX = 32
+
+# سياسة فهرس FAISS لكل PDF: "flat" | "hnsw" | "ivfpq" | "sq8"
+# مثال: PDF_INDEX_POLICY = {"protected_areas_rules": "sq8"}
+DEFAULT_INDEX_POLICY = "flat"
+PDF_INDEX_POLICY = {}
+
+# الإدخال الجماعي (ingest.py): حجم دفعة الـ Embeddings ومجلد الـ shards المؤقت
+INGEST_BATCH_SIZE = 64
+INGEST_WORK_DIR = VECTORSTORE_DIR / "ingest_shards"
+
+# كاش الإجابات (تطابق تام + سؤال شبه مكرر بنفس السياق المسترجع)
+# ANSWER_CACHE_PATH = None للعمل في الذاكرة فقط
+ANSWER_CACHE_MAX_ENTRIES = 500
+ANSWER_CACHE_TTL_SECONDS = 24 * 3600
+ANSWER_CACHE_SIMILARITY = 0.97
+ANSWER_CACHE_PATH = VECTORSTORE_DIR / "answer_cache.sqlite3"
+
+# الموديل اللغوي (Ollama)
+OLLAMA_BASE_URL = "http://127.0.0.1:11434"
+LLM_MODEL = "qwen2.5:7b-instruct"
+LLM_NUM_THREAD = 8
+LLM_OPTIONS = {
+    "temperature": 0,
+    "num_ctx": 4096,
+    "repeat_penalty": 1.1,
+    "num_thread": LLM_NUM_THREAD,
+}
+
+# تزامن طلبات الـ LLM: كل طلب يأخذ num_thread نواة، فالأكثر من ذلك يتقاسم نفس الأنوية
+# الطلبات الزائدة تنتظر في طابور FIFO (وتُرفض إذا امتلأ أو طال الانتظار)
+LLM_MAX_CONCURRENCY = max(1, (os.cpu_count() or LLM_NUM_THREAD) // LLM_NUM_THREAD)
+LLM_MAX_QUEUE = 32
+LLM_QUEUE_TIMEOUT_SECONDS = 90
+LLM_REQUEST_TIMEOUT_SECONDS = 180
+
+# Cascade: النوايا الخفيفة تذهب للموديل الصغير أولاً، ولا تُصعَّد للموديل الكبير
+# إلا إذا فشلت إجابته في التحقق (فارغة / متحفظة / بصيغة خاطئة)
+# LLM_CASCADE_ENABLED = False → كل الأسئلة على LLM_MODEL مباشرة
+LLM_CASCADE_ENABLED = True
+LLM_SMALL_MODEL = "qwen2.5:1.5b"
+LLM_CASCADE_INTENTS = {"permission", "general"}
+LLM_CASCADE_MAX_QUESTION_WORDS = 12  # أسئلة general الأطول تذهب للكبير مباشرة
+
+# ميزانية الـ Prompt (بـ tokenizer الموديل) لكل نية سؤال:
+# توكنات محجوزة للإجابة من num_ctx + حد أقصى لتوكنات السياق المسترجع
+# الـ tokenizer يُقرأ من LLM_TOKENIZER_PATH أثناء التحميل في الخلفية (services/warmup.py)؛
+# إن لم يوجد الملف يُنزّل مرة واحدة من Hugging Face (LLM_TOKENIZER) ويُحفظ فيه
+# (على جهاز بدون إنترنت: انسخ tokenizer.json للموديل إلى LLM_TOKENIZER_PATH)
+LLM_TOKENIZER = "Qwen/Qwen2.5-7B-Instruct"
+LLM_TOKENIZER_PATH = MODELS_DIR / "tokenizer" / "qwen2.5-tokenizer.json"
+LLM_OUTPUT_RESERVE = {"penalty": 256, "permission": 160, "general": 512}
+PROMPT_CONTEXT_BUDGET = {"penalty": 1800, "permission": 1400, "general": 2200}
+
+# توليد مقيد بصيغة JSON (Ollama format) لأسئلة penalty و permission → services/structured_output.py
+# الحد الأقصى لتوكنات الإجابة = LLM_OUTPUT_RESERVE، والنص الحر يتوقف عند LLM_STOP_SEQUENCES
+LLM_STRUCTURED_OUTPUT = True
+LLM_STOP_SEQUENCES = {
+    "penalty": ["\n\nالمخالفة:", "\n---"],   # مخالفة ثانية = دمج ممنوع في البرومبت
+    "permission": ["\n\nسؤال المستخدم", "\n---"],
+    "general": ["\n\nسؤال المستخدم", "\nالسياق المسترجع:"],
+}
+
+# Geofence في الذاكرة (services/geofence.py): فحص تغيّر جدول protected_zones كل N ثانية
+GEOFENCE_REFRESH_SECONDS = 30
+
+# الموقع الحالي لكل جهاز (services/location_store.py) بدل app.state.last_location:
+# الجهاز يرسل X-Device-Id (أو ?device_id=)، وبدونه يُستخدم DEFAULT_DEVICE_ID
+# LOCATION_STORE_PATH = None → في الذاكرة فقط (بدون مشاركة بين workers)
+DEFAULT_DEVICE_ID = "kiosk"
+LOCATION_SHARDS = 16
+LOCATION_TTL_SECONDS = 300          # موقع أقدم من ذلك = غير معروف
+LOCATION_REFRESH_SECONDS = 2        # إعادة القراءة من القرص (تحديثات workers أخرى)
+LOCATION_STORE_PATH = VECTORSTORE_DIR / "locations.sqlite3"
+
+# أحداث الدخول / الخروج (services/geofence_events.py → WebSocket /llm/geofence/events)
+# hysteresis: الخروج لا يُحتسب إلا بعد الابتعاد عن حدود المحمية أكثر من N متر
+# dwell: الحالة الجديدة يجب أن تستمر N ثانية قبل إرسال الحدث (منع التذبذب على الحدود)
+GEOFENCE_HYSTERESIS_METERS = 15
+GEOFENCE_DWELL_SECONDS = 3
+GEOFENCE_ALERT_EVENTS = {"enter", "zone_changed"}
+GEOFENCE_ALERT_MAX_AGE_SECONDS = 30   # نقاط قديمة (مسار مرفوع لاحقاً) لا تشغّل التنبيه
+GEOFENCE_EVENTS_QUEUE = 100           # لكل مشترك، الأقدم يُحذف إذا تأخر المشترك
+
+# /llm/add-points: أقصى عدد نقاط في طلب واحد (مسار GPS مرفوع دفعة واحدة)
+ADD_POINTS_MAX_BATCH = 5000
+# وأقصى حجم للطلب، يُرفض قبل قراءة الجسم كاملاً (حوالي 400 بايت للنقطة مع الوقت والمعرفات)
+ADD_POINTS_MAX_BYTES = 2 * 1024 * 1024
+
+# الكلمات المفتاحية (نية السؤال، وسوم المخالفات، مستوى الحماية ...) → services/lexicon.py
+LEXICON_PATH = BASE_DIR / "lexicon.json"
+
 # إعدادات التعرف على الكلام (Whisper)
 WHISPER_MODEL_SIZE = "small"   # أو "base" أو "medium"
 WHISPER_DEVICE = "cpu"         # "cuda" لو عندك كرت شاشة
@@ -0,0 +1,207 @@
+# ingest.py
+# ======================================================
+# إدخال جماعي لمجموعة كبيرة من ملفات PDF (لوائح المحميات والتعاميم)
+# في مخزن FAISS واحد (corpus) خارج تشغيل التطبيق:
+#
+#   python ingest.py data/bylaws --name bylaws --workers 4
+#
+# المراحل:
+# 1) توزيع الملفات على shards متوازنة الحجم (shard لكل عامل)
+# 2) كل عامل (عملية مستقلة): قراءة صفحة بصفحة + توحيد + تقسيم
+#    + Embeddings على دفعات + فهرس FAISS خاص بالـ shard
+# 3) دمج الـ shards في مخزن واحد بنفس صيغة مخازن التطبيق (mmap + docstore كسول)
+#
+# الذاكرة محدودة: العامل لا يحمل إلا صفحة واحدة + دفعة chunks واحدة
+# التطبيق يسجّل المجموعة تلقائياً عند التشغيل (warmup)
+# ======================================================
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from config import INGEST_BATCH_SIZE, INGEST_WORK_DIR
+
+
+logging.basicConfig(level=logging.INFO)
+
+
+# ======================================================
+# توزيع الملفات على الـ shards (الأكبر أولاً على الأقل حملاً)
+# ======================================================
+def plan_shards(pdf_paths, workers: int):
+    shards = [[] for _ in range(max(1, workers))]
+    loads = [0] * len(shards)
+    for pdf in sorted(pdf_paths, key=lambda p: p.stat().st_size, reverse=True):
+        i = loads.index(min(loads))
+        shards[i].append(pdf)
+        loads[i] += pdf.stat().st_size
+    return [s for s in shards if s]
+
+
+# ======================================================
+# العامل
+# ======================================================
+def _init_worker(threads: int):
+    # كل عامل يأخذ حصته من الأنوية فقط (بدون تنافس خيوط torch/BLAS)
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def _flush(batch, embeddings, index, out):
+    import faiss
+    import numpy as np
+
+    vectors = np.asarray(
+        embeddings.embed_documents([c.page_content for c in batch]),
+        dtype=np.float32
+    )
+    if index is None:
+        index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+
+    for c in batch:
+        out.write(json.dumps(
+            {"id": str(uuid.uuid4()), "text": c.page_content, "metadata": c.metadata},
+            ensure_ascii=False
+        ) + "\n")
+    return index
+
+
+def ingest_shard(shard_id: int, pdf_paths, shard_dir: str, batch_size: int):
+    import faiss
+    from services.vectorstore_service import (
+        VectorStoreService,
+        SHARD_INDEX_FILE,
+        SHARD_CHUNKS_FILE,
+    )
+
+    service = VectorStoreService()
+    embeddings = service.load_base_embeddings()
+
+    shard_dir = Path(shard_dir)
+    shard_dir.mkdir(parents=True, exist_ok=True)
+
+    index = None
+    sources = {}
+    start = time.perf_counter()
+
+    with open(shard_dir / SHARD_CHUNKS_FILE, "w", encoding="utf-8") as out:
+        batch = []
+        for pdf in pdf_paths:
+            pdf = Path(pdf)
+            count = 0
+            try:
+                for chunk in service.stream_chunks(str(pdf), pdf.stem):
+                    chunk.metadata["source_file"] = pdf.name
+                    batch.append(chunk)
+                    count += 1
+                    if len(batch) >= batch_size:
+                        index = _flush(batch, embeddings, index, out)
+                        batch = []
+            except Exception as e:
+                logging.error(f"❌ [shard {shard_id}] فشل قراءة {pdf.name}: {e}")
+
+            sources[pdf.stem] = {"hash": service._file_hash(str(pdf)), "chunks": count}
+
+        if batch:
+            index = _flush(batch, embeddings, index, out)
+
+    if index is not None:
+        faiss.write_index(index, str(shard_dir / SHARD_INDEX_FILE))
+
+    return {
+        "shard": shard_id,
+        "dir": str(shard_dir),
+        "chunks": index.ntotal if index is not None else 0,
+        "embedding_id": service.embedding_id,
+        "seconds": round(time.perf_counter() - start, 1),
+        "sources": sources,
+    }
+
+
+# ======================================================
+# التشغيل
+# ======================================================
+def run(src: Path, name: str, workers: int, batch_size: int):
+    pdf_paths = sorted(src.rglob("*.pdf")) if src.is_dir() else [src]
+    if not pdf_paths:
+        logging.error(f"❌ لا توجد ملفات PDF في: {src}")
+        return 1
+
+    shards = plan_shards(pdf_paths, workers)
+    work_dir = INGEST_WORK_DIR / name
+    if work_dir.exists():
+        shutil.rmtree(work_dir)
+
+    threads = max(1, (os.cpu_count() or 1) // len(shards))
+    logging.info(
+        f"📚 إدخال {len(pdf_paths)} ملف في {len(shards)} shard "
+        f"({threads} خيط لكل عامل، دفعة {batch_size})"
+    )
+
+    start = time.perf_counter()
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=len(shards),
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(threads,),
+    ) as pool:
+        futures = [
+            pool.submit(ingest_shard, i, [str(p) for p in shard], str(work_dir / f"shard_{i:03d}"), batch_size)
+            for i, shard in enumerate(shards)
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            logging.info(
+                f"🧩 shard {result['shard']}: {result['chunks']} chunk "
+                f"من {len(result['sources'])} ملف ({result['seconds']} ث)"
+            )
+
+    results.sort(key=lambda r: r["shard"])
+    sources = {}
+    for result in results:
+        sources.update(result["sources"])
+
+    from services.vectorstore_service import vectorstore_service
+
+    # كل العمّال يجب أن يستخدموا نفس الـ backend (لو فشل ONNX عند أحدهم مثلاً)
+    embedding_ids = {r["embedding_id"] for r in results}
+    if len(embedding_ids) != 1:
+        logging.error(f"❌ العمّال استخدموا Embeddings مختلفة: {sorted(embedding_ids)}")
+        return 1
+    vectorstore_service.embedding_id = embedding_ids.pop()
+
+    total = vectorstore_service.write_corpus(name, [r["dir"] for r in results], sources)
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    logging.info(f"✅ مجموعة {name}: {total} chunk في {time.perf_counter() - start:.1f} ث")
+    return 0 if total else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="إدخال جماعي لملفات PDF في مخزن FAISS واحد")
+    parser.add_argument("src", type=Path, help="مجلد ملفات PDF (يشمل المجلدات الفرعية) أو ملف واحد")
+    parser.add_argument("--name", required=True, help="اسم المجموعة (يُستخدم كاسم الـ retriever)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    args = parser.parse_args()
+
+    return run(args.src, args.name, args.workers, args.batch_size)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
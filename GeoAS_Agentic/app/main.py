@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
@@ -7,23 +8,47 @@ from contextlib import asynccontextmanager
 from pathlib import Path
 
 from routers.chat import router
-from services.retriever_service import register_pdf
+from routers.health import router as health_router
+from services.readiness import readiness
+from services.warmup import warm_up
+from services.llm_client import llm_client
 from services.db import Database
-from config import DATA_DIR, DB_CONFIG
+from services.geofence import geofence
+from services.gps_ingestor import gps_ingestor
+from services.location_store import location_store
+from config import DATA_DIR, DB_CONFIG, GPS_INGEST_ENABLED
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logging.info("🚀 بدء تشغيل التطبيق...")
 
-    for pdf in DATA_DIR.glob("*.pdf"):
-        register_pdf(pdf.stem, str(pdf))
-
+    readiness.loading("database")
     app.state.db_gps = Database(DB_CONFIG)
+    readiness.ready("database")
     logging.info("✅ تم الاتصال بقاعدة البيانات")
 
+    # 🗺️ المحميات في الذاكرة (STRtree) + مراقبة تغيّرها
+    await asyncio.to_thread(geofence.start, app.state.db_gps)
+    app.state.geofence_task = asyncio.create_task(geofence.watch(app.state.db_gps))
+
+    # 🛰️ قراءة GPS الجهاز في الخلفية (حفظ النقاط المتحركة فقط، دفعات)
+    if GPS_INGEST_ENABLED:
+        gps_ingestor.start(app.state.db_gps)
+
+    # ⏳ الـ Embeddings و FAISS و Whisper و LLM تُحمّل في الخلفية
+    # (المنفذ يُفتح فوراً، والتقدم متاح عبر /healthz و /readyz)
+    app.state.warmup_task = asyncio.create_task(warm_up(DATA_DIR.glob("*.pdf")))
+
     yield
 
+    if not app.state.warmup_task.done():
+        app.state.warmup_task.cancel()
+    app.state.geofence_task.cancel()
+    await gps_ingestor.stop()
+    await asyncio.to_thread(location_store.close)
+
+    await llm_client.aclose()
     app.state.db_gps.close()
     logging.info("🔒 تم إغلاق اتصال قاعدة البيانات")
 
@@ -40,6 +65,7 @@ app.add_middleware(
 
 # 1️⃣ API أولًا (مهم جدًا)
 app.include_router(router)
+app.include_router(health_router)
 
 # 2️⃣ ملفات static
 app.mount("/static", StaticFiles(directory="static"), name="static")
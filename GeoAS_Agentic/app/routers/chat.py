@@ -1,15 +1,23 @@
 # routers/chat.py
-from fastapi import APIRouter, Request, Form, BackgroundTasks, UploadFile, File
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, Request, Form, BackgroundTasks, UploadFile, File, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from starlette.background import BackgroundTask
 from fastapi.templating import Jinja2Templates
 from typing import Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, ValidationError
+from datetime import datetime, timezone
 import httpx
 import json
+import asyncio
 
 from services.audio_utils import listen_to_mic, speak_text
 from services.retriever_service import retrievers
 from services.db import Database
+from services.geofence import geofence
+from services.geofence_events import geofence_events, event_hub
+from services.location_store import location_store, request_device_id
+from config import ADD_POINTS_MAX_BATCH, ADD_POINTS_MAX_BYTES
 
 # 🧠 Agents
 from services.agents.agent_router import AgentRouter
@@ -106,8 +114,14 @@ async def chat_page(request: Request):
 async def map_data(request: Request):
     db: Database = request.app.state.db_gps
 
-    zones = db.get_zones_geojson()
-    points = db.get_points_geojson()
+    # المحميات والتحقق من النقاط من الـ Geofence في الذاكرة (PostGIS فقط إن لم يُحمّل)
+    if geofence.ready:
+        zones = geofence.zones_geojson()
+        points = await asyncio.to_thread(db.get_points_geojson, 500, False)
+        geofence.annotate_points(points)
+    else:
+        zones = db.get_zones_geojson()
+        points = db.get_points_geojson()
 
     for feature in points.get("features", []):
         props = feature.get("properties", {})
@@ -125,29 +139,29 @@ async def map_data(request: Request):
 class PointIn(BaseModel):
     lat: float
     lng: float
+    device_id: Optional[str] = None
 
 @router.post("/add-point")
 async def add_point(point: PointIn, request: Request):
     db: Database = request.app.state.db_gps
+    device_id = point.device_id or request_device_id(request)
 
     inside = False
     zone_name = None
     protection_level = None
 
-    with db.conn.cursor() as cur:
-        cur.execute("""
-            SELECT name, protection_level
-            FROM protected_zones
-            WHERE ST_Contains(
-                geom,
-                ST_SetSRID(ST_MakePoint(%s, %s), 4326)
-            );
-        """, (point.lng, point.lat))
-
-        rows = cur.fetchall()
-        if rows:
+    # ⚡ Geofence في الذاكرة (STRtree) بدل ST_Contains في القاعدة لكل نقطة
+    if geofence.ready:
+        zone = geofence.lookup(point.lat, point.lng)
+        if zone:
+            inside = True
+            zone_name, protection_level = zone["name"], zone["protection_level"]
+        geofence_events.observe(device_id, point.lat, point.lng, zone)
+    else:
+        row = db.find_zone(point.lat, point.lng)
+        if row:
             inside = True
-            zone_name, protection_level = rows[0]
+            zone_name, protection_level = row
 
     db.save_point(
         lat=point.lat,
@@ -156,20 +170,166 @@ async def add_point(point: PointIn, request: Request):
         officer_id=None
     )
 
-    request.app.state.last_location = {
+    location_store.put(device_id, inside, zone_name, protection_level)
+
+    return {
+        "status": "saved",
         "inside": inside,
         "zone_name": zone_name,
         "protection_level": protection_level
     }
 
+
+# batch add points route (JSON array أو NDJSON)
+
+class TrackPointIn(BaseModel):
+    lat: float = Field(ge=-90, le=90)
+    lng: float = Field(ge=-180, le=180)
+    timestamp: Optional[datetime] = None
+    officer_id: Optional[str] = None
+    device_id: Optional[str] = None
+
+
+def _utc_naive(ts: Optional[datetime]) -> datetime:
+    # نفس صيغة save_point: UTC بدون timezone
+    if ts is None:
+        return datetime.utcnow()
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def _too_many_points(max_points: int):
+    return HTTPException(status_code=413, detail=f"الحد الأقصى {max_points} نقطة في الطلب")
+
+
+async def _read_body(request: Request, max_bytes: int) -> bytes:
+    # Content-Length أولاً، ثم العد أثناء القراءة (chunked أو header غير صحيح)
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"حجم الطلب أكبر من {max_bytes} بايت")
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"حجم الطلب أكبر من {max_bytes} بايت")
+    return bytes(body)
+
+
+def _parse_track(body: bytes, content_type: str, max_points: int = ADD_POINTS_MAX_BATCH) -> list:
+    # عدد النقاط يُفحص قبل التحقق من كل نقطة (وقبل json.loads لكل سطر في NDJSON)
+    text = body.decode("utf-8")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        lines = [line for line in text.splitlines() if line.strip()]
+        if len(lines) > max_points:
+            raise _too_many_points(max_points)
+        items = [json.loads(line) for line in lines]
+    else:
+        items = json.loads(text)
+        if isinstance(items, dict):
+            items = items.get("points", [])
+    if not isinstance(items, list):
+        raise ValueError("المتوقع مصفوفة نقاط")
+    if len(items) > max_points:
+        raise _too_many_points(max_points)
+    return [TrackPointIn.model_validate(item) for item in items]
+
+
+@router.post("/add-points")
+async def add_points(request: Request):
+    db: Database = request.app.state.db_gps
+
+    body = await _read_body(request, ADD_POINTS_MAX_BYTES)
+    try:
+        points = _parse_track(body, request.headers.get("content-type", ""), ADD_POINTS_MAX_BATCH)
+    except (ValueError, ValidationError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    if not points:
+        return {"status": "saved", "count": 0, "inside": 0}
+
+    # ⚡ تحديد المحمية للدفعة كلها في تمريرة واحدة (STRtree + contains_xy)
+    coords = [(p.lat, p.lng) for p in points]
+    if geofence.ready:
+        zones = geofence.lookup_many(coords)
+    else:
+        rows = await asyncio.to_thread(lambda: [db.find_zone(lat, lng) for lat, lng in coords])
+        zones = [{"name": r[0], "protection_level": r[1]} if r else None for r in rows]
+
+    rows = [
+        (p.lat, p.lng, _utc_naive(p.timestamp), zone is not None, p.officer_id)
+        for p, zone in zip(points, zones)
+    ]
+    await asyncio.to_thread(db.save_points, rows)
+
+    # الجهاز صاحب كل نقطة: device_id ثم officer_id ثم جهاز الطلب نفسه
+    request_device = request_device_id(request)
+    devices = [p.device_id or p.officer_id or request_device for p in points]
+
+    # أحداث الدخول / الخروج بترتيب زمن النقاط (لكل جهاز)
+    if geofence.ready:
+        for i in sorted(range(len(rows)), key=lambda i: rows[i][2]):
+            lat, lng, ts = rows[i][:3]
+            geofence_events.observe(devices[i], lat, lng, zones[i], ts=ts.replace(tzinfo=timezone.utc).timestamp())
+
+    # الموقع الحالي لكل جهاز = أحدث نقطة له فقط (ولا يُستبدل بنقطة أقدم من الموقع الحالي)
+    newest = {}
+    for i, device_id in enumerate(devices):
+        if device_id not in newest or rows[i][2] >= rows[newest[device_id]][2]:
+            newest[device_id] = i
+    latest = {}
+    for device_id, i in newest.items():
+        zone = zones[i]
+        entry = location_store.put(
+            device_id,
+            zone is not None,
+            zone["name"] if zone else None,
+            zone["protection_level"] if zone else None,
+            timestamp=rows[i][2],
+            newer_only=True
+        )
+        latest[device_id] = {k: entry[k] for k in ("inside", "zone_name", "protection_level", "timestamp")}
+
     return {
         "status": "saved",
-        "inside": inside,
-        "zone_name": zone_name,
-        "protection_level": protection_level
+        "count": len(rows),
+        "inside": sum(1 for r in rows if r[3]),
+        "latest": latest
     }
 
 
+# geofence events (WebSocket): enter / exit / zone_changed بدل polling لـ /map-data
+
+@router.websocket("/geofence/events")
+async def geofence_events_ws(websocket: WebSocket):
+    await websocket.accept()
+    queue = event_hub.subscribe()
+    receive = get = None
+    try:
+        await websocket.send_json(jsonable_encoder({"type": "snapshot", "devices": geofence_events.states()}))
+
+        # القراءة من الـ socket مع انتظار الأحداث: قطع الاتصال يلغي الاشتراك فوراً
+        # (لا ننتظر الحدث التالي حتى نكتشفه)
+        receive = asyncio.create_task(websocket.receive())
+        get = asyncio.create_task(queue.get())
+        while True:
+            done, _ = await asyncio.wait({receive, get}, return_when=asyncio.FIRST_COMPLETED)
+            if get in done:
+                await websocket.send_json(jsonable_encoder(get.result()))
+                get = asyncio.create_task(queue.get())
+            if receive in done:
+                if receive.result()["type"] == "websocket.disconnect":
+                    break
+                receive = asyncio.create_task(websocket.receive())  # رسائل العميل تُهمل
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in (receive, get):
+            if task is not None:
+                task.cancel()
+        event_hub.unsubscribe(queue)
+
+
 # voice interaction route
 
 @router.post("/voice")
@@ -179,12 +339,12 @@ async def voice_interaction(
     query: Optional[str] = Form(None),
     use_voice: bool = Form(True)
 ):
-    user_query = query.strip() if query and query.strip() else listen_to_mic(timeout=5)
+    # الميكروفون والـ LLM لا يحجزان الـ event loop (الخريطة و GPS تبقى تعمل أثناء الانتظار)
+    user_query = query.strip() if query and query.strip() else await asyncio.to_thread(listen_to_mic, 5)
     if not user_query:
         return {"status": "no_speech"}
 
- 
-    result = agent_router.route_text(request, user_query)
+    result = await agent_router.aroute_text(request, user_query)
 
     response_text = result["response"]
     inside_geofence = result["inside_geofence"]
@@ -207,6 +367,56 @@ async def voice_interaction(
     }
 
 
+# voice interaction route (streaming over Server-Sent Events)
+# event: token → {"text": ...} جزء من الإجابة فور توليده
+# event: done  → نفس حقول /voice (الإجابة النهائية المعتمدة + المنطقة + النية + المصدر)
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/voice/stream")
+async def voice_interaction_stream(
+    request: Request,
+    query: Optional[str] = Form(None),
+    use_voice: bool = Form(True)
+):
+    user_query = query.strip() if query and query.strip() else await asyncio.to_thread(listen_to_mic, 5)
+    if not user_query:
+        return {"status": "no_speech"}
+
+    final = {}
+
+    async def events():
+        async for kind, payload in agent_router.route_text_stream(request, user_query):
+            if kind == "token":
+                yield _sse("token", {"text": payload})
+                continue
+
+            final.update(payload)
+            yield _sse("done", {
+                "status": "success",
+                "query": user_query,
+                "response": payload["response"],
+                "source": "protected" if payload["inside_geofence"] else "general",
+                "inside_geofence": payload["inside_geofence"],
+                "zone_name": payload["zone_name"],
+                "protection_level": payload["protection_level"],
+                "intent": payload["intent"],
+            })
+
+    def speak_final():
+        if use_voice and final.get("response"):
+            speak_text(final["response"])
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(speak_final),
+    )
+
+
 # VLM image analysis route
 
 VLM_API_URL = "http://127.0.0.1:9000/vlm/analyze"
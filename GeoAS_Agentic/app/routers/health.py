@@ -0,0 +1,74 @@
+# routers/health.py
+# ======================================================
+# /healthz : التطبيق يعمل (حتى أثناء التحميل) + حالة كل مكون
+# /readyz  : 200 فقط عندما تكون كل المكونات جاهزة، وإلا 503
+# /llm/queue: عمق طابور الـ LLM وأزمنة الانتظار (بدون تحميل الموديل)
+# /llm/cascade: زمن كل مستوى (صغير / كبير) ونسبة التصعيد وأسبابه
+# /rag/batcher: حجم دفعات البحث الدلالي وزمن الـ embeddings والبحث
+# /geofence: عدد المحميات في الذاكرة ووقت آخر تحميل
+# /geofence/reload: إعادة تحميل المحميات فوراً (بعد تعديل protected_zones)
+# /gps/ingestor: عدد قراءات GPS والمحفوظ منها والمهمل (debouncing)
+# /locations: عدد الأجهزة في مخزن المواقع ونسبة القراءة من الذاكرة
+# ======================================================
+import asyncio
+
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+from services.readiness import readiness
+from services.llm_client import llm_client
+from services import llm_cascade
+from services.retrieval_batcher import retrieval_batcher
+from services.geofence import geofence
+from services.geofence_events import geofence_events
+from services.gps_ingestor import gps_ingestor
+from services.location_store import location_store
+
+router = APIRouter()
+
+
+@router.get("/healthz")
+async def healthz():
+    return {"status": "ok", **readiness.snapshot()}
+
+
+@router.get("/readyz")
+async def readyz():
+    state = readiness.snapshot()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+
+@router.get("/llm/queue")
+async def llm_queue():
+    return llm_client.metrics()
+
+
+@router.get("/llm/cascade")
+async def llm_cascade_metrics():
+    return llm_cascade.metrics()
+
+
+@router.get("/rag/batcher")
+async def rag_batcher():
+    return retrieval_batcher.snapshot()
+
+
+@router.get("/geofence")
+async def geofence_status():
+    return {**geofence.snapshot(), "events": geofence_events.snapshot()}
+
+
+@router.post("/geofence/reload")
+async def geofence_reload(request: Request):
+    await asyncio.to_thread(geofence.load, request.app.state.db_gps)
+    return geofence.snapshot()
+
+
+@router.get("/gps/ingestor")
+async def gps_ingestor_status():
+    return gps_ingestor.snapshot()
+
+
+@router.get("/locations")
+async def locations_status():
+    return location_store.snapshot()
@@ -8,7 +8,6 @@ from services.agents.location_agent import LocationAgent
 from services.agents.permission_agent import PermissionAgent
 from services.agents.pdf_router_agent import PDFRouterAgent
 from services.agents.context_agent import prepend_location_context
-from services.retriever_service import retrievers  # ✅ مهم لتفعيل metadata
 
 
 class AgentRouter:
@@ -25,68 +24,106 @@ class AgentRouter:
         self.permission_agent = PermissionAgent()
         self.pdf_router = PDFRouterAgent()
 
-    def route_text(self, request: Request, query: str) -> Dict[str, Any]:
+    # ======================================================
+    # أجزاء مشتركة بين route_text و aroute_text و route_text_stream
+    # (الفرق الوحيد بينها طريقة استدعاء الـ Agent: handle / ahandle / stream)
+    # ======================================================
+    def _plan(self, request: Request, query: str) -> Dict[str, Any]:
         # --------------------------------------------------
         # 1️⃣ القرار المكاني
         # --------------------------------------------------
         location = self.location_agent.get_location(request)
-
         inside = location["inside"]
-        zone_name = location["zone_name"]
-        protection_level = location["protection_level"]
-
-
-        # --------------------------------------------------
-        # ✅ تفعيل metadata: تمرير مستوى الحماية للـ RAG
-        # --------------------------------------------------
-        retrievers["_current_protection_level"] = protection_level
 
-        # --------------------------------------------------
-        # 2️⃣ اختيار Agent الـ PDF المناسب
-        # --------------------------------------------------
-        pdf_agent = self.pdf_router.route(inside)
-
-        # --------------------------------------------------
-        # 3️⃣ تحديد نية السؤال
-        # --------------------------------------------------
-        intent = detect_intent(query)
+        return {
+            "inside": inside,
+            "zone_name": location["zone_name"],
+            "protection_level": location["protection_level"],
+            # 2️⃣ اختيار Agent الـ PDF المناسب
+            "pdf_agent": self.pdf_router.route(inside),
+            # 3️⃣ تحديد نية السؤال
+            "intent": detect_intent(query),
+        }
 
-        # --------------------------------------------------
-        # 4️⃣ تنفيذ الـ Agent المناسب
-        # --------------------------------------------------
-        if intent == "permission":
-            response, _ = self.permission_agent.handle(
+    def _dispatch(self, plan: Dict[str, Any], query: str, method: str):
+        """
+        4️⃣ تنفيذ الـ Agent المناسب
+        method: handle (نتيجة) / ahandle (coroutine) / stream (async generator)
+        """
+        if plan["intent"] == "permission":
+            return getattr(self.permission_agent, method)(
                 query=query,
-                pdf_agent=pdf_agent,
-                protection_level=protection_level
+                pdf_agent=plan["pdf_agent"],
+                protection_level=plan["protection_level"]
             )
-        else:
-            if inside:
-                response, _ = pdf_agent.handle(query, protection_level)
-            else:
-                response, _ = pdf_agent.handle(query)
 
-        # --------------------------------------------------
-        # 5️⃣ إضافة السياق المكاني (اختياري)
-        # --------------------------------------------------
-        if inside and zone_name and protection_level and response:
-            response = prepend_location_context(
-                response,
-                zone_name,
-                protection_level
-            )
+        handle = getattr(plan["pdf_agent"], method)
+        if plan["inside"]:
+            return handle(query, plan["protection_level"])
+        return handle(query)
+
+    @staticmethod
+    def _location_prefix(plan: Dict[str, Any]) -> str:
+        # 5️⃣ السياق المكاني (اختياري)
+        if plan["inside"] and plan["zone_name"] and plan["protection_level"]:
+            return prepend_location_context("", plan["zone_name"], plan["protection_level"])
+        return ""
+
+    def _result(self, plan: Dict[str, Any], response: str) -> Dict[str, Any]:
+        if response:
+            response = self._location_prefix(plan) + response
 
         # --------------------------------------------------
         # 6️⃣ إخراج موحد للواجهة
         # --------------------------------------------------
         return {
             "response": response or "لم يتم العثور على إجابة مناسبة.",
-            "inside_geofence": bool(inside),
-            "zone_name": zone_name,
-            "protection_level": protection_level,
-            "intent": intent,
+            "inside_geofence": bool(plan["inside"]),
+            "zone_name": plan["zone_name"],
+            "protection_level": plan["protection_level"],
+            "intent": plan["intent"],
         }
 
+    # ======================================================
+    # الواجهة
+    # ======================================================
+    def route_text(self, request: Request, query: str) -> Dict[str, Any]:
+        plan = self._plan(request, query)
+        response, _ = self._dispatch(plan, query, "handle")
+        return self._result(plan, response)
+
+    async def aroute_text(self, request: Request, query: str) -> Dict[str, Any]:
+        """
+        نفس route_text لمسارات الـ API: الـ LLM غير متزامن ويمر عبر الطابور
+        (باقي المسارات مثل الخريطة و GPS لا تنتظر التوليد)
+        """
+        plan = self._plan(request, query)
+        response, _ = await self._dispatch(plan, query, "ahandle")
+        return self._result(plan, response)
+
+    async def route_text_stream(self, request: Request, query: str):
+        """
+        نفس aroute_text لكن بالبث:
+        ("token", نص) ... ثم ("done", نفس قاموس route_text)
+        """
+        plan = self._plan(request, query)
+
+        # السياق المكاني يُرسل أولاً (مقدمة ثابتة قبل توكنات الموديل)
+        prefix = self._location_prefix(plan)
+
+        response = ""
+        prefix_sent = False
+        async for kind, payload in self._dispatch(plan, query, "stream"):
+            if kind == "token":
+                if prefix and not prefix_sent:
+                    prefix_sent = True
+                    yield "token", prefix
+                yield "token", payload
+            elif kind == "done":
+                response, _ = payload
+
+        yield "done", self._result(plan, response)
+
 
 # (اختياري للتأكد من التحميل)
 print("✅ AgentRouter loaded successfully")
\ No newline at end of file
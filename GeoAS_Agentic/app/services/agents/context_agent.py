@@ -2,26 +2,6 @@
 
 from typing import Optional
 
-def build_zone_aware_query(user_query: str, protection_level: Optional[str]) -> str:
-    level_map = {
-        "low": "المناطق ذات الحماية المنخفضة",
-        "medium": "المناطق ذات الحماية المتوسطة",
-        "high": "المناطق ذات الحماية العالية"
-    }
-
-    if not protection_level:
-        return user_query
-
-    section_name = level_map.get(str(protection_level).lower())
-    if not section_name:
-        return user_query
-
-    return (
-        f"أجب فقط بالاعتماد على قسم \"{section_name}\" من المرجع.\n\n"
-        f"السؤال: {user_query}"
-    )
-
-
 def prepend_location_context(
     response_text: str,
     zone_name: Optional[str],
@@ -3,13 +3,15 @@
 from fastapi import Request
 from typing import Dict, Any
 
+from services.location_store import location_store, request_device_id
+
 
 class LocationAgent:
     """
     Agent مسؤول فقط عن القرار المكاني.
     - لا يتعامل مع DB
     - لا يتعامل مع RAG
-    - يقرأ آخر موقع محفوظ في app.state.last_location
+    - يقرأ آخر موقع محفوظ للجهاز صاحب الطلب من location_store
     """
 
     def get_location(self, request: Request) -> Dict[str, Any]:
@@ -17,8 +19,8 @@ class LocationAgent:
         يرجّع حالة الموقع الحالية بنفس الصيغة المتوقعة في بقية النظام.
         """
 
-        # قراءة آخر موقع محفوظ (قد لا يكون موجود)
-        last_location = getattr(request.app.state, "last_location", None) or {}
+        # قراءة آخر موقع محفوظ لهذا الجهاز (قد لا يكون موجود أو انتهت صلاحيته)
+        last_location = location_store.get(request_device_id(request)) or {}
 
         return {
             "inside": bool(last_location.get("inside", False)),
@@ -1,8 +1,7 @@
 # services/agents/pdf_agents.py
 
 from typing import Optional, Tuple
-from services.rag_service import answer
-from services.agents.context_agent import build_zone_aware_query
+from services.rag_service import answer, aanswer, answer_stream
 
 # مفاتيح الـ PDF (نفس المستخدمة في المشروع)
 GENERAL_RULES_KEY = "مشروع اللائحة التنفيذية للمناطق المحمية"
@@ -13,7 +12,7 @@ class ProtectedAreasAgent:
     """
     Agent مختص فقط بالمحميات (داخل نطاق محمي).
     - يستخدم protected_areas_rules
-    - يقيّد السؤال حسب مستوى الحماية
+    - يقيّد البحث بقسم مستوى الحماية (بحث مفلتر، السؤال يبقى كما هو)
     """
 
     key = PROTECTED_RULES_KEY
@@ -24,8 +23,13 @@ class ProtectedAreasAgent:
         protection_level: Optional[str]
     ) -> Tuple[str, str]:
 
-        enriched_query = build_zone_aware_query(query, protection_level)
-        return answer(enriched_query, self.key)
+        return answer(query, self.key, protection_level=protection_level)
+
+    async def ahandle(self, query: str, protection_level: Optional[str]) -> Tuple[str, str]:
+        return await aanswer(query, self.key, protection_level=protection_level)
+
+    def stream(self, query: str, protection_level: Optional[str]):
+        return answer_stream(query, self.key, protection_level=protection_level)
 
 
 class GeneralLawAgent:
@@ -38,6 +42,12 @@ class GeneralLawAgent:
     def handle(self, query: str) -> Tuple[str, str]:
         return answer(query, self.key)
 
+    async def ahandle(self, query: str) -> Tuple[str, str]:
+        return await aanswer(query, self.key)
+
+    def stream(self, query: str):
+        return answer_stream(query, self.key)
+
 
 # (اختياري – للتأكد أن الملف يُحمّل)
 print("✅ pdf_agents loaded successfully")
\ No newline at end of file
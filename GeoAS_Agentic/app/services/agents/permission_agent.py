@@ -31,6 +31,30 @@ class PermissionAgent:
         # لو خارج محمية (GeneralLawAgent)
         return pdf_agent.handle(query)
 
+    async def ahandle(
+        self,
+        query: str,
+        pdf_agent,
+        protection_level: Optional[str] = None
+    ) -> Tuple[str, str]:
+        """نفس handle لمسارات الـ API (غير متزامن)"""
+        if hasattr(pdf_agent, "key") and pdf_agent.key == "protected_areas_rules":
+            return await pdf_agent.ahandle(query, protection_level)
+
+        return await pdf_agent.ahandle(query)
+
+    def stream(
+        self,
+        query: str,
+        pdf_agent,
+        protection_level: Optional[str] = None
+    ):
+        """نفس handle لكن بالبث (توكن بتوكن)"""
+        if hasattr(pdf_agent, "key") and pdf_agent.key == "protected_areas_rules":
+            return pdf_agent.stream(query, protection_level)
+
+        return pdf_agent.stream(query)
+
 
 # (اختياري – للتأكد أن الملف يُحمّل)
 print("✅ PermissionAgent loaded successfully")
\ No newline at end of file
@@ -0,0 +1,251 @@
+# answer_cache.py
+# ======================================================
+# كاش الإجابات أمام rag_service.answer (مستويان):
+# 1) تطابق تام على السؤال بعد التوحيد (بدون استرجاع ولا LLM)
+# 2) سؤال شبه مكرر: تشابه cosine لـ embedding السؤال فوق الحد
+#    + نفس السياق المسترجع بالضبط (حتى لا تُعاد إجابة سؤال مختلف)
+#
+# النطاق: (pdf_name, intent, protection_level, نسخة المخزن)
+# نسخة المخزن = بصمة الـ PDF، فإعادة الفهرسة تُبطل الإجابات القديمة تلقائياً
+# الإخلاء: LRU بحد أقصى + TTL، مع تخزين اختياري في SQLite يبقى بعد إعادة التشغيل
+# ======================================================
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from services.arabic_text import normalize_arabic
+from config import (
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_TTL_SECONDS,
+    ANSWER_CACHE_SIMILARITY,
+    ANSWER_CACHE_PATH,
+)
+
+
+PUNCT_RE = re.compile(r"[^\w\s]")
+QUERY_VECTOR_MEMO = 64
+
+
+def normalize_query(query: str) -> str:
+    text = PUNCT_RE.sub(" ", normalize_arabic(query or ""))
+    return " ".join(text.split())
+
+
+def _default_embed_query(text: str):
+    from services.vectorstore_service import vectorstore_service
+    from services.retrieval_batcher import retrieval_batcher
+    embeddings = vectorstore_service.embeddings
+    if embeddings is None:
+        return None
+    # نفس متجه السؤال الذي حسبه الاسترجاع للتو (بدون embedding ثانٍ لكل سؤال)
+    return retrieval_batcher.embed(embeddings, text)
+
+
+class AnswerCache:
+    def __init__(
+        self,
+        max_entries: int = 500,
+        ttl_seconds: float = 86400,
+        similarity: float = 0.97,
+        persist_path=None,
+        embed_query=None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self.embed_query = embed_query or _default_embed_query
+
+        # key -> {"scope", "query", "response", "context", "vector", "created"}
+        self._entries = OrderedDict()
+        self._vectors = OrderedDict()  # السؤال الموحد -> embedding (آخر الأسئلة فقط)
+        self._lock = threading.Lock()
+        self._memo_lock = threading.Lock()
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+
+        self._db = None
+        if persist_path:
+            try:
+                self._open_db(persist_path)
+            except Exception as e:
+                logging.warning(f"⚠️ تعذر فتح كاش الإجابات على القرص، سيعمل في الذاكرة فقط: {e}")
+                self._db = None
+
+    # ======================================================
+    # التخزين الدائم (SQLite)
+    # ======================================================
+    def _open_db(self, path):
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                scope TEXT,
+                query TEXT,
+                response TEXT,
+                context TEXT,
+                vector BLOB,
+                created REAL,
+                last_used REAL
+            )
+            """
+        )
+        self._db.execute("DELETE FROM answers WHERE created < ?", (time.time() - self.ttl_seconds,))
+        self._db.commit()
+
+        rows = self._db.execute(
+            "SELECT key, scope, query, response, context, vector, created FROM answers "
+            "ORDER BY last_used DESC LIMIT ?",
+            (self.max_entries,)
+        ).fetchall()
+        for key, scope, query, response, context, vector, created in reversed(rows):
+            self._entries[key] = {
+                "scope": tuple(json.loads(scope)),
+                "query": query,
+                "response": response,
+                "context": context,
+                "vector": np.frombuffer(vector, dtype=np.float32) if vector else None,
+                "created": created,
+            }
+        logging.info(f"🗃️ كاش الإجابات: تم تحميل {len(rows)} إجابة من {path}")
+
+    def _db_write(self, sql: str, params):
+        if self._db is None:
+            return
+        try:
+            self._db.execute(sql, params)
+            self._db.commit()
+        except Exception as e:
+            logging.warning(f"⚠️ فشل تحديث كاش الإجابات على القرص: {e}")
+
+    # ======================================================
+    # أدوات داخلية
+    # ======================================================
+    @staticmethod
+    def _key(normalized: str, scope) -> str:
+        return json.dumps([*scope, normalized], ensure_ascii=False)
+
+    def _expired(self, entry) -> bool:
+        return time.time() - entry["created"] > self.ttl_seconds
+
+    def _drop(self, key: str):
+        self._entries.pop(key, None)
+        self._db_write("DELETE FROM answers WHERE key = ?", (key,))
+
+    def _vector(self, query: str, normalized: str):
+        # embedding للسؤال كما وصل (مثل الاسترجاع)، والحفظ بالسؤال الموحد
+        with self._memo_lock:
+            vector = self._vectors.get(normalized)
+            if vector is not None:
+                self._vectors.move_to_end(normalized)
+                return vector
+
+        try:
+            raw = self.embed_query(query)
+        except Exception as e:
+            logging.warning(f"⚠️ تعذر حساب embedding السؤال للكاش: {e}")
+            return None
+        if raw is None:
+            return None
+
+        vector = np.asarray(raw, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        with self._memo_lock:
+            self._vectors[normalized] = vector
+            while len(self._vectors) > QUERY_VECTOR_MEMO:
+                self._vectors.popitem(last=False)
+        return vector
+
+    def _hit(self, key: str, entry, kind: str):
+        self._entries.move_to_end(key)
+        self.stats[kind] += 1
+        self._db_write("UPDATE answers SET last_used = ? WHERE key = ?", (time.time(), key))
+        return entry["response"], entry["context"]
+
+    # ======================================================
+    # الواجهة
+    # ======================================================
+    def get(self, query: str, scope):
+        """المستوى 1: تطابق تام (قبل الاسترجاع)"""
+        key = self._key(normalize_query(query), scope)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry):
+                self._drop(key)
+                return None
+            return self._hit(key, entry, "exact_hits")
+
+    def get_similar(self, query: str, scope, context: str):
+        """المستوى 2: سؤال شبه مكرر بنفس السياق المسترجع (بعد الاسترجاع وقبل الـ LLM)"""
+        normalized = normalize_query(query)
+        vector = self._vector(query, normalized)
+        if vector is None:
+            return None
+
+        with self._lock:
+            best_key, best_score = None, self.similarity
+            for key, entry in list(self._entries.items()):
+                if entry["scope"] != scope or entry["context"] != context or entry["vector"] is None:
+                    continue
+                if self._expired(entry):
+                    self._drop(key)
+                    continue
+                score = float(np.dot(vector, entry["vector"]))
+                if score >= best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None:
+                self.stats["misses"] += 1
+                return None
+
+            logging.info(f"⚡ كاش الإجابات: سؤال مشابه (cosine={best_score:.3f})")
+            return self._hit(best_key, self._entries[best_key], "semantic_hits")
+
+    def put(self, query: str, scope, response: str, context: str):
+        normalized = normalize_query(query)
+        vector = self._vector(query, normalized)
+        key = self._key(normalized, scope)
+        now = time.time()
+
+        with self._lock:
+            self._entries[key] = {
+                "scope": tuple(scope),
+                "query": normalized,
+                "response": response,
+                "context": context,
+                "vector": vector,
+                "created": now,
+            }
+            self._entries.move_to_end(key)
+            self._db_write(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key, json.dumps(list(scope), ensure_ascii=False), normalized, response, context,
+                    vector.tobytes() if vector is not None else None, now, now,
+                )
+            )
+
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# ======================================================
+# Instance واحد فقط للتطبيق
+# ======================================================
+answer_cache = AnswerCache(
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+    similarity=ANSWER_CACHE_SIMILARITY,
+    persist_path=ANSWER_CACHE_PATH,
+)
@@ -0,0 +1,236 @@
+# arabic_text.py
+# ======================================================
+# أدوات توحيد النص العربي (للبحث اللفظي والمطابقة)
+# - NFKC: تحويل أشكال العرض (ﻟﻤﺨﺎﻟﻔﺎت) إلى حروف عادية
+# - حذف التشكيل والتطويل
+# - توحيد الألف/الياء/التاء المربوطة والأرقام
+# ======================================================
+import re
+import unicodedata
+
+from services.lexicon import lexicon
+
+
+DIACRITICS_RE = re.compile(r"[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED]")
+TATWEEL = "\u0640"
+TOKEN_RE = re.compile(r"\w+")
+
+CHAR_MAP = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ى": "ي", "ی": "ي", "ئ": "ي",
+    "ک": "ك",
+    "ة": "ه", "ھ": "ه",
+    "ؤ": "و",
+    **{chr(0x0660 + i): str(i) for i in range(10)},  # ٠-٩
+    **{chr(0x06F0 + i): str(i) for i in range(10)},  # ۰-۹
+})
+
+# بادئات شائعة (أطولها أولاً)
+PREFIXES = ("وال", "بال", "كال", "فال", "لل", "ال")
+
+STOPWORDS = {
+    "في", "من", "على", "عن", "الي", "الى", "هل", "ما", "ماذا", "كم", "هو", "هي",
+    "التي", "الذي", "ان", "او", "و", "ثم", "مع", "هذا", "هذه", "ذلك", "تلك",
+    "اذا", "لا", "كل", "اي", "عند", "بين", "قد", "لم", "لن",
+}
+
+
+def normalize_arabic(text: str) -> str:
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text)
+    text = DIACRITICS_RE.sub("", text).replace(TATWEEL, "")
+    return text.translate(CHAR_MAP).lower()
+
+
+def light_stem(token: str) -> str:
+    for prefix in PREFIXES:
+        if token.startswith(prefix) and len(token) - len(prefix) >= 2:
+            return token[len(prefix):]
+    return token
+
+
+def tokenize(text: str) -> list:
+    tokens = []
+    for raw in TOKEN_RE.findall(normalize_arabic(text)):
+        if raw in STOPWORDS:
+            continue
+        token = light_stem(raw)
+        if token and token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+# ======================================================
+# توحيد النص عند الإدخال (قبل التقسيم والـ Embeddings)
+# بعض ملفات PDF (مثل protected_areas_rules) تُستخرج بأشكال العرض
+# وبالترتيب البصري (الكلمات معكوسة في كل سطر، وبعض الكلمات حروفها معكوسة أيضاً)
+# ======================================================
+PRESENTATION_FORMS_RE = re.compile(r"[ﭐ-﷿ﹰ-﻿]")
+ARABIC_LETTER_RE = re.compile(r"[؀-ۿﭐ-﷿ﹰ-﻿]")
+LINE_WRAPPER_RE = re.compile(r"^([=—\-]+)(.*?)([=—\-]+)$")
+LEADING_PUNCT_RE = re.compile(r"^([^\w]+)(\w.*)$")
+
+INGEST_CHAR_MAP = str.maketrans({"ی": "ي", "ک": "ك"})
+
+# كلمة عربية (حروف + تشكيل، بأشكال العرض أيضاً) بدون علامات الترقيم والأرقام و﷼
+ARABIC_WORD_RE = re.compile(r"[\u0621-\u065F\u0670-\u06D3\uFB50-\uFDFB\uFE70-\uFEFC]+")
+
+# شكل العرض → (يتصل بالحرف السابق، يتصل بالحرف التالي) بالترتيب المنطقي
+FORM_JOINS = {
+    "INITIAL FORM": (False, True),
+    "MEDIAL FORM": (True, True),
+    "FINAL FORM": (True, False),
+    "ISOLATED FORM": (False, False),
+}
+# حروف لا تتصل بما بعدها (عندما تُستخرج بشكلها العادي وليس بشكل العرض)
+RIGHT_JOINING = set("اأإآٱدذرزوؤة")
+NON_JOINING = set("ء")
+
+
+def is_visual_order(text: str) -> bool:
+    """أشكال العرض بكثرة = النص مستخرج بالترتيب البصري"""
+    letters = len(ARABIC_LETTER_RE.findall(text or ""))
+    if not letters:
+        return False
+    return len(PRESENTATION_FORMS_RE.findall(text)) / letters > 0.3
+
+
+def _joins(char: str):
+    """(يتصل بالسابق، يتصل بالتالي) أو None إذا كان غير معروف"""
+    name = unicodedata.name(char, "")
+    for form, joins in FORM_JOINS.items():
+        if name.endswith(form):
+            return joins
+    if char in RIGHT_JOINING:
+        return None, False
+    if char in NON_JOINING:
+        return False, False
+    return None, None
+
+
+def _letter_units(word: str) -> list:
+    """الحرف + التشكيل الذي بعده (يتحركان معاً)"""
+    units = []
+    for char in word:
+        if units and unicodedata.category(char) == "Mn":
+            units[-1] += char
+        else:
+            units.append(char)
+    return units
+
+
+def _join_errors(units: list) -> int:
+    """عدد الاتصالات المستحيلة بين أشكال العرض (0 = ترتيب الحروف سليم)"""
+    joins = [_joins(unit[0]) for unit in units]
+    errors = (joins[0][0] is True) + (joins[-1][1] is True)
+    for (_, joins_next), (joins_prev, _) in zip(joins, joins[1:]):
+        if joins_next is not None and joins_prev is not None and joins_next != joins_prev:
+            errors += 1
+    return errors
+
+
+def _repair_swaps(units: list):
+    """تبديل حرفين متجاورين طالما يقلل الأخطاء (مواضع متقاربة في الـ PDF تُستخرج بترتيب خاطئ)"""
+    errors = _join_errors(units)
+    for _ in range(len(units) // 2):
+        if not errors:
+            break
+        best = None
+        for i in range(len(units) - 1):
+            candidate = units[:i] + [units[i + 1], units[i]] + units[i + 2:]
+            candidate_errors = _join_errors(candidate)
+            if candidate_errors < errors and (best is None or candidate_errors < best[1]):
+                best = (candidate, candidate_errors)
+        if best is None:
+            break
+        units, errors = best
+    return units, errors
+
+
+def _visual_word_to_logical(word: str) -> str:
+    """
+    كلمة حروفها بالترتيب البصري ("ﺎًﻔأﻟ" بدل "ألفًا"):
+    أشكال العرض تحدد اتصال كل حرف بما قبله وبعده، فإذا كان الاتصال مستحيلاً
+    والكلمة معكوسة (مع إصلاح حرفين متبادلين) سليمة → تُعكس
+    """
+    errors = _join_errors(_letter_units(word))
+    if not errors:
+        return word
+    units, reversed_errors = _repair_swaps(_letter_units(word[::-1]))
+    return "".join(units) if reversed_errors < errors else word
+
+
+def _visual_line_to_logical(line: str) -> str:
+    if not ARABIC_LETTER_RE.search(line):
+        return line
+
+    # فواصل العناوين (===...=== أو —...—) تبقى على الطرفين
+    wrapper = LINE_WRAPPER_RE.match(line)
+    prefix = suffix = ""
+    if wrapper and wrapper.group(2).strip():
+        prefix, line, suffix = wrapper.group(1), wrapper.group(2), wrapper.group(3)
+
+    tokens = line.split()
+    # من اليسار لليمين بصرياً بالعكس حتى لا تنتقل العلامة مرتين
+    for i in range(len(tokens) - 1, -1, -1):
+        token = tokens[i]
+        # علامة في بداية الكلمة بصرياً مكانها نهاية الكلمة منطقياً
+        lead = LEADING_PUNCT_RE.match(token)
+        if lead:
+            tokens[i] = token = lead.group(2) + lead.group(1)
+        # نقطتا العنوان ("المخالفة:") تلتصق بصرياً بالكلمة التالية للعنوان
+        if token.endswith(":") and len(token) > 1 and i + 1 < len(tokens):
+            tokens[i] = token[:-1]
+            tokens[i + 1] = tokens[i + 1] + ":"
+
+    return prefix + " ".join(reversed(tokens)) + suffix
+
+
+def normalize_for_ingestion(text: str) -> str:
+    """
+    NFKC + ترتيب منطقي للأسطر البصرية + حذف التطويل + ضغط المسافات.
+    لا يغيّر الحروف (بعكس normalize_arabic المخصص للمطابقة).
+    """
+    if not text:
+        return ""
+
+    visual = is_visual_order(text)
+    if visual:
+        # قبل NFKC: أشكال العرض هي ما يكشف الكلمات المعكوسة حرفياً
+        text = ARABIC_WORD_RE.sub(lambda m: _visual_word_to_logical(m.group(0)), text)
+    text = unicodedata.normalize("NFKC", text).translate(INGEST_CHAR_MAP)
+    text = text.replace(TATWEEL, "").replace("\r\n", "\n").replace("\r", "\n")
+
+    lines = []
+    for line in text.split("\n"):
+        line = re.sub(r"[ \t ]+", " ", line).strip()
+        if visual:
+            line = _visual_line_to_logical(line)
+        lines.append(line)
+
+    text = "\n".join(lines)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+# ======================================================
+# مستوى الحماية (عناوين المرجع: "مستوى الحماية: عالية")
+# ======================================================
+PROTECTION_LEVEL_MAP = {
+    "منخفضة": "low", "منخفض": "low", "low": "low",
+    "متوسطة": "medium", "متوسط": "medium", "medium": "medium",
+    "عالية": "high", "عالي": "high", "high": "high",
+}
+
+
+def normalize_protection_level(value):
+    """low / medium / high أو None (يقبل القيم العربية من قاعدة البيانات)"""
+    if not value:
+        return None
+    return PROTECTION_LEVEL_MAP.get(str(value).strip().lower())
+
+
+def find_protection_levels(text: str) -> list:
+    """مستويات الحماية المذكورة بترتيب ظهورها (فئات protection.* في lexicon.json)"""
+    return lexicon.scan(text or "").ordered_values("protection.")
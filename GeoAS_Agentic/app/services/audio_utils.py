@@ -9,15 +9,21 @@ import edge_tts
 import os
 import numpy as np
 
+import threading
+
 from faster_whisper import WhisperModel
 from pathlib import Path
 from config import (
     SAMPLERATE,
+    WHISPER_MODEL_SIZE,
+    WHISPER_DEVICE,
+    WHISPER_COMPUTE_TYPE,
     TEMP_AUDIO_OUTPUT,
     EDGE_TTS_VOICE,
     EDGE_TTS_RATE,
     EDGE_TTS_VOLUME
 )
+from services.readiness import readiness
 
 STOP_LISTENING = False
 
@@ -25,15 +31,33 @@ logging.basicConfig(level=logging.INFO)
 audio_queue = queue.Queue()
 
 # ============================
-# تحميل موديل Whisper
+# تحميل موديل Whisper (عند أول استخدام أو أثناء الـ warmup)
 # ============================
-try:
-    whisper_model = WhisperModel("small", compute_type="int8")  
-    # ممكن تغيره إلى: tiny / base / medium
-    logging.info("✅ Whisper model loaded successfully")
-except Exception as e:
-    logging.error(f"❌ خطأ في تحميل موديل Whisper: {e}")
-    whisper_model = None
+whisper_model = None
+_whisper_lock = threading.Lock()
+
+
+def get_whisper_model():
+    global whisper_model
+    if whisper_model is not None:
+        return whisper_model
+
+    with _whisper_lock:
+        if whisper_model is None:
+            readiness.loading("whisper")
+            try:
+                whisper_model = WhisperModel(
+                    WHISPER_MODEL_SIZE,
+                    device=WHISPER_DEVICE,
+                    compute_type=WHISPER_COMPUTE_TYPE
+                )
+                logging.info("✅ Whisper model loaded successfully")
+                readiness.ready("whisper", WHISPER_MODEL_SIZE)
+            except Exception as e:
+                logging.error(f"❌ خطأ في تحميل موديل Whisper: {e}")
+                readiness.failed("whisper", e)
+                whisper_model = None
+    return whisper_model
 
 
 # ============================
@@ -49,7 +73,8 @@ def listen_to_mic(timeout: int = 5) -> str:
     global STOP_LISTENING
     STOP_LISTENING = False
 
-    if not whisper_model:
+    model = get_whisper_model()
+    if not model:
         logging.error("❌ موديل Whisper غير متاح.")
         return ""
 
@@ -92,7 +117,7 @@ def listen_to_mic(timeout: int = 5) -> str:
 
         audio_np = np.concatenate(audio_buffer, axis=0).flatten()
 
-        segments, _ = whisper_model.transcribe(audio_np, language="ar")
+        segments, _ = model.transcribe(audio_np, language="ar")
         text = " ".join([s.text for s in segments]).strip()
 
         logging.info(f"✅ النص: {text}")
@@ -1,5 +1,6 @@
 # services/db.py
 import psycopg2
+from psycopg2.extras import execute_values
 from datetime import datetime
 import json
 
@@ -28,20 +29,71 @@ class Database:
             )
 
     # =========================
-    # هل النقطة داخل محمية؟
+    # حفظ دفعة نقاط GPS (مسار مسجّل من جهاز كان بدون اتصال)
+    # points: [(lat, lon, timestamp, inside_geofence, officer_id)]
+    # INSERT واحد لكل الدفعة: الاتصال autocommit ومشترك بين threads، فالعبارة الواحدة
+    # هي الـ transaction (فشل = لا شيء محفوظ، وإعادة المحاولة لا تكرر نقاطاً)
     # =========================
-    def is_inside_protected_zone(self, lat, lon):
+    def save_points(self, points):
+        if not points:
+            return
+        query = """
+            INSERT INTO officer_tracking (geom, timestamp, inside_geofence, officer_id)
+            VALUES %s;
+        """
+        template = "(ST_SetSRID(ST_MakePoint(%s, %s), 4326), %s, %s, %s)"
+        with self.conn.cursor() as cur:
+            execute_values(
+                cur,
+                query,
+                [(lon, lat, ts, inside, officer_id) for lat, lon, ts, inside, officer_id in points],
+                template=template,
+                page_size=len(points)
+            )
+
+    # =========================
+    # هل النقطة داخل محمية؟ (PostGIS مباشرة، الاستخدام العادي عبر services/geofence.py)
+    # =========================
+    def find_zone(self, lat, lon):
         query = """
-        SELECT 1
+        SELECT name, protection_level
         FROM protected_zones
         WHERE ST_Contains(
             geom,
             ST_SetSRID(ST_MakePoint(%s, %s), 4326)
-        );
+        )
+        ORDER BY id
+        LIMIT 1;
         """
         with self.conn.cursor() as cur:
             cur.execute(query, (lon, lat))
-            return cur.fetchone() is not None
+            return cur.fetchone()
+
+    def is_inside_protected_zone(self, lat, lon):
+        return self.find_zone(lat, lon) is not None
+
+    # =========================
+    # المحميات للـ Geofence (تُحمّل مرة واحدة في الذاكرة)
+    # =========================
+    def get_zones(self):
+        query = """
+        SELECT id, name, protection_level, ST_AsBinary(geom), ST_AsGeoJSON(geom)::jsonb
+        FROM protected_zones
+        ORDER BY id;
+        """
+        with self.conn.cursor() as cur:
+            cur.execute(query)
+            return cur.fetchall()
+
+    def get_zones_signature(self):
+        # يتغير مع أي إضافة / حذف / تعديل (xmin = آخر transaction عدّلت الصف)
+        query = """
+        SELECT COALESCE(md5(string_agg(id::text || ':' || xmin::text, ',' ORDER BY id)), '')
+        FROM protected_zones;
+        """
+        with self.conn.cursor() as cur:
+            cur.execute(query)
+            return cur.fetchone()[0]
 
     # =========================
     # GeoJSON للمحميات
@@ -70,8 +122,37 @@ class Database:
 
     # =========================
     # GeoJSON للنقاط
+    # with_zones=False: بدون LATERAL ST_Contains لكل نقطة (المحمية تُضاف من الـ Geofence)
     # =========================
-    def get_points_geojson(self, limit=500):
+    def get_points_geojson(self, limit=500, with_zones=True):
+        if not with_zones:
+            query = """
+            SELECT jsonb_build_object(
+                'type','FeatureCollection',
+                'features', COALESCE(jsonb_agg(
+                    jsonb_build_object(
+                        'type','Feature',
+                        'geometry', ST_AsGeoJSON(t.geom)::jsonb,
+                        'properties', jsonb_build_object(
+                            'id', t.id,
+                            'inside_geofence', t.inside_geofence,
+                            'officer_id', t.officer_id,
+                            'timestamp', t.timestamp
+                        )
+                    )
+                ), '[]'::jsonb)
+            )
+            FROM (
+                SELECT *
+                FROM officer_tracking
+                ORDER BY timestamp DESC
+                LIMIT %s
+            ) t;
+            """
+            with self.conn.cursor() as cur:
+                cur.execute(query, (limit,))
+                return cur.fetchone()[0]
+
         query = """
         SELECT jsonb_build_object(
             'type','FeatureCollection',
@@ -0,0 +1,244 @@
+# embedding_cache.py
+# ======================================================
+# كاش دائم للـ Embeddings على القرص
+# - المفتاح: (اسم الموديل، hash لنص الـ chunk بعد التوحيد)
+# - المتجهات في مصفوفة float32 مربوطة بالذاكرة (memmap)
+# - فهرس JSON يربط المفتاح برقم الصف + آخر استخدام (LRU)
+# الملف نفسه في التطبيقين (GeoAS_Agentic/app و المساعد الجيومكاني الذكي):
+# أي تعديل يُنسخ للنسختين كما هو (tests/test_shared_modules.py يتحقق من التطابق)
+# ======================================================
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+VECTORS_FILE = "vectors.f32"
+INDEX_FILE = "index.json"
+INITIAL_CAPACITY = 1024
+
+
+def normalize_chunk_text(text: str) -> str:
+    """توحيد النص قبل حساب الـ hash (المسافات الزائدة لا تغيّر المفتاح)"""
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+class EmbeddingCache:
+    def __init__(self, cache_dir, model_name: str, max_entries: int = 50000):
+        self.model_name = model_name
+        self.max_entries = max(1, int(max_entries))
+        self.cache_dir = Path(cache_dir) / hashlib.md5(model_name.encode("utf-8")).hexdigest()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> [row, last_used]
+        self._free_rows = []
+        self._dim = None
+        self._capacity = 0
+        self._matrix = None
+        self._dirty = False
+
+        self._load()
+
+    # ======================================================
+    # المفاتيح
+    # ======================================================
+    def _key(self, text: str) -> str:
+        payload = f"{self.model_name}\0{normalize_chunk_text(text)}"
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    # ======================================================
+    # تحميل الكاش من القرص
+    # ======================================================
+    def _load(self):
+        index_file = self.cache_dir / INDEX_FILE
+        vectors_file = self.cache_dir / VECTORS_FILE
+        if not index_file.exists() or not vectors_file.exists():
+            return
+
+        try:
+            with open(index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+
+            if data.get("model_name") != self.model_name:
+                logging.warning("⚠️ كاش Embeddings لموديل مختلف، سيتم تجاهله")
+                return
+
+            self._dim = int(data["dim"])
+            self._capacity = int(data["capacity"])
+            self._matrix = np.memmap(
+                vectors_file, dtype=np.float32, mode="r+",
+                shape=(self._capacity, self._dim)
+            )
+            self._entries = {k: list(v) for k, v in data.get("entries", {}).items()}
+
+            used = {row for row, _ in self._entries.values()}
+            self._free_rows = [r for r in range(self._capacity) if r not in used]
+
+            logging.info(f"🗃️ تم تحميل كاش Embeddings ({len(self._entries)} متجه)")
+        except Exception as e:
+            logging.warning(f"⚠️ كاش Embeddings تالف وسيتم إنشاؤه من جديد: {e}")
+            self._entries = {}
+            self._free_rows = []
+            self._dim = None
+            self._capacity = 0
+            self._matrix = None
+
+    # ======================================================
+    # حفظ الفهرس (كتابة ذرّية)
+    # ======================================================
+    def flush(self):
+        with self._lock:
+            if not self._dirty or self._matrix is None:
+                return
+            self._matrix.flush()
+
+            index_file = self.cache_dir / INDEX_FILE
+            tmp_file = index_file.with_suffix(".tmp")
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump({
+                    "model_name": self.model_name,
+                    "dim": self._dim,
+                    "capacity": self._capacity,
+                    "entries": self._entries,
+                }, f)
+            os.replace(tmp_file, index_file)
+            self._dirty = False
+
+    # ======================================================
+    # توسيع المصفوفة (مضاعفة السعة حتى الحد الأقصى)
+    # ======================================================
+    def _grow(self, needed: int):
+        new_capacity = max(self._capacity, INITIAL_CAPACITY)
+        while new_capacity < needed:
+            new_capacity *= 2
+        new_capacity = min(new_capacity, self.max_entries)
+        if new_capacity <= self._capacity:
+            return
+
+        vectors_file = self.cache_dir / VECTORS_FILE
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
+
+        with open(vectors_file, "ab") as f:
+            f.truncate(new_capacity * self._dim * 4)
+
+        self._matrix = np.memmap(
+            vectors_file, dtype=np.float32, mode="r+",
+            shape=(new_capacity, self._dim)
+        )
+        self._free_rows.extend(range(self._capacity, new_capacity))
+        self._capacity = new_capacity
+
+    # ======================================================
+    # إخلاء الأقدم استخداماً (LRU)
+    # ======================================================
+    def _evict(self, count: int):
+        # نخلي دفعة (5% على الأقل) حتى لا نرتب الفهرس مع كل إضافة
+        count = max(count, self.max_entries // 20, 1)
+        oldest = sorted(self._entries.items(), key=lambda kv: kv[1][1])[:count]
+        for key, (row, _) in oldest:
+            del self._entries[key]
+            self._free_rows.append(row)
+        logging.info(f"🧹 إخلاء {len(oldest)} متجه من كاش Embeddings (LRU)")
+
+    # ======================================================
+    # قراءة / كتابة
+    # ======================================================
+    def get_many(self, texts):
+        results = [None] * len(texts)
+        now = time.time()
+        with self._lock:
+            if self._matrix is None:
+                return results
+            for i, text in enumerate(texts):
+                entry = self._entries.get(self._key(text))
+                if entry is None:
+                    continue
+                results[i] = np.array(self._matrix[entry[0]])
+                entry[1] = now
+                self._dirty = True
+        return results
+
+    def put_many(self, texts, vectors):
+        if not texts:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        now = time.time()
+
+        with self._lock:
+            if self._dim is None:
+                self._dim = int(vectors.shape[1])
+            elif vectors.shape[1] != self._dim:
+                logging.warning("⚠️ أبعاد المتجهات لا تطابق الكاش، لن يتم التخزين")
+                return
+
+            new_keys = {self._key(t) for t in texts} - self._entries.keys()
+
+            needed = len(self._entries) + len(new_keys)
+            if needed > self._capacity:
+                self._grow(needed)
+
+            overflow = len(new_keys) - len(self._free_rows)
+            if overflow > 0:
+                self._evict(overflow)
+
+            for text, vec in zip(texts, vectors):
+                key = self._key(text)
+                entry = self._entries.get(key)
+                if entry is None:
+                    if not self._free_rows:
+                        break
+                    entry = [self._free_rows.pop(), now]
+                    self._entries[key] = entry
+                self._matrix[entry[0]] = vec
+                entry[1] = now
+
+            self._dirty = True
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    غلاف Embeddings يمرّ على الكاش أولاً،
+    ولا يحسب إلا الـ chunks الجديدة.
+    الاستعلامات (embed_query) لا تُخزن.
+    """
+
+    def __init__(self, underlying: Embeddings, cache: EmbeddingCache):
+        self.underlying = underlying
+        self.cache = cache
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        cached = self.cache.get_many(texts)
+        missing = [i for i, v in enumerate(cached) if v is None]
+
+        if missing:
+            computed = self.underlying.embed_documents([texts[i] for i in missing])
+            self.cache.put_many([texts[i] for i in missing], computed)
+            for i, vec in zip(missing, computed):
+                cached[i] = vec
+
+        self.cache.flush()
+        logging.info(
+            f"🗃️ Embeddings: {len(texts) - len(missing)} من الكاش، {len(missing)} محسوبة"
+        )
+        return [np.asarray(v, dtype=np.float32).tolist() for v in cached]
+
+    def embed_query(self, text):
+        return self.underlying.embed_query(text)
+
+    def embed_queries(self, texts):
+        # دفعة أسئلة (retrieval_batcher): تمريرة واحدة، وبدون كاش مثل embed_query
+        return self.underlying.embed_documents(list(texts))
@@ -0,0 +1,330 @@
+# fine_table.py
+# ======================================================
+# جدول الغرامات المنظم (من protected_areas_rules.pdf):
+# (مستوى الحماية، الفصل، المخالفة، الغرامة، العقوبات الإضافية، ملاحظة)
+#
+# يُستخرج مرة واحدة عند فهرسة الـ PDF، وأسئلة الغرامات (intent = "penalty")
+# تُجاب منه مباشرة بقالب ثابت بدون استرجاع ولا LLM إذا كانت المطابقة واضحة؛
+# غير ذلك (لا مطابقة / أكثر من مخالفة محتملة) → المسار العادي (RAG + LLM)
+#
+# الإجابة من الجدول تُعرض حرفياً بدون LLM ولا Guard، فكل سجل يُتحقق منه عند الاستخراج:
+# مبلغ الغرامة مفهوم (أرقام أو كلمات عددية) ولا كلمات معكوسة الحروف ("اًفأل").
+# السجل غير الصالح يبقى للمطابقة فقط: سؤال عنه → المسار العادي (وليس سجلاً مجاوراً)
+# ======================================================
+import logging
+import math
+import re
+import unicodedata
+from collections import Counter
+
+import numpy as np
+
+from services.arabic_text import tokenize, find_protection_levels, normalize_protection_level, normalize_arabic
+
+
+FINE_TABLE_VERSION = 2  # 2: التحقق من السجلات (amount / invalid)
+
+# بادئات أسطر السجل في المرجع → اسم الحقل
+FIELD_PREFIXES = (
+    ("المخالفة", "violation"),
+    ("الغرامة", "fine"),
+    ("عقوبات إضافية محتملة", "additional"),
+    ("ملاحظة", "note"),
+)
+FIELD_RE = re.compile(r"^\s*(" + "|".join(p for p, _ in FIELD_PREFIXES) + r")\s*:\s*(.*)$")
+FIELD_NAMES = dict(FIELD_PREFIXES)
+CHAPTER_RE = re.compile(r"^[—\-\s]*(الفصل[^—]*)[—\-\s]*$")
+RECORD_END_RE = re.compile(r"^\s*[-—]{3,}\s*$")
+
+# كلمات السؤال التي لا تميّز مخالفة عن أخرى (بعد التوحيد والـ stemming)
+QUERY_STOPWORDS = {
+    "غرامه", "غرامتها", "غرامات", "عقوبه", "عقوبتها", "عقوبات", "قيمه", "مخالفه",
+    "محميه", "محميات", "داخل", "ريال", "سعودي", "وش", "ايش", "شو", "تكون", "يكون",
+    "لو", "انا", "اذا", "كان", "عليه", "علي", "فيها",
+}
+
+# الكلمات العددية بعد normalize_arabic (ة→ه، أ→ا، بدون تشكيل)
+NUMBER_WORDS = {
+    "واحد": 1, "اثنان": 2, "اثنا": 2, "اثنين": 2, "اثني": 2,
+    "ثلاثه": 3, "ثلاث": 3, "اربعه": 4, "اربع": 4, "خمسه": 5, "خمس": 5,
+    "سته": 6, "ست": 6, "سبعه": 7, "سبع": 7, "ثمانيه": 8, "ثماني": 8, "ثمان": 8,
+    "تسعه": 9, "تسع": 9, "عشره": 10, "عشر": 10,
+    "عشرون": 20, "عشرين": 20, "ثلاثون": 30, "ثلاثين": 30, "اربعون": 40, "اربعين": 40,
+    "خمسون": 50, "خمسين": 50, "ستون": 60, "ستين": 60, "سبعون": 70, "سبعين": 70,
+    "ثمانون": 80, "ثمانين": 80, "تسعون": 90, "تسعين": 90,
+    "مائه": 100, "مئه": 100, "مائتا": 200, "مئتا": 200, "مائتان": 200, "مئتان": 200, "مائتين": 200, "مئتين": 200,
+}
+THOUSAND_WORDS = {"الف", "الفا", "الاف", "الالاف"}
+TWO_THOUSAND_WORDS = {"الفان", "الفين"}
+CURRENCY_WORDS = {"ريال", "ريالا", "ريالات"}
+AMOUNT_TOKEN_RE = re.compile(r"[\d,٬]+|[^\W\d_]+")
+
+# تنوين في وسط الكلمة / ة أو ى قبل آخرها → الكلمة مستخرجة بالترتيب البصري
+TANWEEN = "\u064B\u064C\u064D"
+GARBLED_WORD_RE = re.compile(rf"^[\u064B-\u065F]|[{TANWEEN}](?![اى]?$)|[ةى](?=\w)")
+WORD_RE = re.compile(r"[\w\u064B-\u065F]+")
+
+MIN_KEYWORD_SCORE = 1.0   # مجموع IDF للكلمات المطابقة
+AMBIGUITY_RATIO = 0.8     # الثاني >= 80% من الأول → غير واضح، نترك القرار للـ LLM
+EMBEDDING_SIMILARITY = 0.85
+EMBEDDING_MARGIN = 0.03
+
+
+# ======================================================
+# التحقق من السجل
+# ======================================================
+def parse_fine_amount(text: str):
+    """
+    مبلغ الغرامة بالريال ("خمسة وثلاثون ألفًا ريال سعودي" → 35000، "5,000 ريال" → 5000)
+    أو None إذا لم يكن المبلغ مفهوماً (كلمة غير عددية قبل "ريال" أو بدون عملة)
+    """
+    total, current = 0, 0
+    for token in AMOUNT_TOKEN_RE.findall(normalize_arabic(text or "")):
+        if token in CURRENCY_WORDS:
+            amount = total + current
+            return amount or None
+        if token[0].isdigit():
+            current += int(re.sub(r"[,٬]", "", token))
+            continue
+        if token not in NUMBER_WORDS and token not in THOUSAND_WORDS | TWO_THOUSAND_WORDS \
+                and token.startswith("و") and len(token) > 2:
+            token = token[1:]  # "وثلاثون"
+        if token in NUMBER_WORDS:
+            current += NUMBER_WORDS[token]
+        elif token in THOUSAND_WORDS:
+            total += (current or 1) * 1000
+            current = 0
+        elif token in TWO_THOUSAND_WORDS:
+            total += 2000
+        else:
+            return None
+    return None
+
+
+def garbled_words(text: str) -> list:
+    """كلمات لا يمكن أن تكون بالترتيب المنطقي (مثل "اًفأل" بدل "ألفًا")"""
+    text = unicodedata.normalize("NFKC", text or "")
+    return [word for word in WORD_RE.findall(text) if GARBLED_WORD_RE.search(word)]
+
+
+def validate_fine_row(row) -> str:
+    """سبب رفض السجل أو "" إذا كان صالحاً للإجابة المباشرة"""
+    if parse_fine_amount(row.get("fine")) is None:
+        return f"مبلغ غير مفهوم: {row.get('fine')}"
+    for field in ("violation", "fine", "additional", "note"):
+        words = garbled_words(row.get(field))
+        if words:
+            return f"كلمات معكوسة في {field}: {' '.join(words)}"
+    return ""
+
+
+# ======================================================
+# الاستخراج (عند الفهرسة)
+# ======================================================
+def extract_fine_rows(pages) -> list:
+    """
+    pages: صفحات موحدة النص (normalize_for_ingestion) وبها section_level الموروث
+    السجل يبدأ بـ "المخالفة:" وينتهي بـ "---" أو بسجل/عنوان جديد
+    السجل غير الصالح (validate_fine_row) يُعلَّم بـ "invalid" ولا يُستخدم للإجابة المباشرة
+    """
+    rows = []
+    level = None
+    chapter = None
+    current = None
+
+    def close():
+        nonlocal current
+        if current and current.get("violation") and current.get("fine"):
+            reason = validate_fine_row(current)
+            if reason:
+                current["invalid"] = reason
+                logging.warning(f"⚠️ جدول الغرامات: سجل غير صالح ({current['violation']}): {reason}")
+            else:
+                current["amount"] = parse_fine_amount(current["fine"])
+            rows.append(current)
+        current = None
+
+    for page_no, page in enumerate(pages):
+        if level is None:
+            level = page.metadata.get("section_level")
+
+        for line in (page.page_content or "").splitlines():
+            line = line.strip()
+            if not line:
+                continue
+
+            # أسطر الحقول أولاً: "المخالفة: ... ذات حماية عالية" ليست عنوان قسم
+            field_match = FIELD_RE.match(line)
+            levels = [] if field_match else find_protection_levels(line)
+            if levels:
+                close()
+                level = levels[-1]
+                chapter = None
+                continue
+
+            chapter_match = CHAPTER_RE.match(line)
+            if chapter_match:
+                close()
+                chapter = chapter_match.group(1).strip()
+                continue
+
+            if RECORD_END_RE.match(line):
+                close()
+                continue
+
+            if field_match:
+                field = FIELD_NAMES[field_match.group(1)]
+                value = field_match.group(2).strip()
+                if field == "violation":
+                    close()
+                    current = {
+                        "protection_level": level or "unknown",
+                        "chapter": chapter,
+                        "violation": value,
+                        "page": page.metadata.get("page", page_no),
+                    }
+                elif current is not None:
+                    current[field] = value
+            elif current is not None:
+                # سطر تكملة لآخر حقل (نص ملتف)
+                last = list(current)[-1]
+                if last in FIELD_NAMES.values():
+                    current[last] = f"{current[last]} {line}"
+
+    close()
+    return rows
+
+
+# ======================================================
+# الجدول والبحث
+# ======================================================
+class FineTable:
+    def __init__(self, rows, embed_query=None, embed_documents=None):
+        self.rows = list(rows)
+        self.embed_query = embed_query
+        self.embed_documents = embed_documents
+        self._vectors = None
+        self.stats = {"keyword_hits": 0, "embedding_hits": 0, "misses": 0, "invalid": 0}
+
+        self._tokens = [set(self._terms(r["violation"])) for r in self.rows]
+        df = Counter(t for tokens in self._tokens for t in tokens)
+        n = len(self.rows)
+        self._idf = {t: math.log(1 + n / c) for t, c in df.items()}
+
+    @staticmethod
+    def _terms(text: str) -> list:
+        return [t for t in tokenize(text) if t not in QUERY_STOPWORDS]
+
+    def _candidates(self, protection_level):
+        level = normalize_protection_level(protection_level)
+        return [i for i, r in enumerate(self.rows) if not level or r["protection_level"] == level]
+
+    def _pick(self, scored, minimum, ambiguous):
+        scored.sort(key=lambda s: s[0], reverse=True)
+        if not scored or scored[0][0] < minimum:
+            return None
+        if len(scored) > 1 and ambiguous(scored[0][0], scored[1][0]):
+            return None
+        return scored[0][1]
+
+    def _keyword_match(self, query: str, candidates):
+        terms = set(self._terms(query))
+        if not terms:
+            return None
+        scored = [
+            (sum(self._idf.get(t, 0.0) for t in terms & self._tokens[i]), i)
+            for i in candidates
+        ]
+        return self._pick(
+            [s for s in scored if s[0] > 0],
+            MIN_KEYWORD_SCORE,
+            lambda first, second: second >= first * AMBIGUITY_RATIO,
+        )
+
+    def _embedding_match(self, query: str, candidates):
+        if self.embed_query is None or self.embed_documents is None:
+            return None
+        try:
+            if self._vectors is None:
+                vectors = np.asarray(self.embed_documents([r["violation"] for r in self.rows]), dtype=np.float32)
+                self._vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+            q = np.asarray(self.embed_query(query), dtype=np.float32)
+            q = q / (np.linalg.norm(q) or 1.0)
+        except Exception as e:
+            logging.warning(f"⚠️ تعذر البحث الدلالي في جدول الغرامات: {e}")
+            return None
+
+        scored = [(float(self._vectors[i] @ q), i) for i in candidates]
+        return self._pick(
+            scored,
+            EMBEDDING_SIMILARITY,
+            lambda first, second: first - second < EMBEDDING_MARGIN,
+        )
+
+    def _valid(self, index):
+        if self.rows[index].get("invalid"):
+            # المطابقة صحيحة لكن نص السجل غير موثوق → المسار العادي (RAG + LLM)
+            self.stats["invalid"] += 1
+            return None
+        return self.rows[index]
+
+    def lookup(self, query: str, protection_level: str = None):
+        """المخالفة المطابقة بوضوح (ضمن مستوى الحماية إن وُجد) أو None"""
+        candidates = self._candidates(protection_level)
+        if not candidates:
+            return None
+
+        index = self._keyword_match(query, candidates)
+        if index is not None:
+            self.stats["keyword_hits"] += 1
+            return self._valid(index)
+
+        index = self._embedding_match(query, candidates)
+        if index is not None:
+            self.stats["embedding_hits"] += 1
+            return self._valid(index)
+
+        self.stats["misses"] += 1
+        return None
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def format_fine_answer(row) -> str:
+    """نفس صيغة الإجابة المطلوبة من الـ LLM (نص المرجع حرفياً)"""
+    lines = [f"المخالفة: {row['violation']}", f"الغرامة: {row['fine']}"]
+    if row.get("additional"):
+        lines.append(f"عقوبات إضافية محتملة: {row['additional']}")
+    if row.get("note"):
+        lines.append(f"ملاحظة: {row['note']}")
+    return "\n".join(lines)
+
+
+# ======================================================
+# الجداول المسجلة (اسم الـ PDF → FineTable)
+# ======================================================
+fine_tables = {}
+
+
+def register_fine_table(name: str, rows):
+    if not rows:
+        fine_tables.pop(name, None)
+        return None
+
+    def embed_query(text):
+        from services.vectorstore_service import vectorstore_service
+        return vectorstore_service.get_embeddings().embed_query(text)
+
+    def embed_documents(texts):
+        from services.vectorstore_service import vectorstore_service
+        return vectorstore_service.get_embeddings().embed_documents(texts)
+
+    fine_tables[name] = FineTable(rows, embed_query=embed_query, embed_documents=embed_documents)
+    levels = Counter(r["protection_level"] for r in rows)
+    invalid = sum(1 for r in rows if r.get("invalid"))
+    logging.info(
+        f"💰 جدول الغرامات ({name}): {len(rows)} مخالفة {dict(levels)}"
+        + (f"، {invalid} غير صالحة (تُجاب عبر RAG)" if invalid else "")
+    )
+    return fine_tables[name]
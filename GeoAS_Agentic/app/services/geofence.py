@@ -0,0 +1,194 @@
+# geofence.py
+# ======================================================
+# محرك Geofence داخل التطبيق (بدل ST_Contains في PostGIS لكل نقطة GPS):
+# - بوليقونات protected_zones تُحمّل مرة واحدة في shapely (prepared) + STRtree
+# - الاستعلام: STRtree (bounding boxes) ثم contains_xy على المرشحين فقط،
+#   لنقطة واحدة أو لمصفوفة نقاط دفعة واحدة (vectorized)
+# - نفس منطق ST_Contains: النقطة على الحد ليست داخل المحمية،
+#   وعند التداخل تُختار المحمية الأصغر id
+# - GeoJSON المحميات يُحفظ مع الفهرس (الخريطة لا تسأل القاعدة عنه كل مرة)
+# - إعادة التحميل: فهرس جديد كامل ثم استبدال المرجع دفعة واحدة (atomic)،
+#   ومراقبة توقيع الجدول كل GEOFENCE_REFRESH_SECONDS
+# ======================================================
+import asyncio
+import logging
+import threading
+import time
+
+import numpy as np
+import shapely
+
+from services.readiness import readiness
+from config import GEOFENCE_REFRESH_SECONDS
+
+
+METERS_PER_DEGREE = 111320.0  # تقريب كافٍ لمسافات الـ hysteresis (عشرات الأمتار)
+
+
+class GeofenceIndex:
+    """فهرس ثابت (لا يتغير بعد البناء) → آمن للقراءة من أي thread بدون قفل"""
+
+    def __init__(self, rows, signature=None):
+        # rows: [(id, name, protection_level, wkb, geojson)] مرتبة حسب id
+        rows = sorted(rows, key=lambda r: r[0])
+        self.zones = [{"id": r[0], "name": r[1], "protection_level": r[2]} for r in rows]
+        self.positions = {zone["id"]: i for i, zone in enumerate(self.zones)}
+        self.geoms = shapely.from_wkb([bytes(r[3]) for r in rows]) if rows else np.empty(0, dtype=object)
+        shapely.prepare(self.geoms)
+        self.tree = shapely.STRtree(self.geoms)
+        self.signature = signature
+        self.loaded_at = time.time()
+
+        self.geojson = {
+            "type": "FeatureCollection",
+            "features": [
+                {"type": "Feature", "geometry": r[4], "properties": dict(zone)}
+                for r, zone in zip(rows, self.zones)
+            ],
+        }
+
+    def lookup_many(self, lons, lats) -> list:
+        """محمية كل نقطة (dict أو None) بنفس ترتيب النقاط"""
+        x = np.asarray(lons, dtype=np.float64)
+        y = np.asarray(lats, dtype=np.float64)
+        result = [None] * len(x)
+        if not len(x) or not self.zones:
+            return result
+
+        points, zones = self.tree.query(shapely.points(x, y))
+        if not len(points):
+            return result
+
+        inside = shapely.contains_xy(self.geoms[zones], x[points], y[points])
+        for point, zone in zip(points[inside], zones[inside]):
+            current = result[point]
+            if current is None or zone < current:
+                result[point] = zone
+        return [self.zones[z] if z is not None else None for z in result]
+
+    def lookup(self, lon: float, lat: float):
+        return self.lookup_many([lon], [lat])[0]
+
+    def near_zone(self, zone_id, lon: float, lat: float, meters: float) -> bool:
+        """النقطة داخل المحمية أو على بعد meters من حدودها"""
+        pos = self.positions.get(zone_id)
+        if pos is None:
+            return False
+        return bool(shapely.dwithin(self.geoms[pos], shapely.points(lon, lat), meters / METERS_PER_DEGREE))
+
+    def __len__(self):
+        return len(self.zones)
+
+
+class Geofence:
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._index = None
+        self._reload_lock = threading.Lock()
+        self.stats = {"reloads": 0, "lookups": 0, "points": 0}
+
+    @property
+    def ready(self) -> bool:
+        return self._index is not None
+
+    @property
+    def index(self) -> GeofenceIndex:
+        return self._index
+
+    # ======================================================
+    # التحميل
+    # ======================================================
+    def load(self, db, signature=None) -> GeofenceIndex:
+        with self._reload_lock:
+            started = time.perf_counter()
+            if signature is None:
+                signature = db.get_zones_signature()
+            index = GeofenceIndex(db.get_zones(), signature=signature)
+            self._index = index  # استبدال المرجع = تبديل atomic، القراءات الجارية تكمل على القديم
+            self.stats["reloads"] += 1
+            logging.info(
+                f"🗺️ Geofence: {len(index)} محمية في STRtree "
+                f"({(time.perf_counter() - started) * 1000:.1f} ms)"
+            )
+            return index
+
+    def refresh(self, db) -> bool:
+        """إعادة التحميل فقط إذا تغير جدول protected_zones"""
+        signature = db.get_zones_signature()
+        if self._index is not None and signature == self._index.signature:
+            return False
+        self.load(db, signature=signature)
+        return True
+
+    def start(self, db):
+        """التحميل الأول (عند بدء التطبيق): الفشل لا يوقف التطبيق، الاستعلام يرجع لـ PostGIS"""
+        readiness.loading("geofence")
+        try:
+            index = self.load(db)
+            readiness.ready("geofence", f"{len(index)} zones")
+        except Exception as e:
+            logging.warning(f"⚠️ تعذر تحميل الـ Geofence، سيتم استخدام PostGIS مباشرة: {e}")
+            readiness.ready("geofence", "PostGIS fallback")
+
+    async def watch(self, db):
+        """مهمة خلفية: مراقبة تغيّر المحميات وإعادة تحميلها"""
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                if await asyncio.to_thread(self.refresh, db):
+                    readiness.ready("geofence", f"{len(self._index)} zones")
+            except Exception as e:
+                logging.warning(f"⚠️ تعذر تحديث الـ Geofence (يبقى الفهرس الحالي): {e}")
+
+    # ======================================================
+    # الاستعلام
+    # ======================================================
+    def lookup(self, lat: float, lon: float):
+        index = self._index
+        self.stats["lookups"] += 1
+        self.stats["points"] += 1
+        return index.lookup(lon, lat) if index is not None else None
+
+    def near_zone(self, zone_id, lat: float, lon: float, meters: float) -> bool:
+        index = self._index
+        return index.near_zone(zone_id, lon, lat, meters) if index is not None else False
+
+    def lookup_many(self, coords) -> list:
+        """coords: [(lat, lon)]"""
+        index = self._index
+        self.stats["lookups"] += 1
+        self.stats["points"] += len(coords)
+        if index is None or not coords:
+            return [None] * len(coords)
+        lats, lons = zip(*coords)
+        return index.lookup_many(lons, lats)
+
+    def annotate_points(self, points_geojson: dict) -> dict:
+        """zone_name / protection_level لنقاط GeoJSON (بدل LATERAL ST_Contains لكل نقطة)"""
+        features = points_geojson.get("features", [])
+        coords = [tuple(reversed(f["geometry"]["coordinates"][:2])) for f in features]
+        for feature, zone in zip(features, self.lookup_many(coords)):
+            props = feature.setdefault("properties", {})
+            props["zone_name"] = zone["name"] if zone else None
+            props["protection_level"] = zone["protection_level"] if zone else None
+        return points_geojson
+
+    def zones_geojson(self):
+        index = self._index
+        return index.geojson if index is not None else None
+
+    def snapshot(self) -> dict:
+        index = self._index
+        return {
+            "ready": index is not None,
+            "zones": len(index) if index is not None else 0,
+            "loaded_at": index.loaded_at if index is not None else None,
+            "refresh_seconds": self.refresh_seconds,
+            **self.stats,
+        }
+
+
+# ======================================================
+# Instance واحد فقط للتطبيق
+# ======================================================
+geofence = Geofence(refresh_seconds=GEOFENCE_REFRESH_SECONDS)
@@ -0,0 +1,196 @@
+# geofence_events.py
+# ======================================================
+# أحداث الدخول / الخروج من المحميات لكل جهاز (بدل أن تسأل الواجهة /llm/map-data باستمرار):
+# - كل نقطة GPS تُقارن بحالة الجهاز السابقة (المحمية المؤكدة)
+# - hysteresis: الجهاز داخل محمية يبقى "داخلها" حتى يبتعد عن حدودها أكثر من
+#   GEOFENCE_HYSTERESIS_METERS (نقاط GPS المتذبذبة على الحد لا تُحسب خروجاً)
+# - dwell: الحالة الجديدة يجب أن تستمر GEOFENCE_DWELL_SECONDS قبل تأكيدها
+# - الأحداث: enter / exit / zone_changed → مشتركو الـ WebSocket (/llm/geofence/events)
+# - التنبيه الصوتي (play_alert) في thread منفصل، لا يوقف الـ event loop
+# - حالة جهاز لم يرسل نقطة منذ LOCATION_TTL_SECONDS تُحذف (مثل مخزن المواقع)
+# ======================================================
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+
+from services.geofence import geofence
+from services.utils import play_alert_background
+from config import (
+    ALERT_SOUND,
+    GEOFENCE_HYSTERESIS_METERS,
+    GEOFENCE_DWELL_SECONDS,
+    GEOFENCE_ALERT_EVENTS,
+    GEOFENCE_ALERT_MAX_AGE_SECONDS,
+    GEOFENCE_EVENTS_QUEUE,
+    DEFAULT_DEVICE_ID,
+    LOCATION_TTL_SECONDS,
+)
+
+
+_UNSET = object()
+PRUNE_EVERY_SECONDS = 30  # أقل فاصل بين مرورين على الأجهزة لحذف المنتهية
+
+
+def _zone_id(zone):
+    return zone["id"] if zone else None
+
+
+# ======================================================
+# المشتركون (WebSocket)
+# ======================================================
+class EventHub:
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self.stats = {"published": 0, "dropped": 0}
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, event: dict):
+        """يُستدعى من الـ event loop؛ مشترك بطيء لا يوقف الآخرين (أقدم حدث عنده يُحذف)"""
+        self.stats["published"] += 1
+        for queue in list(self._subscribers):
+            if queue.full():
+                try:
+                    queue.get_nowait()
+                    self.stats["dropped"] += 1
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(event)
+
+    def __len__(self):
+        return len(self._subscribers)
+
+
+# ======================================================
+# حالة الأجهزة والأحداث
+# ======================================================
+class GeofenceEvents:
+    def __init__(self, hub: EventHub, hysteresis_m: float, dwell_seconds: float, ttl_seconds: float = 300):
+        self.hub = hub
+        self.hysteresis_m = hysteresis_m
+        self.dwell_seconds = dwell_seconds
+        self.ttl_seconds = ttl_seconds
+        # device_id → {"zone", "candidate", "since", "updated", "seen"}
+        # updated: وقت النقطة (قد يكون قديماً لمسار مرفوع)، seen: وقت وصولها للسيرفر
+        self.devices = {}
+        self._pruned_at = time.time()
+        self.stats = {"fixes": 0, "suppressed": 0, "alerts": 0, "pruned": 0}
+
+    def observe(self, device_id, lat: float, lon: float, zone=_UNSET, ts: float = None) -> list:
+        """
+        نقطة جديدة لجهاز → قائمة الأحداث المؤكدة (غالباً فارغة)
+        zone: المحمية من geofence.lookup إن كانت محسوبة مسبقاً
+        ts: وقت النقطة (epoch ثوانٍ)؛ الافتراضي الآن
+        """
+        device_id = device_id or DEFAULT_DEVICE_ID
+        now = time.time()
+        ts = now if ts is None else ts
+        if zone is _UNSET:
+            zone = geofence.lookup(lat, lon)
+        self.stats["fixes"] += 1
+        self.prune(now)
+
+        state = self.devices.setdefault(device_id, {"zone": None, "candidate": None, "since": None})
+        state["updated"] = ts
+        state["seen"] = now
+        current = state["zone"]
+
+        # hysteresis: خارج كل المحميات لكن قريب من حدود المحمية الحالية → ما زال داخلها
+        if current and zone is None and geofence.near_zone(current["id"], lat, lon, self.hysteresis_m):
+            zone = current
+
+        if _zone_id(zone) == _zone_id(current):
+            if state["candidate"] is not None:
+                self.stats["suppressed"] += 1
+            state["candidate"] = None
+            state["since"] = None
+            return []
+
+        # dwell: الحالة الجديدة يجب أن تستمر قبل تأكيدها
+        if state["since"] is None or _zone_id(state["candidate"]) != _zone_id(zone):
+            state["candidate"] = zone
+            state["since"] = ts
+        if ts - state["since"] < self.dwell_seconds:
+            return []
+
+        state["zone"] = zone
+        state["candidate"] = None
+        state["since"] = None
+
+        if current is None:
+            kind = "enter"
+        elif zone is None:
+            kind = "exit"
+        else:
+            kind = "zone_changed"
+
+        event = {
+            "type": kind,
+            "device_id": device_id,
+            "zone": zone,
+            "previous_zone": current,
+            "lat": lat,
+            "lon": lon,
+            "timestamp": datetime.fromtimestamp(ts, tz=timezone.utc).isoformat(),
+        }
+        self._emit(event, ts)
+        return [event]
+
+    def _emit(self, event: dict, ts: float):
+        zone = event["zone"] or event["previous_zone"]
+        logging.info(f"🚧 {event['type']}: {event['device_id']} → {zone['name'] if zone else '-'}")
+        self.hub.publish(event)
+
+        # نقاط قديمة (مسار مرفوع بعد عودة الاتصال) تُرسل كأحداث بدون تنبيه صوتي
+        if event["type"] in GEOFENCE_ALERT_EVENTS and time.time() - ts <= GEOFENCE_ALERT_MAX_AGE_SECONDS:
+            if play_alert_background(ALERT_SOUND):
+                self.stats["alerts"] += 1
+
+    def prune(self, now: float = None, force: bool = False) -> int:
+        """حذف الأجهزة التي لم تصل منها نقطة منذ ttl_seconds (بحسب وقت الوصول، لا وقت النقطة)"""
+        now = time.time() if now is None else now
+        if not force and now - self._pruned_at < PRUNE_EVERY_SECONDS:
+            return 0
+        self._pruned_at = now
+        expired = [d for d, s in self.devices.items() if now - s["seen"] > self.ttl_seconds]
+        for device_id in expired:
+            del self.devices[device_id]
+        self.stats["pruned"] += len(expired)
+        return len(expired)
+
+    def states(self) -> dict:
+        """الحالة الحالية لكل جهاز (أول رسالة لمشترك جديد)"""
+        return {
+            device_id: {"zone": s["zone"], "updated": s.get("updated")}
+            for device_id, s in self.devices.items()
+        }
+
+    def snapshot(self) -> dict:
+        return {
+            "devices": len(self.devices),
+            "subscribers": len(self.hub),
+            "hysteresis_m": self.hysteresis_m,
+            "dwell_seconds": self.dwell_seconds,
+            **self.stats,
+            **self.hub.stats,
+        }
+
+
+# ======================================================
+# Instance واحد فقط للتطبيق
+# ======================================================
+event_hub = EventHub(queue_size=GEOFENCE_EVENTS_QUEUE)
+geofence_events = GeofenceEvents(
+    hub=event_hub,
+    hysteresis_m=GEOFENCE_HYSTERESIS_METERS,
+    dwell_seconds=GEOFENCE_DWELL_SECONDS,
+    ttl_seconds=LOCATION_TTL_SECONDS,
+)
@@ -0,0 +1,211 @@
+# gps_ingestor.py
+# ======================================================
+# خدمة GPS في الخلفية (asyncio):
+# - القراءة من GPSReader (محاكاة أو NMEA) داخل thread → الـ event loop لا يتوقف
+# - كل قراءة تُحدد محميتها من الـ Geofence في الذاكرة وتحدّث الموقع الحالي
+#   وتمر على geofence_events (أحداث الدخول / الخروج للـ WebSocket)
+# - الـ Geofence غير محمّل (PostGIS fallback) → المحمية من db.find_zone في thread
+#   (نفس add-point)، بدون أحداث: لا تُسجل نقطة داخل محمية كأنها خارجها
+# - الحفظ فقط عند الحاجة (debouncing):
+#     تحرك >= MOVE_THRESHOLD_METERS (haversine) ومرت SAVE_INTERVAL ثانية منذ آخر حفظ
+#     أو دخول / خروج من محمية (يُحفظ فوراً)
+#     أو مرت GPS_HEARTBEAT_SECONDS بدون حفظ (الجهاز واقف)
+# - النقاط المحفوظة تُكتب في officer_tracking دفعات (GPS_BATCH_SIZE / GPS_FLUSH_SECONDS)
+# ======================================================
+import asyncio
+import logging
+import time
+from datetime import datetime
+
+from services.gps_reader import GPSReader
+from services.geofence import geofence
+from services.geofence_events import geofence_events
+from services.location_store import location_store
+from services.utils import moved_meters
+from config import (
+    SERIAL_PORT,
+    BAUD_RATE,
+    SAVE_INTERVAL,
+    MOVE_THRESHOLD_METERS,
+    GPS_SIMULATE,
+    GPS_DEVICE_ID,
+    GPS_HEARTBEAT_SECONDS,
+    GPS_BATCH_SIZE,
+    GPS_FLUSH_SECONDS,
+)
+
+
+MAX_BUFFERED = 10000  # حد النقاط المنتظرة إذا تعطلت القاعدة (الأقدم يُحذف)
+
+
+class GPSIngestor:
+    def __init__(self, min_interval: float, move_threshold_m: float, heartbeat: float,
+                 batch_size: int, flush_seconds: float, device_id=None):
+        self.min_interval = min_interval
+        self.move_threshold_m = move_threshold_m
+        self.heartbeat = heartbeat
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.device_id = device_id
+
+        self._buffer = []
+        self._last_saved = None      # (lat, lon, monotonic, inside)
+        self._last_flush = time.monotonic()
+        self._task = None
+        self.stats = {
+            "fixes": 0, "saved": 0, "skipped": 0, "zone_changes": 0,
+            "flushes": 0, "read_errors": 0, "write_errors": 0, "zone_errors": 0,
+        }
+
+    # ======================================================
+    # قرار الحفظ
+    # ======================================================
+    def should_save(self, lat: float, lon: float, inside: bool, now: float):
+        """سبب الحفظ أو None (النقطة تُهمل)"""
+        if self._last_saved is None:
+            return "first"
+        last_lat, last_lon, last_time, last_inside = self._last_saved
+        elapsed = now - last_time
+
+        if inside != last_inside:
+            return "zone"
+        if elapsed >= self.heartbeat:
+            return "heartbeat"
+        if elapsed >= self.min_interval and moved_meters(last_lat, last_lon, lat, lon, self.move_threshold_m):
+            return "moved"
+        return None
+
+    async def ingest_point(self, db, lat: float, lon: float):
+        """قراءة من الجهاز: المحمية من الـ Geofence، أو من PostGIS إذا لم يُحمّل"""
+        if geofence.ready:
+            return self.ingest(lat, lon, geofence.lookup(lat, lon))
+        try:
+            row = await asyncio.to_thread(db.find_zone, lat, lon)
+        except Exception as e:
+            # المحمية غير معروفة → لا نحفظ النقطة كأنها خارج المحميات
+            self.stats["zone_errors"] += 1
+            logging.warning(f"⚠️ تعذر تحديد محمية نقطة GPS: {e}")
+            return None
+        zone = {"name": row[0], "protection_level": row[1]} if row else None
+        return self.ingest(lat, lon, zone, events=False)
+
+    def ingest(self, lat: float, lon: float, zone, now: float = None, events: bool = True):
+        """
+        قراءة واحدة: الموقع الحالي + إضافتها للدفعة إن لزم
+        zone: المحمية المحسوبة مسبقاً (أو None)
+        events: أحداث الدخول / الخروج تحتاج محمية من الـ Geofence (id + الحدود للـ hysteresis)
+        """
+        now = time.monotonic() if now is None else now
+        self.stats["fixes"] += 1
+
+        inside = zone is not None
+        timestamp = datetime.utcnow()
+        if events:
+            geofence_events.observe(self.device_id, lat, lon, zone)
+
+        location_store.put(
+            self.device_id,
+            inside,
+            zone["name"] if zone else None,
+            zone["protection_level"] if zone else None,
+            timestamp=timestamp,
+        )
+
+        reason = self.should_save(lat, lon, inside, now)
+        if reason is None:
+            self.stats["skipped"] += 1
+            return None
+
+        if reason == "zone":
+            self.stats["zone_changes"] += 1
+
+        self._last_saved = (lat, lon, now, inside)
+        self._buffer.append((lat, lon, timestamp, inside, self.device_id))
+        self.stats["saved"] += 1
+        return reason
+
+    def due_flush(self, now: float = None) -> bool:
+        now = time.monotonic() if now is None else now
+        return bool(self._buffer) and (
+            len(self._buffer) >= self.batch_size or now - self._last_flush >= self.flush_seconds
+        )
+
+    async def flush(self, db):
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return 0
+        rows, self._buffer = self._buffer, []
+        try:
+            await asyncio.to_thread(db.save_points, rows)
+        except Exception as e:
+            # القاعدة غير متاحة مؤقتاً → نعيد النقاط للدفعة التالية
+            self.stats["write_errors"] += 1
+            self._buffer = (rows + self._buffer)[-MAX_BUFFERED:]
+            logging.error(f"❌ تعذر حفظ نقاط GPS ({len(rows)}): {e}")
+            return 0
+        self.stats["flushes"] += 1
+        return len(rows)
+
+    # ======================================================
+    # الحلقة
+    # ======================================================
+    async def run(self, db, reader=None):
+        reader = reader or await asyncio.to_thread(GPSReader, SERIAL_PORT, BAUD_RATE, GPS_SIMULATE)
+        logging.info(
+            f"🛰️ GPS ingestor: حد الحركة {self.move_threshold_m} م، "
+            f"أقل فاصل {self.min_interval} ث، دفعات {self.batch_size}"
+        )
+        try:
+            while True:
+                try:
+                    point = await asyncio.to_thread(reader.read_point)
+                except Exception as e:
+                    self.stats["read_errors"] += 1
+                    logging.warning(f"⚠️ خطأ في قراءة GPS: {e}")
+                    await asyncio.sleep(1)
+                    point = None
+
+                if point is not None:
+                    await self.ingest_point(db, point[0], point[1])
+                if self.due_flush():
+                    await self.flush(db)
+        finally:
+            # الإيقاف: حفظ ما تبقى في الدفعة
+            await self.flush(db)
+            await asyncio.to_thread(reader.close)
+
+    def start(self, db):
+        self._task = asyncio.create_task(self.run(db))
+        return self._task
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def snapshot(self) -> dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "buffered": len(self._buffer),
+            "move_threshold_m": self.move_threshold_m,
+            "min_interval_seconds": self.min_interval,
+            "heartbeat_seconds": self.heartbeat,
+            **self.stats,
+        }
+
+
+# ======================================================
+# Instance واحد فقط للتطبيق
+# ======================================================
+gps_ingestor = GPSIngestor(
+    min_interval=SAVE_INTERVAL,
+    move_threshold_m=MOVE_THRESHOLD_METERS,
+    heartbeat=GPS_HEARTBEAT_SECONDS,
+    batch_size=GPS_BATCH_SIZE,
+    flush_seconds=GPS_FLUSH_SECONDS,
+    device_id=GPS_DEVICE_ID,
+)
@@ -1,13 +1,77 @@
 import time
 import random
+import logging
+
+
+# ======================================================
+# قراءة NMEA (GGA / RMC) بدون مكتبات إضافية
+# ======================================================
+def _nmea_checksum_ok(sentence: str) -> bool:
+    if "*" not in sentence:
+        return True  # بعض الأجهزة لا ترسل checksum
+    body, checksum = sentence[1:].split("*", 1)
+    value = 0
+    for ch in body:
+        value ^= ord(ch)
+    try:
+        return value == int(checksum[:2], 16)
+    except ValueError:
+        return False
+
+
+def _nmea_coord(value: str, hemisphere: str, degree_digits: int):
+    if not value:
+        return None
+    coord = float(value[:degree_digits]) + float(value[degree_digits:]) / 60.0
+    return -coord if hemisphere in ("S", "W") else coord
+
+
+def parse_nmea(sentence: str):
+    """(lat, lon) من جملة GGA أو RMC صالحة وبها fix، وإلا None"""
+    sentence = (sentence or "").strip()
+    if not sentence.startswith("$") or not _nmea_checksum_ok(sentence):
+        return None
+
+    fields = sentence.split("*", 1)[0].split(",")
+    kind = fields[0][3:]  # GPGGA / GNGGA → GGA
+    try:
+        if kind == "GGA" and len(fields) > 6 and fields[6] not in ("", "0"):
+            lat = _nmea_coord(fields[2], fields[3], 2)
+            lon = _nmea_coord(fields[4], fields[5], 3)
+        elif kind == "RMC" and len(fields) > 6 and fields[2] == "A":
+            lat = _nmea_coord(fields[3], fields[4], 2)
+            lon = _nmea_coord(fields[5], fields[6], 3)
+        else:
+            return None
+    except ValueError:
+        return None
+
+    if lat is None or lon is None:
+        return None
+    return lat, lon
+
 
 class GPSReader:
-    def __init__(self, port, baud_rate):
-        # في وضع المحاكاة، لا نحتاج لفتح المنفذ الحقيقي
-        print(f"🛠️ تم تشغيل محاكي GPS (Port: {port})")
+    def __init__(self, port, baud_rate, simulate=True, timeout=2.0):
+        self.simulate = simulate
+        self.serial = None
+        if simulate:
+            # في وضع المحاكاة، لا نحتاج لفتح المنفذ الحقيقي
+            print(f"🛠️ تم تشغيل محاكي GPS (Port: {port})")
+        else:
+            import serial  # pyserial (فقط مع جهاز GPS حقيقي)
+            self.serial = serial.Serial(port, baud_rate, timeout=timeout)
+            print(f"🛰️ تم فتح منفذ GPS: {port} ({baud_rate})")
 
     def read_point(self):
-        """إرسال إحداثيات افتراضية لمحاكاة التواجد في الرياض"""
+        """
+        قراءة نقطة واحدة (blocking: تُستدعى من thread وليس من الـ event loop)
+        المحاكاة: إحداثيات قريبة من الرياض كل ثانية
+        الجهاز: أول جملة NMEA بها fix، أو None عند انتهاء مهلة القراءة
+        """
+        if not self.simulate:
+            return self._read_nmea()
+
         # يمكنك تغيير هذه القيم لاختبار الدخول والخروج من الـ Geofence
         # إحداثيات افتراضية للرياض
         base_lat = 24.7136
@@ -20,5 +84,21 @@ class GPSReader:
         time.sleep(1) # محاكاة تأخير القراءة الحقيقية
         return lat, lon
 
+    def _read_nmea(self):
+        deadline = time.monotonic() + (self.serial.timeout or 2.0)
+        while time.monotonic() < deadline:
+            line = self.serial.readline().decode("ascii", errors="ignore")
+            if not line:
+                return None
+            point = parse_nmea(line)
+            if point is not None:
+                return point
+        return None
+
     def close(self):
-        pass
\ No newline at end of file
+        if self.serial is not None:
+            try:
+                self.serial.close()
+            except Exception as e:
+                logging.warning(f"⚠️ خطأ أثناء إغلاق منفذ GPS: {e}")
+            self.serial = None
\ No newline at end of file
@@ -0,0 +1,122 @@
+# hybrid_retriever.py
+# ======================================================
+# استرجاع هجين: FAISS (دلالي) + BM25 (لفظي)
+# يتم دمج الترتيبين بـ Reciprocal Rank Fusion (RRF)
+# حتى تبقى k صغيرة (والبرومبت قصير) مع التقاط المصطلحات الدقيقة
+#
+# البحث المفلتر حسب مستوى الحماية:
+# - FAISS: IDSelector على مواقع متجهات القسم فقط
+# - BM25 : allowed = أرقام chunks القسم فقط
+# السؤال يُرسل كما هو (بدون تعليمات إضافية تشوّه الـ embedding)
+# البحث الدلالي يمر عبر retrieval_batcher (تجميع الأسئلة المتزامنة في دفعة واحدة)
+# ======================================================
+import logging
+import threading
+
+import numpy as np
+import faiss
+
+from services.retrieval_batcher import retrieval_batcher
+
+
+PARTITION_KEY = "protection_level"
+
+
+class HybridRetriever:
+    """نفس واجهة retriever الخاصة بـ LangChain: invoke(query) -> list[Document]"""
+
+    def __init__(self, vs, lexical, k: int = 2, fetch_k: int = 8, rrf_k: int = 60):
+        self.vs = vs
+        self.lexical = lexical
+        self.k = k
+        self.fetch_k = fetch_k
+        self.rrf_k = rrf_k
+
+        # قسم → (مواقع المتجهات، IDSelector) / أرقام chunks الفهرس اللفظي
+        self._vector_partitions = {}
+        self._lexical_partitions = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(doc) -> str:
+        return (doc.page_content or "").strip()
+
+    def _fuse(self, ranked_lists):
+        scores = {}
+        docs = {}
+        for ranked in ranked_lists:
+            for rank, doc in enumerate(ranked):
+                key = self._key(doc)
+                scores[key] = scores.get(key, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+                docs.setdefault(key, doc)
+
+        ordered = sorted(scores, key=lambda key: scores[key], reverse=True)
+        return [docs[key] for key in ordered[:self.k]]
+
+    # ======================================================
+    # أقسام الـ metadata
+    # ======================================================
+    def _vector_partition(self, value: str):
+        with self._lock:
+            if value in self._vector_partitions:
+                return self._vector_partitions[value]
+
+            docstore = self.vs.docstore
+            positions = None
+            if hasattr(docstore, "partition"):
+                positions = docstore.partition(PARTITION_KEY, value)
+
+            if positions is None:
+                # docstore في الذاكرة (أو قديم بدون أقسام): قراءة الـ metadata مرة واحدة
+                positions = []
+                for pos, doc_id in self.vs.index_to_docstore_id.items():
+                    doc = docstore.search(doc_id)
+                    if not isinstance(doc, str) and doc.metadata.get(PARTITION_KEY) == value:
+                        positions.append(pos)
+
+            ids = np.asarray(sorted(positions), dtype=np.int64)
+            selector = faiss.IDSelectorBatch(ids) if len(ids) else None
+            self._vector_partitions[value] = (ids, selector)
+            return self._vector_partitions[value]
+
+    def _lexical_partition(self, value: str) -> set:
+        with self._lock:
+            if value not in self._lexical_partitions:
+                self._lexical_partitions[value] = {
+                    i for i, doc in enumerate(self.lexical.docs)
+                    if doc.metadata.get(PARTITION_KEY) == value
+                }
+            return self._lexical_partitions[value]
+
+    def _vector_search(self, query: str, k: int, selector=None):
+        found = retrieval_batcher.search(self.vs, query, k, selector)
+
+        docs = []
+        for pos in found:
+            if pos < 0:
+                continue
+            doc = self.vs.docstore.search(self.vs.index_to_docstore_id[int(pos)])
+            if not isinstance(doc, str):
+                docs.append(doc)
+        return docs
+
+    # ======================================================
+    # البحث
+    # ======================================================
+    def invoke(self, query: str, protection_level: str = None):
+        ids, selector = self._vector_partition(protection_level) if protection_level else (None, None)
+
+        if selector is None:
+            if protection_level:
+                logging.info(f"ℹ️ لا يوجد قسم للمستوى '{protection_level}'، سيتم البحث في كل المرجع")
+            vector_docs = self._vector_search(query, self.fetch_k)
+            allowed = None
+        else:
+            vector_docs = self._vector_search(query, min(self.fetch_k, len(ids)), selector)
+            allowed = self._lexical_partition(protection_level)
+
+        lexical_docs = [
+            self.lexical.docs[idx]
+            for idx, _ in self.lexical.search(query, k=self.fetch_k, allowed=allowed)
+        ]
+        return self._fuse([vector_docs, lexical_docs])
@@ -0,0 +1,158 @@
+# index_policy.py
+# ======================================================
+# سياسات فهرس FAISS لكل PDF مسجّل
+# - flat  : بحث دقيق (الافتراضي)
+# - hnsw  : رسم بياني تقريبي سريع
+# - ivfpq : تقسيم + ضغط Product Quantization (أصغر حجماً)
+# - sq8   : ضغط int8 لكل بُعد (ربع حجم float32)
+# الفهرس الدقيق (index.faiss) يبقى المرجع للتحديث وقياس الـ recall
+# ======================================================
+import logging
+import math
+import time
+
+import numpy as np
+import faiss
+
+
+INDEX_POLICIES = ("flat", "hnsw", "ivfpq", "sq8")
+
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 40
+HNSW_EF_SEARCH = 64
+
+IVF_NPROBE = 8
+PQ_NBITS = 8
+# تدريب PQ بـ 8 bits يحتاج ~39 نقطة لكل مركز (256 مركزاً)، وإلا نرجع لـ sq8
+IVFPQ_MIN_VECTORS = 39 * (1 << PQ_NBITS)
+
+REPORT_K = 10
+REPORT_QUERIES = 100
+
+
+def normalize_policy(policy) -> str:
+    policy = (policy or "flat").strip().lower()
+    if policy not in INDEX_POLICIES:
+        logging.warning(f"⚠️ سياسة فهرس غير معروفة '{policy}'، سيتم استخدام flat")
+        return "flat"
+    return policy
+
+
+def index_filename(policy: str) -> str:
+    return "index.faiss" if policy == "flat" else f"index.{policy}.faiss"
+
+
+def exact_vectors(index) -> np.ndarray:
+    """استخراج المتجهات من الفهرس الدقيق بنفس ترتيب المواقع"""
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype=np.float32)
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def _pq_subquantizers(d: int) -> int:
+    # أكبر قاسم للبُعد لا يتجاوز 48 (384 → 48 جزءاً كل منها 8 أبعاد)
+    for m in range(min(48, d), 0, -1):
+        if d % m == 0:
+            return m
+    return 1
+
+
+def build_index(policy: str, vectors: np.ndarray):
+    """بناء فهرس حسب السياسة مع الحفاظ على ترتيب المواقع (0..n-1)"""
+    policy = normalize_policy(policy)
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, d = vectors.shape
+
+    if policy == "ivfpq" and n < IVFPQ_MIN_VECTORS:
+        logging.warning(
+            f"⚠️ عدد المتجهات ({n}) أقل من اللازم لتدريب IVF-PQ، سيتم استخدام sq8"
+        )
+        policy = "sq8"
+
+    if policy == "flat":
+        index = faiss.IndexFlatL2(d)
+
+    elif policy == "hnsw":
+        index = faiss.IndexHNSWFlat(d, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+
+    elif policy == "ivfpq":
+        nlist = max(1, min(int(4 * math.sqrt(n)), n // 39))
+        quantizer = faiss.IndexFlatL2(d)
+        index = faiss.IndexIVFPQ(quantizer, d, nlist, _pq_subquantizers(d), PQ_NBITS)
+        index.train(vectors)
+        index.nprobe = min(IVF_NPROBE, nlist)
+
+    else:  # sq8
+        index = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+        index.train(vectors)
+
+    if n:
+        index.add(vectors)
+    return index, policy
+
+
+def search_parameters(index, selector):
+    """معاملات بحث مع IDSelector (بحث مفلتر داخل قسم من الفهرس) حسب نوع الفهرس"""
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+
+    return faiss.SearchParameters(sel=selector)
+
+
+def _timed_search(index, queries: np.ndarray, k: int):
+    start = time.perf_counter()
+    _, ids = index.search(queries, k)
+    elapsed = time.perf_counter() - start
+    return ids, (elapsed * 1000.0) / max(len(queries), 1)
+
+
+def evaluate(exact_index, candidate_index, policy: str, k: int = REPORT_K, n_queries: int = REPORT_QUERIES) -> dict:
+    """
+    تقرير صغير: recall@k مقابل الفهرس الدقيق + زمن البحث لكل استعلام + الحجم.
+    الاستعلامات عيّنة من المتجهات المخزنة نفسها.
+    """
+    n = exact_index.ntotal
+    k = max(1, min(k, n))
+    vectors = exact_vectors(exact_index)
+
+    rng = np.random.default_rng(0)
+    sample = rng.choice(n, size=min(n_queries, n), replace=False) if n else []
+    queries = np.ascontiguousarray(vectors[sample], dtype=np.float32)
+
+    exact_ids, exact_ms = _timed_search(exact_index, queries, k)
+    cand_ids, cand_ms = _timed_search(candidate_index, queries, k)
+
+    hits = 0
+    for truth, found in zip(exact_ids, cand_ids):
+        hits += len(set(truth.tolist()) & set(found.tolist()))
+    recall = hits / float(len(queries) * k) if len(queries) else 1.0
+
+    return {
+        "policy": policy,
+        "ntotal": n,
+        "k": k,
+        "queries": len(queries),
+        "recall_at_k": round(recall, 4),
+        "exact_latency_ms": round(exact_ms, 4),
+        "latency_ms": round(cand_ms, 4),
+        "exact_size_bytes": int(faiss.serialize_index(exact_index).size),
+        "size_bytes": int(faiss.serialize_index(candidate_index).size),
+    }
+
+
+def compare_policies(exact_index, policies=INDEX_POLICIES) -> list:
+    """تقرير لكل السياسات على نفس المتجهات (للمقارنة قبل اختيار سياسة PDF)"""
+    vectors = exact_vectors(exact_index)
+    reports = []
+    for policy in policies:
+        candidate, used = build_index(policy, vectors)
+        report = evaluate(exact_index, candidate, used)
+        report["requested_policy"] = policy
+        reports.append(report)
+    return reports
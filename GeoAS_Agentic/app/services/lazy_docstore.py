@@ -0,0 +1,150 @@
+# lazy_docstore.py
+# ======================================================
+# Docstore بدون pickle:
+# - docstore.jsonl : سطر JSON لكل chunk (id + text + metadata) بترتيب متجهات FAISS
+# - docstore.idx.json : قائمة المعرّفات + (بداية، طول) كل سطر داخل الملف
+#                       + أقسام الـ metadata (قيمة → مواقع المتجهات) للبحث المفلتر
+# الملف يُربط بالذاكرة (mmap) ولا يُقرأ نص الـ chunk إلا عند طلبه (نتائج top-k فقط)
+# ======================================================
+import json
+import mmap
+import os
+import threading
+from pathlib import Path
+
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+
+
+DOCSTORE_FILE = "docstore.jsonl"
+DOCSTORE_INDEX_FILE = "docstore.idx.json"
+PARTITION_KEYS = ("protection_level", "violation_type")
+
+
+def docstore_exists(store_path: Path) -> bool:
+    return (store_path / DOCSTORE_FILE).exists() and (store_path / DOCSTORE_INDEX_FILE).exists()
+
+
+def write_docstore(store_path: Path, index_to_docstore_id: dict, docstore, partition_keys=PARTITION_KEYS):
+    """كتابة الـ docstore بترتيب مواقع المتجهات داخل الفهرس (كتابة ذرّية)"""
+    def rows():
+        for pos in sorted(index_to_docstore_id):
+            doc_id = index_to_docstore_id[pos]
+            doc = docstore.search(doc_id)
+            if isinstance(doc, str):
+                raise ValueError(f"chunk مفقود من الـ docstore: {doc_id}")
+            yield doc_id, doc.page_content, doc.metadata
+
+    return write_docstore_rows(store_path, rows(), partition_keys)
+
+
+def write_docstore_rows(store_path: Path, rows, partition_keys=PARTITION_KEYS):
+    """
+    نفس الصيغة من تدفق (id, text, metadata) بترتيب المتجهات،
+    بدون تحميل كل الـ chunks في الذاكرة (يُستخدم لدمج الـ shards)
+    """
+    data_file = store_path / DOCSTORE_FILE
+    index_file = store_path / DOCSTORE_INDEX_FILE
+    tmp_data = data_file.with_suffix(".tmp")
+    tmp_index = index_file.with_suffix(".tmp")
+
+    ids = []
+    offsets = []
+    partitions = {key: {} for key in partition_keys}
+    position = 0
+    with open(tmp_data, "wb") as f:
+        for doc_id, text, metadata in rows:
+            line = json.dumps(
+                {"id": doc_id, "text": text, "metadata": metadata},
+                ensure_ascii=False
+            ).encode("utf-8") + b"\n"
+            f.write(line)
+
+            for key in partition_keys:
+                value = metadata.get(key)
+                if value is not None:
+                    partitions[key].setdefault(str(value), []).append(len(ids))
+
+            ids.append(doc_id)
+            offsets.append([position, len(line)])
+            position += len(line)
+
+    with open(tmp_index, "w", encoding="utf-8") as f:
+        json.dump({"ids": ids, "offsets": offsets, "partitions": partitions}, f)
+
+    os.replace(tmp_data, data_file)
+    os.replace(tmp_index, index_file)
+    return ids
+
+
+def _read_index(store_path: Path):
+    with open(store_path / DOCSTORE_INDEX_FILE, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data["ids"], data["offsets"], data.get("partitions") or {}
+
+
+def load_in_memory(store_path: Path):
+    """قراءة كاملة (لمسار التحديث فقط): InMemoryDocstore + index_to_docstore_id"""
+    ids, _, _ = _read_index(store_path)
+    docs = {}
+    with open(store_path / DOCSTORE_FILE, "r", encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line)
+            docs[row["id"]] = Document(page_content=row["text"], metadata=row["metadata"])
+    return InMemoryDocstore(docs), dict(enumerate(ids))
+
+
+class LazyJsonlDocstore(Docstore):
+    """Docstore للقراءة فقط، يفك ترميز الـ chunk المطلوب فقط"""
+
+    def __init__(self, store_path: Path):
+        self.store_path = Path(store_path)
+        self.ids, offsets, self._partitions = _read_index(self.store_path)
+        self._offsets = dict(zip(self.ids, offsets))
+        self._lock = threading.Lock()
+
+        self._file = open(self.store_path / DOCSTORE_FILE, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    def index_to_docstore_id(self) -> dict:
+        return dict(enumerate(self.ids))
+
+    def _read_row(self, doc_id: str):
+        entry = self._offsets.get(doc_id)
+        if entry is None or self._mm is None:
+            return None
+        start, length = entry
+        return json.loads(self._mm[start:start + length])
+
+    def search(self, search: str):
+        row = self._read_row(search)
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row["text"], metadata=row["metadata"])
+
+    def metadata(self, doc_id: str) -> dict:
+        row = self._read_row(doc_id)
+        return row["metadata"] if row else {}
+
+    def partition(self, key: str, value: str):
+        """مواقع المتجهات التي قيمة key فيها = value (None إذا لم يُفهرس هذا المفتاح)"""
+        if key not in self._partitions:
+            return None
+        return self._partitions[key].get(str(value), [])
+
+    def delete(self, ids):
+        raise NotImplementedError("LazyJsonlDocstore للقراءة فقط")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def close(self):
+        with self._lock:
+            if self._mm is not None:
+                self._mm.close()
+                self._mm = None
+            if self._file:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,74 @@
+# lexical_index.py
+# ======================================================
+# فهرس لفظي مقلوب (BM25) مبني من ملفات الـ chunks المحفوظة
+# vectorstores/chunks/*_chunks.json
+# يلتقط المصطلحات الدقيقة (صيد، رعي، احتطاب، قيم الغرامات)
+# التي قد يفوّتها البحث الدلالي
+# ======================================================
+import json
+import logging
+import math
+from collections import Counter
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+from services.arabic_text import tokenize
+
+
+class BM25Index:
+    def __init__(self, docs, k1: float = 1.5, b: float = 0.75):
+        self.docs = list(docs)
+        self.k1 = k1
+        self.b = b
+
+        self.postings = {}  # term -> [(doc_idx, tf)]
+        self.doc_lengths = []
+
+        for i, doc in enumerate(self.docs):
+            counts = Counter(tokenize(doc.page_content))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((i, tf))
+
+        n = len(self.docs)
+        self.avg_length = (sum(self.doc_lengths) / n) if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for term, plist in self.postings.items()
+        }
+
+    @classmethod
+    def from_chunks_file(cls, path):
+        path = Path(path)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        docs = [
+            Document(page_content=row.get("text") or "", metadata=row.get("metadata") or {})
+            for row in data
+        ]
+        logging.info(f"🔤 فهرس لفظي: {len(docs)} chunk من {path.name}")
+        return cls(docs)
+
+    def search(self, query: str, k: int = 10, allowed=None):
+        """
+        يرجّع [(doc_idx, score)] مرتبة تنازلياً.
+        allowed: مجموعة اختيارية من أرقام الـ docs المسموح بها
+        """
+        scores = {}
+        for term in set(tokenize(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = self.idf[term]
+            for doc_idx, tf in plist:
+                if allowed is not None and doc_idx not in allowed:
+                    continue
+                length_norm = 1 - self.b + self.b * (self.doc_lengths[doc_idx] / (self.avg_length or 1))
+                scores[doc_idx] = scores.get(doc_idx, 0.0) + idf * (tf * (self.k1 + 1)) / (tf + self.k1 * length_norm)
+
+        return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:k]
+
+    def __len__(self):
+        return len(self.docs)
@@ -0,0 +1,299 @@
+# lexicon.py
+# ======================================================
+# محرك كلمات مفتاحية موحد (Aho-Corasick):
+# - كل الفئات (نية السؤال، نوع المخالفة، مستوى الحماية، أسماء المحميات ...)
+#   تُقرأ من lexicon.json وتُبنى في automaton واحد عند التحميل
+# - مرور واحد على النص يرجّع كل الفئات المطابقة (بدل any(word in q ...) لكل قائمة)
+# - توحيد عربي للنص والكلمات بنفس الطريقة (همزات، ى/ي، ة/ه، تشكيل، علامات ترقيم)
+#
+# صيغة الملف:
+#   {"intent.penalty": {"terms": ["غرامة", "كم"]},
+#    "reserve.turki": {"terms": ["تركي"], "value": "الإمام تركي", "whole_word": true}}
+# ترتيب الفئات في الملف = الأولوية عند اختيار فئة واحدة من مجموعة (first / first_value)
+# الكلمة كما كُتبت في النص الأصلي (بهمزتها وتشكيلها): first_text / source_text
+#
+# مقارنة الزمن مع المسح بـ any():
+#   python -m services.lexicon --terms 500 --queries 2000
+#
+# الملف نفسه في التطبيقين (GeoAS_Agentic/app و المساعد الجيومكاني الذكي):
+# أي تعديل يُنسخ للنسختين كما هو (tests/test_shared_modules.py يتحقق من التطابق)
+# ======================================================
+import argparse
+import json
+import logging
+import re
+import time
+import unicodedata
+from collections import deque
+
+from config import LEXICON_PATH
+
+
+DIACRITICS_RE = re.compile(r"[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]")
+SEPARATORS_RE = re.compile(r"[^\w]+")
+
+CHAR_MAP = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ى": "ي", "ی": "ي", "ئ": "ي",
+    "ک": "ك", "ؤ": "و",
+    "ة": "ه", "ھ": "ه",
+})
+
+
+def normalize(text: str) -> str:
+    """نفس التوحيد للنص وللكلمات: الفواصل وعلامات الترقيم تصبح مسافة واحدة"""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text)
+    text = DIACRITICS_RE.sub("", text).translate(CHAR_MAP).lower()
+    return SEPARATORS_RE.sub(" ", text).strip()
+
+
+def normalize_spans(text: str):
+    """
+    نفس normalize مع موقع كل حرف ناتج في النص الأصلي: (النص الموحد، [(بداية، نهاية)])
+    التوحيد لكل حرف مع علامات التشكيل التابعة له (NFKC يركّبها معاً كما في النص كاملاً)
+    """
+    out, spans = [], []
+    i, n = 0, len(text or "")
+    while i < n:
+        j = i + 1
+        while j < n and unicodedata.combining(text[j]):
+            j += 1
+        piece = unicodedata.normalize("NFKC", text[i:j])
+        piece = DIACRITICS_RE.sub("", piece).translate(CHAR_MAP).lower()
+        for ch in piece:
+            if SEPARATORS_RE.match(ch):
+                if not out or out[-1] == " ":
+                    continue
+                ch = " "
+            out.append(ch)
+            spans.append((i, j))
+        i = j
+    if out and out[-1] == " ":
+        out.pop()
+        spans.pop()
+    return "".join(out), spans
+
+
+# ======================================================
+# نتيجة المسح
+# ======================================================
+class LexiconMatch:
+    def __init__(self, lexicon, hits, text="", normalized=""):
+        self.lexicon = lexicon
+        self.hits = hits  # [(start, end, category, term)] مواقع في النص الموحد، بترتيب الظهور
+        self.categories = {h[2] for h in hits}
+        self.text = text
+        self.normalized = normalized
+        self._spans = None
+
+    def has(self, category: str) -> bool:
+        return category in self.categories
+
+    def any(self, prefix: str) -> bool:
+        return any(c.startswith(prefix) for c in self.categories)
+
+    def first(self, prefix: str):
+        """أعلى فئة أولوية (ترتيب الملف) تبدأ بـ prefix"""
+        for category in self.lexicon.order:
+            if category in self.categories and category.startswith(prefix):
+                return category
+        return None
+
+    def first_value(self, prefix: str, default=None):
+        category = self.first(prefix)
+        return self.lexicon.values[category] if category else default
+
+    def source_text(self, hit):
+        """الكلمة كما وردت في النص الأصلي (المواقع تُحسب عند أول طلب فقط)"""
+        if self._spans is None:
+            normalized, spans = normalize_spans(self.text)
+            self._spans = spans if normalized == self.normalized else []
+        start, end = hit[0], hit[1]
+        if end > len(self._spans):
+            return None
+        return self.text[self._spans[start][0]:self._spans[end - 1][1]]
+
+    def first_text(self, prefix: str, default=None):
+        """مثل first_value لكن بكتابة النص الأصلي (أول ظهور لأعلى فئة أولوية)"""
+        category = self.first(prefix)
+        if category is None:
+            return default
+        hit = next(h for h in self.hits if h[2] == category)
+        text = self.source_text(hit)
+        return text if text is not None else default
+
+    def ordered_values(self, prefix: str) -> list:
+        """قيم الفئات بترتيب ظهورها في النص (مثل عناوين مستوى الحماية)"""
+        return [self.lexicon.values[h[2]] for h in self.hits if h[2].startswith(prefix)]
+
+    def __bool__(self):
+        return bool(self.hits)
+
+
+# ======================================================
+# الـ Automaton
+# ======================================================
+class Lexicon:
+    def __init__(self, categories: dict):
+        self.order = list(categories)
+        self.values = {}
+        self.whole_word = {}
+
+        # trie: goto[node] = {char: child}، out[node] = [(category, term_len, term)]
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self.term_count = 0
+
+        for category, spec in categories.items():
+            if isinstance(spec, list):
+                spec = {"terms": spec}
+            self.values[category] = spec.get("value", category.rsplit(".", 1)[-1])
+            self.whole_word[category] = bool(spec.get("whole_word", False))
+            for term in spec.get("terms", []):
+                self._add(normalize(term), category)
+
+        self._build()
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        data.pop("_comment", None)
+        lexicon = cls(data)
+        logging.info(f"🔤 Lexicon: {len(lexicon.order)} فئة، {lexicon.term_count} كلمة ({path})")
+        return lexicon
+
+    def _add(self, term: str, category: str):
+        if not term:
+            return
+        node = 0
+        for ch in term:
+            child = self._goto[node].get(ch)
+            if child is None:
+                child = len(self._goto)
+                self._goto[node][ch] = child
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = child
+        self._out[node].append((category, len(term), term))
+        self.term_count += 1
+
+    def _build(self):
+        # روابط الفشل (BFS) + دمج مخرجات الـ suffix حتى لا نتتبع السلسلة وقت المسح
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def _is_word(self, text: str, start: int, end: int) -> bool:
+        return (start == 0 or text[start - 1] == " ") and (end == len(text) or text[end] == " ")
+
+    def scan(self, text: str) -> LexiconMatch:
+        original, text = text, normalize(text)
+        goto, fail, out = self._goto, self._fail, self._out
+
+        hits = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for category, length, term in out[node]:
+                start = i + 1 - length
+                if self.whole_word[category] and not self._is_word(text, start, i + 1):
+                    continue
+                hits.append((start, i + 1, category, term))
+
+        hits.sort()
+        return LexiconMatch(self, hits, original or "", text)
+
+    def categories(self, text: str) -> set:
+        return self.scan(text).categories
+
+
+# ======================================================
+# Instance واحد فقط للتطبيق
+# ======================================================
+def _load():
+    try:
+        return Lexicon.from_file(LEXICON_PATH)
+    except Exception as e:
+        logging.error(f"❌ تعذر تحميل ملف الكلمات المفتاحية {LEXICON_PATH}: {e}")
+        return Lexicon({})
+
+
+lexicon = _load()
+
+
+# ======================================================
+# مقارنة مع المسح بـ any()
+# ======================================================
+def benchmark(n_terms: int, n_queries: int) -> dict:
+    import random
+
+    random.seed(0)
+    with open(LEXICON_PATH, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    base = [t for spec in data.values()
+            if isinstance(spec, (dict, list))
+            for t in (spec["terms"] if isinstance(spec, dict) else spec)]
+    letters = "ابتثجحخدذرزسشصضطظعغفقكلمنهوي"
+    terms = list(base)
+    while len(terms) < n_terms:
+        terms.append("".join(random.choice(letters) for _ in range(random.randint(3, 8))))
+
+    categories = {f"bench.{i // 10}": {"terms": []} for i in range(len(terms))}
+    for i, t in enumerate(terms):
+        categories[f"bench.{i // 10}"]["terms"].append(t)
+    groups = [[normalize(t) for t in spec["terms"]] for spec in categories.values()]
+
+    queries = [
+        " ".join(random.choice(terms + ["ما", "هي", "في", "المحمية"]) for _ in range(random.randint(4, 12)))
+        for _ in range(n_queries)
+    ]
+
+    start = time.perf_counter()
+    built = Lexicon(categories)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for q in queries:
+        # المسح القديم: any() لكل قائمة (بنفس التوحيد حتى تكون المقارنة عادلة)
+        nq = normalize(q)
+        {i for i, group in enumerate(groups) if any(t in nq for t in group)}
+    scan_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for q in queries:
+        built.categories(q)
+    automaton_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        "terms": len(terms),
+        "categories": len(categories),
+        "queries": n_queries,
+        "build_ms": round(build_ms, 1),
+        "any_scan_us_per_query": round(scan_ms * 1000 / n_queries, 1),
+        "automaton_us_per_query": round(automaton_ms * 1000 / n_queries, 1),
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="مقارنة Lexicon (Aho-Corasick) مع المسح بـ any()")
+    parser.add_argument("--terms", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(json.dumps(benchmark(args.terms, args.queries), ensure_ascii=False, indent=2))
@@ -0,0 +1,177 @@
+# llm_cascade.py
+# ======================================================
+# Cascade بين موديلين (صغير → كبير) لمسارات الـ API:
+# - النوايا الخفيفة (permission، وأسئلة general القصيرة) تذهب للموديل الصغير أولاً
+# - إجابة الصغير تمر على تحقق: فارغة / رسالة خطأ / متحفظة / صيغة غير مطابقة للنية
+#   → تُصعَّد نفس الـ Prompt للموديل الكبير
+# - penalty والأسئلة الطويلة تذهب للكبير مباشرة
+# - زمن كل مستوى ونسبة التصعيد وأسبابه في metrics() (/llm/cascade)
+# ======================================================
+import logging
+import re
+import time
+from collections import Counter
+
+from services.lexicon import lexicon
+from services.llm_service import agenerate, agenerate_stream, LLM_FAILURE_MESSAGES
+from config import (
+    LLM_MODEL,
+    LLM_SMALL_MODEL,
+    LLM_CASCADE_ENABLED,
+    LLM_CASCADE_INTENTS,
+    LLM_CASCADE_MAX_QUESTION_WORDS,
+)
+
+
+SMALL = "small"
+LARGE = "large"
+
+ARABIC_RE = re.compile(r"[\u0600-\u06FF]")
+LATIN_RE = re.compile(r"[A-Za-z]")
+
+
+# ======================================================
+# اختيار المستوى والتحقق من الإجابة
+# ======================================================
+def choose_tier(intent: str, question: str) -> str:
+    if not LLM_CASCADE_ENABLED or intent not in LLM_CASCADE_INTENTS:
+        return LARGE
+    if intent == "general" and len(question.split()) > LLM_CASCADE_MAX_QUESTION_WORDS:
+        return LARGE
+    return SMALL
+
+
+def validate(intent: str, response: str):
+    """(True, None) أو (False, سبب التصعيد)"""
+    text = (response or "").strip()
+    if not text:
+        return False, "empty"
+    if any(msg in text for msg in LLM_FAILURE_MESSAGES):
+        return False, "failure"
+
+    # الإجابة يجب أن تكون عربية (الموديل الصغير يخرج أحياناً بالإنجليزية)
+    if len(LATIN_RE.findall(text)) > len(ARABIC_RE.findall(text)):
+        return False, "language"
+
+    match = lexicon.scan(text)
+    if match.has("answer.hedge"):
+        return False, "hedge"
+
+    # نفس الـ Guard في rag_service: المخالفة والغرامة
+    if intent == "penalty" and ("المخالفة" not in text or "الغرامة" not in text):
+        return False, "format"
+
+    # برومبت الحكم: النتيجة "غير مسموح" (عدم كفاية المعلومات = تحفظ، تم التقاطه أعلاه)
+    if intent == "permission" and not match.has("answer.verdict"):
+        return False, "format"
+
+    return True, None
+
+
+# ======================================================
+# الإحصائيات
+# ======================================================
+class CascadeStats:
+    def __init__(self):
+        self.tiers = {
+            SMALL: {"model": LLM_SMALL_MODEL, "calls": 0, "total_ms": 0.0, "max_ms": 0.0},
+            LARGE: {"model": LLM_MODEL, "calls": 0, "total_ms": 0.0, "max_ms": 0.0},
+        }
+        self.requests = Counter()     # عدد الأسئلة حسب أول مستوى
+        self.answered = Counter()     # المستوى الذي أعطى الإجابة النهائية
+        self.escalations = Counter()  # أسباب التصعيد
+
+    def record(self, tier: str, started: float):
+        elapsed = (time.perf_counter() - started) * 1000
+        stats = self.tiers[tier]
+        stats["calls"] += 1
+        stats["total_ms"] += elapsed
+        stats["max_ms"] = max(stats["max_ms"], elapsed)
+        return elapsed
+
+    def snapshot(self) -> dict:
+        small_requests = self.requests[SMALL]
+        return {
+            "enabled": LLM_CASCADE_ENABLED,
+            "tiers": {
+                tier: {
+                    "model": s["model"],
+                    "calls": s["calls"],
+                    "mean_ms": round(s["total_ms"] / s["calls"], 1) if s["calls"] else 0.0,
+                    "max_ms": round(s["max_ms"], 1),
+                }
+                for tier, s in self.tiers.items()
+            },
+            "requests": dict(self.requests),
+            "answered": dict(self.answered),
+            "escalation_rate": round(sum(self.escalations.values()) / small_requests, 3) if small_requests else 0.0,
+            "escalations": dict(self.escalations),
+        }
+
+
+stats = CascadeStats()
+
+
+def metrics() -> dict:
+    return stats.snapshot()
+
+
+def _model(tier: str) -> str:
+    return LLM_SMALL_MODEL if tier == SMALL else LLM_MODEL
+
+
+def _escalate(intent: str, reason: str, elapsed: float):
+    stats.escalations[reason] += 1
+    logging.info(f"⬆️ Cascade ({intent}): تصعيد للموديل الكبير ({reason}) بعد {elapsed:.0f} ms")
+
+
+# ======================================================
+# التوليد
+# ======================================================
+async def agenerate_cascade(prompt: str, system: str, intent: str, question: str) -> str:
+    tier = choose_tier(intent, question)
+    stats.requests[tier] += 1
+
+    if tier == SMALL:
+        started = time.perf_counter()
+        response = await agenerate(prompt, system=system, model=_model(SMALL), intent=intent)
+        elapsed = stats.record(SMALL, started)
+
+        ok, reason = validate(intent, response)
+        if ok:
+            stats.answered[SMALL] += 1
+            return response
+        _escalate(intent, reason, elapsed)
+
+    started = time.perf_counter()
+    response = await agenerate(prompt, system=system, model=_model(LARGE), intent=intent)
+    stats.record(LARGE, started)
+    stats.answered[LARGE] += 1
+    return response
+
+
+async def agenerate_cascade_stream(prompt: str, system: str, intent: str, question: str):
+    """
+    الموديل الصغير لا يُبث (قد تُستبدل إجابته بعد التحقق) وتُرسل إجابته دفعة واحدة إن نجحت؛
+    الموديل الكبير يُبث توكن بتوكن
+    """
+    tier = choose_tier(intent, question)
+    stats.requests[tier] += 1
+
+    if tier == SMALL:
+        started = time.perf_counter()
+        response = await agenerate(prompt, system=system, model=_model(SMALL), intent=intent)
+        elapsed = stats.record(SMALL, started)
+
+        ok, reason = validate(intent, response)
+        if ok:
+            stats.answered[SMALL] += 1
+            yield response
+            return
+        _escalate(intent, reason, elapsed)
+
+    started = time.perf_counter()
+    async for piece in agenerate_stream(prompt, system=system, model=_model(LARGE), intent=intent):
+        yield piece
+    stats.record(LARGE, started)
+    stats.answered[LARGE] += 1
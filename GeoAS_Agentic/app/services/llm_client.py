@@ -0,0 +1,206 @@
+# llm_client.py
+# ======================================================
+# عميل Ollama غير متزامن (httpx) لمسارات الـ API:
+# - لا يحجز الـ event loop أثناء التوليد (الخريطة و GPS تبقى سريعة)
+# - حد أقصى للطلبات المتزامنة على الموديل (LLM_MAX_CONCURRENCY)
+# - طابور انتظار عادل FIFO بحد أقصى لطوله ومهلة انتظار
+# - مقاييس: عمق الطابور، زمن الانتظار، الطلبات الجارية والمرفوضة
+# ======================================================
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+
+import httpx
+
+from config import (
+    OLLAMA_BASE_URL,
+    LLM_MODEL,
+    LLM_OPTIONS,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_QUEUE,
+    LLM_QUEUE_TIMEOUT_SECONDS,
+    LLM_REQUEST_TIMEOUT_SECONDS,
+)
+
+
+WAIT_SAMPLES = 200  # آخر أزمنة انتظار تُحسب منها p50 / p95
+
+
+class LLMQueueFull(Exception):
+    """الطابور ممتلئ (الطلب يُرفض فوراً بدل الانتظار بلا نهاية)"""
+
+
+class LLMQueueTimeout(Exception):
+    """انتهت مهلة الانتظار في الطابور قبل أن يصل دور الطلب"""
+
+
+# ======================================================
+# محدد التزامن (FIFO)
+# ======================================================
+class FifoLimiter:
+    def __init__(self, limit: int, max_queue: int, timeout: float):
+        self.limit = max(1, limit)
+        self.max_queue = max_queue
+        self.timeout = timeout
+
+        self._active = 0
+        self._waiters = deque()
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self.stats = {"completed": 0, "rejected": 0, "timed_out": 0, "max_queue_depth": 0}
+
+    def _wake_next(self):
+        # تسليم المكان مباشرة لأقدم منتظر (لا أحد يتخطى الطابور)
+        while self._waiters and self._active < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._active += 1
+                waiter.set_result(True)
+
+    async def acquire(self):
+        started = time.perf_counter()
+
+        if self._active < self.limit and not self._waiters:
+            self._active += 1
+            self._waits.append(0.0)
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise LLMQueueFull(f"طابور الـ LLM ممتلئ ({len(self._waiters)} طلب)")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], len(self._waiters))
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # وصل الدور في نفس لحظة الإلغاء → نعيد المكان للتالي
+                self._active -= 1
+                self._wake_next()
+            else:
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                self.stats["timed_out"] += 1
+                raise LLMQueueTimeout(f"انتهت مهلة الانتظار ({self.timeout} ث)") from None
+            raise
+
+        self._waits.append(time.perf_counter() - started)
+
+    def release(self):
+        self._active -= 1
+        self.stats["completed"] += 1
+        self._wake_next()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+    def snapshot(self) -> dict:
+        waits = sorted(self._waits)
+
+        def pct(p):
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))] * 1000, 1) if waits else 0.0
+
+        return {
+            "limit": self.limit,
+            "in_flight": self._active,
+            "queue_depth": len(self._waiters),
+            "max_queue": self.max_queue,
+            "wait_ms_p50": pct(0.50),
+            "wait_ms_p95": pct(0.95),
+            "wait_ms_max": round(waits[-1] * 1000, 1) if waits else 0.0,
+            **self.stats,
+        }
+
+
+# ======================================================
+# العميل
+# ======================================================
+class AsyncOllamaClient:
+    def __init__(self, base_url: str, model: str, options: dict, limiter: FifoLimiter, timeout: float):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.options = dict(options)
+        self.limiter = limiter
+        self.timeout = httpx.Timeout(timeout, connect=5.0)
+        self._client = None
+
+    def _http(self) -> httpx.AsyncClient:
+        # الاتصال يُنشأ داخل الـ event loop الحالي (وليس عند الاستيراد)
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout)
+        return self._client
+
+    def _payload(self, prompt: str, stream: bool, system: str = None, options: dict = None,
+                 model: str = None, format=None) -> dict:
+        messages = [{"role": "user", "content": prompt}]
+        if system:
+            messages.insert(0, {"role": "system", "content": system})
+        payload = {
+            "model": model or self.model,
+            "messages": messages,
+            "stream": stream,
+            "options": {**self.options, **(options or {})},
+        }
+        # format: "json" أو JSON schema (توليد مقيد بالصيغة)
+        if format:
+            payload["format"] = format
+        return payload
+
+    async def chat(self, prompt: str, system: str = None, model: str = None, format=None, **options) -> str:
+        async with self.limiter:
+            resp = await self._http().post("/api/chat", json=self._payload(prompt, False, system, options, model, format))
+            resp.raise_for_status()
+            return resp.json().get("message", {}).get("content", "")
+
+    async def chat_stream(self, prompt: str, system: str = None, model: str = None, format=None, **options):
+        async with self.limiter:
+            async with self._http().stream(
+                "POST", "/api/chat", json=self._payload(prompt, True, system, options, model, format)
+            ) as resp:
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    content = data.get("message", {}).get("content")
+                    if content:
+                        yield content
+                    if data.get("done"):
+                        break
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def metrics(self) -> dict:
+        return {"model": self.model, **self.limiter.snapshot()}
+
+
+# ======================================================
+# Instance واحد فقط للتطبيق
+# ======================================================
+llm_client = AsyncOllamaClient(
+    base_url=OLLAMA_BASE_URL,
+    model=LLM_MODEL,
+    options=LLM_OPTIONS,
+    limiter=FifoLimiter(LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT_SECONDS),
+    timeout=LLM_REQUEST_TIMEOUT_SECONDS,
+)
+
+logging.info(
+    f"🧠 LLM client: {LLM_MODEL} @ {OLLAMA_BASE_URL} "
+    f"(تزامن {llm_client.limiter.limit}، طابور {LLM_MAX_QUEUE})"
+)
@@ -1,34 +1,138 @@
 from langchain_community.chat_models import ChatOllama
 import logging
+import threading
+
+from services.readiness import readiness
+from services.llm_client import llm_client, LLMQueueFull, LLMQueueTimeout
+from services import structured_output
+from config import LLM_MODEL, LLM_OPTIONS, LLM_CASCADE_ENABLED, LLM_SMALL_MODEL
+
+# رسائل الفشل (لا تُخزن في كاش الإجابات)
+LLM_UNAVAILABLE_MESSAGE = "خطأ: لم يتم تشغيل محرك الذكاء الاصطناعي."
+LLM_ERROR_MESSAGE = "حدث خطأ في معالجة الإجابة."
+LLM_BUSY_MESSAGE = "المساعد مشغول حالياً بأسئلة أخرى، حاول مرة أخرى بعد قليل."
+LLM_FAILURE_MESSAGES = (LLM_UNAVAILABLE_MESSAGE, LLM_ERROR_MESSAGE, LLM_BUSY_MESSAGE)
 
 def get_llm():
     """
     إعداد موديل LLM للعمل بأقصى سرعة ممكنة وبأقل استهلاك للموارد.
     """
     try:
-        return ChatOllama(
-            model="qwen2.5:7b-instruct",
-            temperature=0, 
-            num_ctx=4096, 
-            repeat_penalty=1.1,
-            num_thread=8, 
-        )
+        return ChatOllama(model=LLM_MODEL, **LLM_OPTIONS)
     except Exception as e:
         logging.error(f"❌ خطأ في تحميل موديل Ollama: {e}")
         return None
 
 
-llm = get_llm()
+# الموديل يُنشأ عند أول استخدام (أو أثناء الـ warmup) وليس عند الاستيراد
+llm = None
+_llm_lock = threading.Lock()
+
+
+def load_llm():
+    global llm
+    if llm is None:
+        with _llm_lock:
+            if llm is None:
+                llm = get_llm()
+    return llm
+
+
+def warm_llm():
+    """
+    طلب قصير جداً حتى يحمّل Ollama أوزان الموديل في الذاكرة قبل أول سؤال حقيقي.
+    """
+    readiness.loading("llm")
+    model = load_llm()
+    if not model:
+        readiness.failed("llm", "ChatOllama غير متاح")
+        return
+    try:
+        model.invoke("مرحبا", num_predict=1)
+    except Exception as e:
+        readiness.failed("llm", e)
+        return
+
+    # الموديل الصغير (Cascade): فشله لا يوقف التطبيق، الأسئلة تُصعَّد للكبير
+    detail = model.model
+    if LLM_CASCADE_ENABLED:
+        try:
+            ChatOllama(model=LLM_SMALL_MODEL, **LLM_OPTIONS).invoke("مرحبا", num_predict=1)
+            detail = f"{model.model} + {LLM_SMALL_MODEL}"
+        except Exception as e:
+            logging.warning(f"⚠️ تعذر تحميل الموديل الصغير {LLM_SMALL_MODEL}، الأسئلة الخفيفة ستُصعَّد للكبير: {e}")
+    readiness.ready("llm", detail)
+
+
+def _messages(prompt: str, system: str = None):
+    # التعليمات الثابتة أولاً (system) حتى تتطابق بداية الـ Prompt بين الطلبات
+    return [("system", system), ("human", prompt)] if system else prompt
+
+
+def _request(intent: str = None):
+    """(format, options) حسب نية السؤال: JSON schema + num_predict + stop"""
+    fmt = structured_output.json_schema(intent) if structured_output.is_structured(intent) else None
+    return fmt, structured_output.generation_options(intent)
+
 
-def generate(prompt: str) -> str:
+def _render(intent: str, raw: str) -> str:
+    """إجابة JSON (penalty / permission) → نص عربي بالقالب، وغيرها كما هي"""
+    if not structured_output.is_structured(intent):
+        return raw
+    parsed = structured_output.parse(intent, raw)
+    return structured_output.render(parsed) if parsed is not None else LLM_ERROR_MESSAGE
+
+
+def generate(prompt: str, system: str = None, intent: str = None) -> str:
     """إرسال الـ Prompt للموديل وإرجاع النص فقط"""
-    if not llm:
-        return "خطأ: لم يتم تشغيل محرك الذكاء الاصطناعي."
+    model = load_llm()
+    if not model:
+        return LLM_UNAVAILABLE_MESSAGE
     
     try:
-        
-        response = llm.invoke(prompt)
-        return response.content
+        fmt, options = _request(intent)
+        if fmt:
+            options["format"] = fmt
+        response = model.invoke(_messages(prompt, system), **options)
+        return _render(intent, response.content)
+    except Exception as e:
+        logging.error(f"❌ خطأ أثناء توليد الإجابة: {e}")
+        return LLM_ERROR_MESSAGE
+
+
+# ======================================================
+# المسار غير المتزامن (مسارات الـ API): لا يحجز الـ event loop
+# ويمر عبر طابور llm_client (حد التزامن + FIFO + مهلة انتظار)
+# ======================================================
+async def agenerate(prompt: str, system: str = None, model: str = None, intent: str = None) -> str:
+    fmt, options = _request(intent)
+    try:
+        raw = await llm_client.chat(prompt, system=system, model=model, format=fmt, **options)
+        return _render(intent, raw)
+    except (LLMQueueFull, LLMQueueTimeout) as e:
+        logging.warning(f"⏳ طلب LLM لم يُنفذ: {e}")
+        return LLM_BUSY_MESSAGE
+    except Exception as e:
+        logging.error(f"❌ خطأ أثناء توليد الإجابة: {e}")
+        return LLM_ERROR_MESSAGE
+
+
+async def agenerate_stream(prompt: str, system: str = None, model: str = None, intent: str = None):
+    """
+    نفس agenerate لكن يرجّع أجزاء النص فور توليدها (لتقليل زمن أول توكن)
+    الإجابات المقيدة بصيغة JSON لا تُبث (تُعرض بعد اكتمالها) وتُرسل دفعة واحدة
+    """
+    if structured_output.is_structured(intent):
+        yield await agenerate(prompt, system=system, model=model, intent=intent)
+        return
+
+    _, options = _request(intent)
+    try:
+        async for piece in llm_client.chat_stream(prompt, system=system, model=model, **options):
+            yield piece
+    except (LLMQueueFull, LLMQueueTimeout) as e:
+        logging.warning(f"⏳ طلب LLM لم يُنفذ: {e}")
+        yield LLM_BUSY_MESSAGE
     except Exception as e:
         logging.error(f"❌ خطأ أثناء توليد الإجابة: {e}")
-        return "حدث خطأ في معالجة الإجابة."
\ No newline at end of file
+        yield LLM_ERROR_MESSAGE
\ No newline at end of file
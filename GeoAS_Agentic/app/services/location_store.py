@@ -0,0 +1,270 @@
+# location_store.py
+# ======================================================
+# الموقع الحالي لكل جهاز (بدل app.state.last_location الواحد لكل السيرفر):
+# - المفتاح: معرف الجهاز المرسل مع الطلب (X-Device-Id / ?device_id= / cookie)،
+#   وبدونه DEFAULT_DEVICE_ID (نفس سلوك الكشك الواحد سابقاً)
+# - القيمة: المحمية المحسوبة مسبقاً (inside / zone_name / protection_level) + وقت النقطة
+#   → route_text يعرف موقع السائل بدون أي استعلام للقاعدة
+# - في الذاكرة: shards مستقلة (قفل لكل shard) حتى لا تتزاحم الأجهزة على قفل واحد
+# - TTL: موقع أقدم من LOCATION_TTL_SECONDS يُعتبر غير معروف (خارج المحميات)
+# - تخزين اختياري في SQLite (WAL): يبقى بعد إعادة التشغيل ومشترك بين workers الـ uvicorn
+# - put / get لا تلمس القرص (تُستدعى من الـ event loop: add-point، GPSIngestor، aroute_text):
+#   thread واحد في الخلفية يكتب المواقع المتغيرة (write-behind، آخر موقع لكل جهاز فقط)
+#   ويقرأ تحديثات workers الأخرى كل LOCATION_REFRESH_SECONDS
+# ======================================================
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime
+
+from config import (
+    DEFAULT_DEVICE_ID,
+    LOCATION_SHARDS,
+    LOCATION_TTL_SECONDS,
+    LOCATION_REFRESH_SECONDS,
+    LOCATION_STORE_PATH,
+)
+
+
+DEVICE_HEADER = "x-device-id"
+DEVICE_PARAM = "device_id"
+
+
+def request_device_id(request) -> str:
+    """معرف الجهاز من الطلب (header ثم query ثم cookie)، وإلا الجهاز الافتراضي"""
+    device_id = (
+        request.headers.get(DEVICE_HEADER)
+        or request.query_params.get(DEVICE_PARAM)
+        or request.cookies.get(DEVICE_PARAM)
+    )
+    return (device_id or "").strip() or DEFAULT_DEVICE_ID
+
+
+class LocationStore:
+    def __init__(self, shards: int = 16, ttl_seconds: float = 300, refresh_seconds: float = 2,
+                 persist_path=None):
+        self.ttl_seconds = ttl_seconds
+        self.refresh_seconds = refresh_seconds
+        self._shards = [({}, threading.Lock()) for _ in range(max(1, shards))]
+        self.stats = {
+            "hits": 0, "misses": 0, "expired": 0, "writes": 0,
+            "disk_writes": 0, "disk_reads": 0, "disk_errors": 0,
+        }
+
+        self._db = None
+        self._dirty = {}             # device_id → آخر موقع لم يُكتب بعد
+        self._cond = threading.Condition()
+        self._worker = None
+        self._closed = False
+        self._synced_seq = -1        # أكبر seq قُرئ من القرص (صفوف النسخة السابقة seq = 0)
+        if persist_path:
+            try:
+                self._open_db(persist_path)
+            except Exception as e:
+                logging.warning(f"⚠️ تعذر فتح مخزن المواقع على القرص، سيعمل في الذاكرة فقط: {e}")
+                self._db = None
+
+    # ======================================================
+    # التخزين الدائم (SQLite) — من thread الخلفية فقط بعد الفتح
+    # ======================================================
+    def _open_db(self, path):
+        self._db = sqlite3.connect(str(path), check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS locations (
+                device_id TEXT PRIMARY KEY,
+                inside INTEGER,
+                zone_name TEXT,
+                protection_level TEXT,
+                timestamp TEXT,
+                updated REAL,
+                seq INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(locations)")}
+        if "seq" not in columns:  # ملف من نسخة سابقة
+            self._db.execute("ALTER TABLE locations ADD COLUMN seq INTEGER NOT NULL DEFAULT 0")
+        self._db.execute("CREATE INDEX IF NOT EXISTS locations_seq ON locations (seq)")
+
+        # seq = ترتيب الكتابة على القرص (لا وقت put): عداد مشترك لكل workers ولا ينقص أبداً،
+        # فلا يفوت worker صفاً وصل القرص متأخراً وإن كان updated فيه أقدم
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS location_seq (id INTEGER PRIMARY KEY CHECK (id = 0), value INTEGER NOT NULL)"
+        )
+        self._db.execute("INSERT OR IGNORE INTO location_seq SELECT 0, COALESCE(MAX(seq), 0) FROM locations")
+        self._db.execute("DELETE FROM locations WHERE updated < ?", (time.time() - self.ttl_seconds,))
+        self._db.commit()
+        loaded = self._db_sync()
+        logging.info(f"📍 مخزن المواقع: {path} ({loaded} جهاز)")
+
+        self._worker = threading.Thread(target=self._run, name="location-store", daemon=True)
+        self._worker.start()
+
+    def _db_flush(self, dirty: dict):
+        """كتابة المواقع المتغيرة في transaction واحدة (BEGIN IMMEDIATE: أرقام seq بترتيب الـ commit)"""
+        if not dirty:
+            return
+        try:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("UPDATE location_seq SET value = value + ?", (len(dirty),))
+                last = self._db.execute("SELECT value FROM location_seq").fetchone()[0]
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO locations VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (device_id, int(entry["inside"]), entry["zone_name"], entry["protection_level"],
+                         entry["timestamp"].isoformat(), entry["updated"], seq)
+                        for seq, (device_id, entry) in enumerate(dirty.items(), start=last - len(dirty) + 1)
+                    ]
+                )
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+            self.stats["disk_writes"] += len(dirty)
+        except Exception as e:
+            self.stats["disk_errors"] += 1
+            logging.warning(f"⚠️ تعذر حفظ مواقع الأجهزة ({len(dirty)}): {e}")
+
+    def _db_sync(self) -> int:
+        """المواقع التي كُتبت على القرص منذ آخر قراءة → الذاكرة (الأحدث updated يفوز)"""
+        try:
+            rows = self._db.execute(
+                "SELECT device_id, inside, zone_name, protection_level, timestamp, updated, seq "
+                "FROM locations WHERE seq > ? ORDER BY seq",
+                (self._synced_seq,)
+            ).fetchall()
+        except Exception as e:
+            self.stats["disk_errors"] += 1
+            logging.warning(f"⚠️ تعذر قراءة مواقع الأجهزة: {e}")
+            return 0
+        self.stats["disk_reads"] += 1
+
+        for device_id, inside, zone_name, protection_level, timestamp, updated, seq in rows:
+            stored = {
+                "inside": bool(inside),
+                "zone_name": zone_name,
+                "protection_level": protection_level,
+                "timestamp": datetime.fromisoformat(timestamp),
+                "updated": updated,
+            }
+            entries, lock = self._shard(device_id)
+            with lock:
+                current = entries.get(device_id)
+                if current is None or current["updated"] < stored["updated"]:
+                    entries[device_id] = stored
+            self._synced_seq = max(self._synced_seq, seq)
+        return len(rows)
+
+    def _run(self):
+        next_sync = time.monotonic() + self.refresh_seconds
+        while True:
+            with self._cond:
+                if not self._dirty and not self._closed:
+                    self._cond.wait(max(0.0, next_sync - time.monotonic()))
+                dirty, self._dirty = self._dirty, {}
+                closed = self._closed
+
+            self._db_flush(dirty)
+            if closed:
+                return
+            if time.monotonic() >= next_sync:
+                self._db_sync()
+                next_sync = time.monotonic() + self.refresh_seconds
+
+    def close(self):
+        """إيقاف thread الخلفية بعد كتابة ما تبقى (عند إغلاق التطبيق)"""
+        if self._db is None:
+            return
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._worker is not None:
+            self._worker.join()
+        self._db.close()
+        self._db = None
+
+    # ======================================================
+    # الواجهة (ذاكرة فقط، لا انتظار للقرص)
+    # ======================================================
+    def _shard(self, device_id: str):
+        return self._shards[zlib.crc32(device_id.encode("utf-8")) % len(self._shards)]
+
+    def put(self, device_id: str, inside: bool, zone_name=None, protection_level=None,
+            timestamp: datetime = None, newer_only: bool = False):
+        """
+        حفظ موقع الجهاز (المحمية محسوبة مسبقاً من الـ Geofence)
+        newer_only: لا يُستبدل موقع أحدث بنقطة أقدم (مسار مرفوع بعد عودة الاتصال)
+        """
+        device_id = device_id or DEFAULT_DEVICE_ID
+        entry = {
+            "inside": bool(inside),
+            "zone_name": zone_name,
+            "protection_level": protection_level,
+            "timestamp": timestamp or datetime.utcnow(),
+            "updated": time.time(),
+        }
+
+        entries, lock = self._shard(device_id)
+        with lock:
+            current = entries.get(device_id)
+            if newer_only and current is not None and current["timestamp"] > entry["timestamp"]:
+                return current
+            entries[device_id] = entry
+        self.stats["writes"] += 1
+
+        if self._db is not None:
+            with self._cond:
+                self._dirty[device_id] = entry
+                self._cond.notify()
+        return entry
+
+    def get(self, device_id: str):
+        """آخر موقع للجهاز أو None (غير معروف / انتهت صلاحيته)"""
+        device_id = device_id or DEFAULT_DEVICE_ID
+        now = time.time()
+        entries, lock = self._shard(device_id)
+
+        with lock:
+            entry = entries.get(device_id)
+
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        if now - entry["updated"] > self.ttl_seconds:
+            self.stats["expired"] += 1
+            with lock:
+                if entries.get(device_id) is entry:
+                    del entries[device_id]
+            return None
+
+        self.stats["hits"] += 1
+        return entry
+
+    def __len__(self):
+        return sum(len(entries) for entries, _ in self._shards)
+
+    def snapshot(self) -> dict:
+        return {
+            "devices": len(self),
+            "shards": len(self._shards),
+            "ttl_seconds": self.ttl_seconds,
+            "persistent": self._db is not None,
+            "pending_writes": len(self._dirty),
+            **self.stats,
+        }
+
+
+# ======================================================
+# Instance واحد فقط للتطبيق
+# ======================================================
+location_store = LocationStore(
+    shards=LOCATION_SHARDS,
+    ttl_seconds=LOCATION_TTL_SECONDS,
+    refresh_seconds=LOCATION_REFRESH_SECONDS,
+    persist_path=LOCATION_STORE_PATH,
+)
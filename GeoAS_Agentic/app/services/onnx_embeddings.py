@@ -0,0 +1,228 @@
+# onnx_embeddings.py
+# ======================================================
+# Backend اختياري للـ Embeddings عبر ONNX Runtime (EMBEDDING_BACKEND = "onnx")
+# - تصدير الموديل مرة واحدة إلى ONNX ثم تكميم ديناميكي int8
+# - جلسة onnxruntime بعدد خيوط محدد، بدون استيراد torch وقت التشغيل
+# - mean pooling مثل sentence-transformers (نفس متجهات HuggingFaceEmbeddings تقريباً)
+#
+# مقارنة الزمن والتطابق (cosine) مع مسار PyTorch:
+#   python -m services.onnx_embeddings --texts 200
+# ======================================================
+import argparse
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_FILE = "model.int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+EXPORT_INFO_FILE = "export.json"
+
+MAX_SEQ_LENGTH = 128  # نفس max_seq_length لموديل paraphrase-multilingual-MiniLM-L12-v2
+BATCH_SIZE = 32
+ONNX_OPSET = 14
+
+
+def export_dir(base_dir, model_name: str) -> Path:
+    return Path(base_dir) / model_name.replace("/", "__")
+
+
+# ======================================================
+# التصدير (مرة واحدة، يحتاج torch + transformers وقتها فقط)
+# ======================================================
+def export_model(model_name: str, out_dir: Path):
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    logging.info(f"⏳ تصدير {model_name} إلى ONNX ...")
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    sample = tokenizer(["نص تجريبي للتصدير"], return_tensors="pt")
+
+    fp32_file = out_dir / MODEL_FILE
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"]),
+            str(fp32_file),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "last_hidden_state": {0: "batch", 1: "sequence"},
+            },
+            opset_version=ONNX_OPSET,
+        )
+
+    # تكميم الأوزان إلى int8 (التفعيلات تُكمّم ديناميكياً وقت التشغيل)
+    quantize_dynamic(str(fp32_file), str(out_dir / QUANTIZED_FILE), weight_type=QuantType.QInt8)
+    fp32_file.unlink()
+
+    tokenizer.backend_tokenizer.save(str(out_dir / TOKENIZER_FILE))
+    with open(out_dir / EXPORT_INFO_FILE, "w", encoding="utf-8") as f:
+        json.dump({
+            "model_name": model_name,
+            "max_seq_length": MAX_SEQ_LENGTH,
+            "opset": ONNX_OPSET,
+            "quantization": "dynamic-int8",
+        }, f, ensure_ascii=False, indent=2)
+
+    logging.info(f"✅ تم تصدير الموديل المكمّم: {out_dir / QUANTIZED_FILE}")
+
+
+# ======================================================
+# الـ Embeddings
+# ======================================================
+class OnnxEmbeddings(Embeddings):
+    def __init__(self, model_dir: Path, intra_op_threads: int = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_dir = Path(model_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = intra_op_threads or max(1, (os.cpu_count() or 2) // 2)
+        options.inter_op_num_threads = 1
+
+        self.session = ort.InferenceSession(
+            str(self.model_dir / QUANTIZED_FILE),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(str(self.model_dir / TOKENIZER_FILE))
+        self.tokenizer.no_padding()
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        pad_id = self.tokenizer.token_to_id("<pad>")
+        self.pad_id = pad_id if pad_id is not None else 0
+
+    @classmethod
+    def load(cls, model_name: str, base_dir, intra_op_threads: int = None):
+        model_dir = export_dir(base_dir, model_name)
+        if not (model_dir / QUANTIZED_FILE).exists():
+            export_model(model_name, model_dir)
+        return cls(model_dir, intra_op_threads=intra_op_threads)
+
+    def _encode_batch(self, texts) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(list(texts))
+        length = max(len(e.ids) for e in encodings)
+
+        input_ids = np.full((len(encodings), length), self.pad_id, dtype=np.int64)
+        attention_mask = np.zeros((len(encodings), length), dtype=np.int64)
+        for i, e in enumerate(encodings):
+            input_ids[i, :len(e.ids)] = e.ids
+            attention_mask[i, :len(e.ids)] = 1
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+        hidden = self.session.run(None, feeds)[0]
+
+        # mean pooling على التوكنات الحقيقية فقط
+        mask = attention_mask[:, :, None].astype(np.float32)
+        return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def embed_documents(self, texts):
+        texts = [t.replace("\n", " ") for t in texts]
+        if not texts:
+            return []
+
+        # ترتيب حسب الطول حتى يكون الحشو (padding) داخل كل دفعة أقل ما يمكن
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), BATCH_SIZE):
+            batch = order[start:start + BATCH_SIZE]
+            for i, vector in zip(batch, self._encode_batch([texts[i] for i in batch])):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text: str):
+        return self._encode_batch([text.replace("\n", " ")])[0].tolist()
+
+
+# ======================================================
+# مقارنة مع PyTorch (HuggingFaceEmbeddings)
+# ======================================================
+def _sample_texts(n: int):
+    from config import CHUNKS_DIR
+
+    texts = []
+    for chunks_file in sorted(CHUNKS_DIR.glob("*_chunks.json")):
+        with open(chunks_file, "r", encoding="utf-8") as f:
+            texts.extend(row["text"] for row in json.load(f) if row.get("text"))
+    if not texts:
+        texts = ["ما هي غرامة الصيد داخل المحمية؟", "هل يسمح بالتخييم؟", "غرامة الرعي بدون تصريح"]
+    return [texts[i % len(texts)] for i in range(n)]
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000.0
+
+
+def benchmark(n_texts: int, threads: int = None) -> dict:
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    from config import EMBEDDING_MODEL, ONNX_MODEL_DIR
+
+    texts = _sample_texts(n_texts)
+    queries = texts[:min(50, len(texts))]
+
+    torch_emb, torch_load_ms = _timed(lambda: HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL))
+    onnx_emb, onnx_load_ms = _timed(lambda: OnnxEmbeddings.load(EMBEDDING_MODEL, ONNX_MODEL_DIR, threads))
+
+    # تسخين
+    torch_emb.embed_query(queries[0])
+    onnx_emb.embed_query(queries[0])
+
+    torch_docs, torch_docs_ms = _timed(torch_emb.embed_documents, texts)
+    onnx_docs, onnx_docs_ms = _timed(onnx_emb.embed_documents, texts)
+
+    torch_query_ms = np.mean([_timed(torch_emb.embed_query, q)[1] for q in queries])
+    onnx_query_ms = np.mean([_timed(onnx_emb.embed_query, q)[1] for q in queries])
+
+    a = np.asarray(torch_docs, dtype=np.float32)
+    b = np.asarray(onnx_docs, dtype=np.float32)
+    cosine = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1) + 1e-12)
+
+    return {
+        "texts": len(texts),
+        "queries": len(queries),
+        "threads": onnx_emb.session.get_session_options().intra_op_num_threads,
+        "torch": {
+            "load_ms": round(torch_load_ms, 1),
+            "documents_ms": round(torch_docs_ms, 1),
+            "query_ms": round(float(torch_query_ms), 2),
+        },
+        "onnx_int8": {
+            "load_ms": round(onnx_load_ms, 1),
+            "documents_ms": round(onnx_docs_ms, 1),
+            "query_ms": round(float(onnx_query_ms), 2),
+        },
+        "cosine_mean": round(float(cosine.mean()), 4),
+        "cosine_min": round(float(cosine.min()), 4),
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="مقارنة Embeddings: PyTorch مقابل ONNX int8")
+    parser.add_argument("--texts", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    print(json.dumps(benchmark(args.texts, args.threads), ensure_ascii=False, indent=2))
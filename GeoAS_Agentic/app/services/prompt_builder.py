@@ -0,0 +1,156 @@
+# prompt_builder.py
+# ======================================================
+# بناء الـ Prompt بميزانية توكنات ثابتة داخل num_ctx:
+# - العد بـ tokenizer الموديل نفسه (qwen2.5)، وتقدير تقريبي إن لم يتوفر
+#   (الـ tokenizer يُحمّل في warmup، لا أثناء الطلب)
+# - الفقرات المسترجعة بترتيبها (الأعلى أولاً): ما لا يتسع يُحذف،
+#   وآخر فقرة تُقص إن بقي لها مكان معقول
+# - التعليمات الثابتة في رسالة system أولاً ثم السياق والسؤال،
+#   فيبقى بداية الـ Prompt متطابقاً بين الطلبات ويعيد Ollama استخدام الـ KV-cache
+# ======================================================
+import logging
+from pathlib import Path
+
+from config import LLM_TOKENIZER, LLM_TOKENIZER_PATH, LLM_OPTIONS, LLM_OUTPUT_RESERVE, PROMPT_CONTEXT_BUDGET
+
+
+USER_PROMPT_TEMPLATE = """السياق المسترجع:
+{context}
+
+سؤال المستخدم:
+{question}
+
+الإجابة:
+"""
+
+CHUNK_SEPARATOR = "\n\n"
+TRIM_MARKER = " …"
+MIN_TRIMMED_TOKENS = 48   # أقل من ذلك لا تفيد الفقرة المقصوصة
+CHAT_TEMPLATE_OVERHEAD = 16  # <|im_start|>system ... <|im_end|> لكل رسالة
+CHARS_PER_TOKEN = 2.5     # تقدير للنص العربي إن لم يتوفر الـ tokenizer
+
+
+# ======================================================
+# الـ Tokenizer (يُحمّل مرة واحدة في warmup، قبلها التقدير التقريبي)
+# ======================================================
+_tokenizer = None
+
+
+def load_tokenizer(path=None, name=None) -> str:
+    """الملف المحلي، وإلا تنزيل من Hugging Face مرة واحدة وحفظه في path → مصدر الـ tokenizer"""
+    global _tokenizer
+    from tokenizers import Tokenizer
+
+    path = Path(path or LLM_TOKENIZER_PATH)
+    name = name or LLM_TOKENIZER
+    if path.exists():
+        tokenizer, source = Tokenizer.from_file(str(path)), str(path)
+    else:
+        tokenizer, source = Tokenizer.from_pretrained(name), name
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tokenizer.save(str(path))
+        except Exception as e:
+            logging.warning(f"⚠️ تعذر حفظ الـ tokenizer في {path}: {e}")
+
+    _tokenizer = tokenizer
+    logging.info(f"🔤 Tokenizer الموديل: {source}")
+    return source
+
+
+def get_tokenizer():
+    """لا يُحمّل شيئاً (لا انتظار للشبكة أثناء الطلب): None → تقدير تقريبي"""
+    return _tokenizer
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    tokenizer = get_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    tokenizer = get_tokenizer()
+    if tokenizer is not None:
+        encoding = tokenizer.encode(text, add_special_tokens=False)
+        if len(encoding.ids) <= max_tokens:
+            return text
+        end = encoding.offsets[max_tokens - 1][1]
+    else:
+        end = int(max_tokens * CHARS_PER_TOKEN)
+        if end >= len(text):
+            return text
+
+    # القص عند آخر مسافة حتى لا تنقطع كلمة في منتصفها
+    cut = text.rfind(" ", 0, end)
+    return text[:cut if cut > 0 else end].rstrip() + TRIM_MARKER
+
+
+# ======================================================
+# الميزانية
+# ======================================================
+def context_budget(intent: str, system: str, question: str) -> int:
+    """توكنات السياق المتاحة = أقل من (ميزانية النية، ما يتبقى من num_ctx)"""
+    num_ctx = LLM_OPTIONS.get("num_ctx", 4096)
+    fixed = (
+        count_tokens(system)
+        + count_tokens(USER_PROMPT_TEMPLATE.format(context="", question=question))
+        + 2 * CHAT_TEMPLATE_OVERHEAD
+    )
+    remaining = num_ctx - fixed - LLM_OUTPUT_RESERVE.get(intent, LLM_OUTPUT_RESERVE["general"])
+    return max(0, min(PROMPT_CONTEXT_BUDGET.get(intent, PROMPT_CONTEXT_BUDGET["general"]), remaining))
+
+
+def fit_chunks(chunks, budget: int):
+    """الفقرات بترتيبها حتى تمتلئ الميزانية → (الفقرات المقبولة، توكنات السياق)"""
+    kept, used = [], 0
+    separator = count_tokens(CHUNK_SEPARATOR)
+
+    for chunk in chunks:
+        cost = count_tokens(chunk) + (separator if kept else 0)
+        if used + cost <= budget:
+            kept.append(chunk)
+            used += cost
+            continue
+
+        room = budget - used - (separator if kept else 0)
+        if room >= MIN_TRIMMED_TOKENS:
+            trimmed = trim_to_tokens(chunk, room - count_tokens(TRIM_MARKER))
+            kept.append(trimmed)
+            used += count_tokens(trimmed) + (separator if len(kept) > 1 else 0)
+        break
+
+    return kept, used
+
+
+def build_prompt(system: str, chunks, question: str, intent: str) -> dict:
+    """
+    يرجّع {"system", "user", "context", "tokens"}:
+    system ثابت لكل نوع سؤال، و user = السياق المقبول + السؤال
+    """
+    budget = context_budget(intent, system, question)
+    kept, context_tokens = fit_chunks(chunks, budget)
+    context = CHUNK_SEPARATOR.join(kept).strip()
+    user = USER_PROMPT_TEMPLATE.format(context=context, question=question)
+
+    system_tokens = count_tokens(system)
+    user_tokens = count_tokens(user)
+    tokens = {
+        "system": system_tokens,
+        "context": context_tokens,
+        "user": user_tokens,
+        "total": system_tokens + user_tokens + 2 * CHAT_TEMPLATE_OVERHEAD,
+        "budget": budget,
+        "chunks_kept": len(kept),
+        "chunks_total": len(chunks),
+    }
+
+    logging.info(
+        f"🧮 Prompt ({intent}): {tokens['total']} token "
+        f"(system {system_tokens} + سياق {context_tokens}/{budget} + سؤال) "
+        f"— {len(kept)}/{len(chunks)} فقرة"
+    )
+    return {"system": system, "user": user, "context": context, "tokens": tokens}
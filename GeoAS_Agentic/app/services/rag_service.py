@@ -1,10 +1,23 @@
 # rag_service.py
-from services.retriever_service import retrievers
-from services.llm_service import generate
+from services.retriever_service import retrievers, retriever_versions
+from services.hybrid_retriever import HybridRetriever
+from services.arabic_text import normalize_protection_level
+from services.answer_cache import answer_cache, normalize_query
+from services.single_flight import single_flight
+from services.prompt_builder import build_prompt
+from services.fine_table import fine_tables, format_fine_answer
+from services import structured_output
+from services.lexicon import lexicon
+from services.llm_service import generate, LLM_FAILURE_MESSAGES
+from services.llm_cascade import agenerate_cascade, agenerate_cascade_stream
+import asyncio
+import logging
+import time
 import re
 
 # ======================================================
 #  Prompts
+# التعليمات الثابتة فقط (رسالة system)، السياق والسؤال يضيفهما prompt_builder بعدها
 # ======================================================
 
 PROMPT_TEMPLATE = {
@@ -20,24 +33,6 @@ PROMPT_TEMPLATE = {
 - لا تدمج أكثر من مخالفة.
 - أجب فقط بالمخالفة التابعة لمستوى الحماية المحدد.
 - ربط الجملة لغويًا
-- إذا لم توجد مخالفة مطابقة، اكتب فقط:
-  "لا توجد مخالفة مطابقة في المرجع المتاح."
-
-صيغة الإجابة (إلزامية):
-
-المخالفة: (كما وردت في المرجع)
-الغرامة: (كما وردت في المرجع)
-عقوبات إضافية محتملة: (إن وُجدت)
-
----
-
-السياق المسترجع:
-{context}
-
-سؤال المستخدم:
-{question}
-
-الإجابة:
 """,
 
     "مشروع اللائحة التنفيذية للمناطق المحمية": """ أنت مساعد ذكي يعمل بنظام الاسترجاع المعزز (RAG) لتقديم معلومات عامة عن المحميات الطبيعية.
@@ -55,17 +50,21 @@ PROMPT_TEMPLATE = {
 4. لا تقدّم استنتاجات علمية أو تقييمات بيئية.
 5. إذا لم يتوفر جواب واضح في السياق، قل:
    "لا تتوفر معلومات كافية حول ذلك في الدليل المتاح."
+"""
+}
 
----
-
-السياق المسترجع:
-{context}
+# 🔹 صيغة النص الحر لكل مستند (تُضاف بعد القواعد)
+# مع التوليد المقيد تحل محلها تعليمات JSON في structured_output (لا صيغتين إلزاميتين معاً)
+TEXT_FORMAT = {
+    "protected_areas_rules": """- إذا لم توجد مخالفة مطابقة، اكتب فقط:
+  "لا توجد مخالفة مطابقة في المرجع المتاح."
 
-سؤال المستخدم:
-{question}
+صيغة الإجابة (إلزامية):
 
-الإجابة:
-"""
+المخالفة: (كما وردت في المرجع)
+الغرامة: (كما وردت في المرجع)
+عقوبات إضافية محتملة: (إن وُجدت)
+""",
 }
 
 # 🔹 برومبت خاص بأسئلة الحكم (مسموح / غير مسموح)
@@ -79,16 +78,6 @@ PERMISSION_PROMPT = """أنت مساعد قانوني يعمل بنظام الا
   "لا تتوفر معلومات كافية في المرجع المتاح."
 - لا تذكر الغرامة إلا إذا طُلبت صراحة في السؤال.
 - لا تستخدم أي معرفة خارج النص.
-
----
-
-السياق المسترجع:
-{context}
-
-سؤال المستخدم:
-{question}
-
-الإجابة:
 """
 
 # ======================================================
@@ -96,12 +85,12 @@ PERMISSION_PROMPT = """أنت مساعد قانوني يعمل بنظام الا
 # ======================================================
 
 def detect_intent(query: str) -> str:
-    q = query.strip()
+    match = lexicon.scan(query)
 
-    if any(word in q for word in ["هل", "مسموح", "ممنوع", "يجوز", "يسمح", "أقدر"]):
+    if match.has("intent.permission"):
         return "permission"
 
-    if any(word in q for word in ["غرامة", "غرامتها", "عقوبة", "كم", "قيمة"]):
+    if match.has("intent.penalty"):
         return "penalty"
 
     return "general"
@@ -134,17 +123,47 @@ def _clean_text_general(text: str) -> str:
 # 🎯 Main RAG Answer Function
 # ======================================================
 
-def answer(query: str, pdf_name: str):
+def _prepare(query: str, pdf_name: str, protection_level: str = None) -> dict:
+    """
+    كل ما قبل الـ LLM (مشترك بين answer و aanswer و answer_stream):
+    يرجّع {"result": (response, context)} إذا انتهت الإجابة مبكراً (كاش / لا سياق)،
+    وإلا {"system", "prompt", "context", "scope", "intent"}
+    """
     pdf_name = _normalize_key(pdf_name)
+    protection_level = normalize_protection_level(protection_level)
 
     retriever = retrievers.get(pdf_name)
     if not retriever:
-        return "عذراً، محرك البحث غير جاهز حالياً.", ""
+        return {"result": ("عذراً، محرك البحث غير جاهز حالياً.", "")}
 
     intent = detect_intent(query)
 
-    # 🔍 الاسترجاع
-    docs = retriever.invoke(query)
+    # ⚡ كاش الإجابات (1): نفس السؤال بعد التوحيد → بدون استرجاع ولا LLM
+    started = time.perf_counter()
+    scope = (pdf_name, intent, protection_level, retriever_versions.get(pdf_name))
+    cached = answer_cache.get(query, scope)
+    if cached is not None:
+        logging.info(f"⚡ كاش الإجابات (تطابق تام): {(time.perf_counter() - started) * 1000:.1f} ms")
+        return {"result": cached}
+
+    # ⚡ أسئلة الغرامات: مطابقة واضحة في جدول الغرامات → قالب ثابت بدون استرجاع ولا LLM
+    fine_table = fine_tables.get(pdf_name)
+    if intent == "penalty" and fine_table is not None:
+        row = fine_table.lookup(query, protection_level)
+        if row is not None:
+            response = format_fine_answer(row)
+            logging.info(
+                f"⚡ جدول الغرامات: {row['violation']} ({row['protection_level']}) "
+                f"{(time.perf_counter() - started) * 1000:.1f} ms"
+            )
+            return {"result": (response, response)}
+
+    # 🔍 الاسترجاع (داخل قسم مستوى الحماية فقط إن وُجد)
+    logging.debug(f"🔍 الاسترجاع: {pdf_name} (مستوى الحماية: {protection_level or 'الكل'})")
+    if protection_level and isinstance(retriever, HybridRetriever):
+        docs = retriever.invoke(query, protection_level=protection_level)
+    else:
+        docs = retriever.invoke(query)
 
     print("\n===== DEBUG RAG =====")
     print("PDF:", pdf_name)
@@ -155,8 +174,21 @@ def answer(query: str, pdf_name: str):
         print(d.page_content[:500])
     print("===== END DEBUG =====\n")
 
+    # 🟢 اختيار البرومبت (التعليمات الثابتة)
+    text_format = ""
+    if intent == "permission":
+        system_prompt = PERMISSION_PROMPT
+    else:
+        system_prompt = PROMPT_TEMPLATE.get(pdf_name)
+        text_format = TEXT_FORMAT.get(pdf_name, "")
+        if not system_prompt:
+            return {"result": ("لا يوجد برومبت مخصص لهذا المستند.", "")}
+
+    # penalty / permission: تعليمات صيغة JSON بدل صيغة النص (الإجابة تُعرض بقالب بعد التوليد)
+    system_prompt = structured_output.system_prompt(system_prompt, intent, text_format)
+
     # --------------------------------------------------
-    # تجهيز السياق
+    # تجهيز السياق (بترتيب الاسترجاع، داخل ميزانية التوكنات)
     # --------------------------------------------------
     formatted_contexts = []
     for i, doc in enumerate(docs):
@@ -168,34 +200,116 @@ def answer(query: str, pdf_name: str):
         )
         formatted_contexts.append(f"--- [الفقرة {i+1}] ---\n{clean}")
 
-    context = "\n\n".join(formatted_contexts).strip()
+    prompt = build_prompt(system_prompt, formatted_contexts, query, intent)
+    context = prompt["context"]
 
     if not context:
-        return "لا تتوفر معلومات كافية في المرجع المتاح.", ""
+        return {"result": ("لا تتوفر معلومات كافية في المرجع المتاح.", "")}
 
-    # 🟢 اختيار البرومبت
-    if intent == "permission":
-        final_prompt = PERMISSION_PROMPT.format(
-            context=context,
-            question=query
-        )
-    else:
-        prompt_template = PROMPT_TEMPLATE.get(pdf_name)
-        if not prompt_template:
-            return "لا يوجد برومبت مخصص لهذا المستند.", context
+    # ⚡ كاش الإجابات (2): سؤال مشابه جداً بنفس السياق المسترجع → بدون LLM
+    cached = answer_cache.get_similar(query, scope, context)
+    if cached is not None:
+        answer_cache.put(query, scope, *cached)
+        logging.info(f"⚡ كاش الإجابات (سؤال مشابه): {(time.perf_counter() - started) * 1000:.1f} ms")
+        return {"result": cached}
 
-        final_prompt = prompt_template.format(
-            context=context,
-            question=query
-        )
+    return {
+        "system": prompt["system"],
+        "prompt": prompt["user"],
+        "context": context,
+        "scope": scope,
+        "intent": intent,
+    }
 
-    response = generate(final_prompt) or ""
 
-    response = response.strip()
+def _finalize(query: str, plan: dict, response: str):
+    response = (response or "").strip()
+    context = plan["context"]
+
+    # فشل الـ LLM (مشغول / خطأ / غير متاح) يصل للمستخدم كما هو، ولا يمر على الـ Guard ولا يُخزن
+    if any(msg in response for msg in LLM_FAILURE_MESSAGES):
+        return response, context
 
     # Guard: لازم يكون فيه مخالفة وغرامة (لغير permission)
-    if intent == "penalty":
+    if plan["intent"] == "penalty":
         if "المخالفة" not in response or "الغرامة" not in response:
-            return "لا توجد مخالفة مطابقة في المرجع المتاح.", context
-
-    return response.strip(), context
\ No newline at end of file
+            response = "لا توجد مخالفة مطابقة في المرجع المتاح."
+
+    if response:
+        answer_cache.put(query, plan["scope"], response, context)
+
+    return response, context
+
+
+def answer(query: str, pdf_name: str, protection_level: str = None):
+    plan = _prepare(query, pdf_name, protection_level)
+    if "result" in plan:
+        return plan["result"]
+
+    return _finalize(query, plan, generate(plan["prompt"], system=plan["system"], intent=plan["intent"]))
+
+
+def _flight_key(query: str, pdf_name: str, protection_level: str = None):
+    # نفس السؤال بعد التوحيد + نفس المستند ومستوى الحماية والنية → نفس الإجابة
+    return (
+        normalize_query(query),
+        _normalize_key(pdf_name),
+        normalize_protection_level(protection_level),
+        detect_intent(query),
+    )
+
+
+async def _aanswer(query: str, pdf_name: str, protection_level: str = None):
+    plan = await asyncio.to_thread(_prepare, query, pdf_name, protection_level)
+    if "result" in plan:
+        return plan["result"]
+
+    response = await agenerate_cascade(plan["prompt"], plan["system"], plan["intent"], query)
+    return await asyncio.to_thread(_finalize, query, plan, response)
+
+
+async def aanswer(query: str, pdf_name: str, protection_level: str = None):
+    """
+    نفس answer لمسارات الـ API: الاسترجاع في thread والـ LLM عبر العميل غير المتزامن
+    (الـ event loop يبقى حراً أثناء انتظار الطابور والتوليد)
+    الأسئلة المطابقة المتزامنة تشترك في تنفيذ واحد (single-flight)
+    """
+    return await single_flight.do(
+        _flight_key(query, pdf_name, protection_level),
+        lambda: _aanswer(query, pdf_name, protection_level)
+    )
+
+
+async def answer_stream(query: str, pdf_name: str, protection_level: str = None):
+    """
+    نفس aanswer لكن يرسل التوكنات فور وصولها:
+    ("token", نص) ... ثم ("done", (response, context))
+    الإجابة في "done" هي المعتمدة (قد يستبدلها الـ Guard بعد انتهاء التوليد)
+    سؤال مطابق جارٍ (بث أو لا) → ننتظر نتيجته ونرسلها دفعة واحدة
+    """
+    key = _flight_key(query, pdf_name, protection_level)
+    shared = await single_flight.join(key)
+    if shared is not None:
+        yield "token", shared[0]
+        yield "done", shared
+        return
+
+    flight = single_flight.track(key, asyncio.get_running_loop().create_future())
+    try:
+        plan = await asyncio.to_thread(_prepare, query, pdf_name, protection_level)
+        if "result" in plan:
+            result = plan["result"]
+            yield "token", result[0]
+        else:
+            parts = []
+            async for piece in agenerate_cascade_stream(plan["prompt"], plan["system"], plan["intent"], query):
+                parts.append(piece)
+                yield "token", piece
+            result = await asyncio.to_thread(_finalize, query, plan, "".join(parts))
+    except BaseException:
+        # انقطع البث أو فشل → من ينتظر يحسب إجابته بنفسه
+        flight.cancel()
+        raise
+
+    flight.set_result(result)
+    yield "done", result
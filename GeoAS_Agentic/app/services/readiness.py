@@ -0,0 +1,83 @@
+# readiness.py
+# ======================================================
+# سجل جاهزية المكونات (يُملأ أثناء التحميل في الخلفية)
+# - pending → loading → ready / failed
+# - /healthz و /readyz يقرآن منه
+# ======================================================
+import logging
+import threading
+import time
+
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class Readiness:
+    def __init__(self):
+        self._components = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def _set(self, name: str, status: str, detail=None):
+        with self._lock:
+            entry = self._components.setdefault(name, {"status": PENDING})
+            now = time.time()
+
+            if status == LOADING:
+                entry["loading_since"] = now
+            elif status in (READY, FAILED) and "loading_since" in entry:
+                entry["load_seconds"] = round(now - entry["loading_since"], 2)
+
+            entry["status"] = status
+            if detail is not None:
+                entry["detail"] = str(detail)
+            elif status == READY:
+                entry.pop("detail", None)
+
+    def register(self, name: str):
+        with self._lock:
+            self._components.setdefault(name, {"status": PENDING})
+
+    def loading(self, name: str):
+        self._set(name, LOADING)
+
+    def ready(self, name: str, detail=None):
+        self._set(name, READY, detail)
+
+    def failed(self, name: str, error):
+        logging.error(f"❌ فشل تحميل المكون {name}: {error}")
+        self._set(name, FAILED, error)
+
+    def is_ready(self, name: str) -> bool:
+        with self._lock:
+            return self._components.get(name, {}).get("status") == READY
+
+    def all_ready(self) -> bool:
+        with self._lock:
+            return bool(self._components) and all(
+                c["status"] == READY for c in self._components.values()
+            )
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            components = {
+                name: {k: v for k, v in entry.items() if k != "loading_since"}
+                for name, entry in self._components.items()
+            }
+
+        done = sum(1 for c in components.values() if c["status"] in (READY, FAILED))
+        return {
+            "ready": bool(components) and all(c["status"] == READY for c in components.values()),
+            "progress": f"{done}/{len(components)}",
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "components": components,
+        }
+
+
+# ======================================================
+# Instance واحد فقط للتطبيق
+# ======================================================
+readiness = Readiness()
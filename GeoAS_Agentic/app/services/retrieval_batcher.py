@@ -0,0 +1,217 @@
+# retrieval_batcher.py
+# ======================================================
+# تجميع البحث الدلالي بين الطلبات المتزامنة (micro-batching):
+# - كل طلب (داخل thread الخاص بـ _prepare) يضع سؤاله في الطابور وينتظر
+# - الـ worker يجمع الأسئلة لبضع ملي ثوانٍ (RETRIEVAL_BATCH_WINDOW_MS)،
+#   ثم يحسب embeddings لها كلها في تمريرة واحدة للموديل
+#   ويبحث في كل فهرس FAISS بـ index.search واحد (مصفوفة × مصفوفة بدل متجه × مصفوفة)
+# - كل طلب يستلم نتيجته فقط (مواقع المتجهات)؛ فشل الدفعة يُرجع الخطأ لكل طلباتها
+# - متجهات آخر الأسئلة تُحفظ (QUERY_VECTOR_MEMO): كاش الإجابات يطلب متجه السؤال
+#   عبر embed() فيستلم نفس متجه الاسترجاع بدون حساب embedding ثانٍ
+# ======================================================
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future
+
+import numpy as np
+import faiss
+
+from services.index_policy import search_parameters
+from config import RETRIEVAL_BATCH_ENABLED, RETRIEVAL_BATCH_WINDOW_MS, RETRIEVAL_BATCH_MAX
+
+
+QUERY_VECTOR_MEMO = 256
+
+
+def embed_queries(embeddings, queries):
+    """embeddings لعدة أسئلة في تمريرة واحدة (بدون تخزينها في كاش الـ chunks)"""
+    embed = getattr(embeddings, "embed_queries", None) or embeddings.embed_documents
+    return np.asarray(embed(list(queries)), dtype=np.float32)
+
+
+def _search(vs, matrix, k: int, selector=None):
+    # نفس similarity_search في LangChain (توحيد L2 إن كان الفهرس مبنياً به)
+    if getattr(vs, "_normalize_L2", False):
+        faiss.normalize_L2(matrix)
+    params = search_parameters(vs.index, selector) if selector is not None else None
+    return vs.index.search(matrix, k, params=params)[1]
+
+
+class RetrievalBatcher:
+    def __init__(self, window_ms: float, max_batch: int, enabled: bool = True):
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.enabled = enabled
+
+        self._pending = []
+        self._cond = threading.Condition()
+        self._worker = None
+        self._vectors = OrderedDict()  # (id(embeddings), السؤال) → متجه
+        self._memo_lock = threading.Lock()
+        self.stats = {
+            "requests": 0, "batches": 0, "max_batch_size": 0,
+            "embed_ms": 0.0, "search_ms": 0.0, "errors": 0, "memo_hits": 0,
+        }
+
+    # ======================================================
+    # متجهات آخر الأسئلة
+    # ======================================================
+    def _memo_get(self, embeddings, query: str):
+        with self._memo_lock:
+            vector = self._vectors.get((id(embeddings), query))
+            if vector is not None:
+                self._vectors.move_to_end((id(embeddings), query))
+                self.stats["memo_hits"] += 1
+            return vector
+
+    def _memo_put(self, embeddings, query: str, vector):
+        with self._memo_lock:
+            self._vectors[(id(embeddings), query)] = vector
+            while len(self._vectors) > QUERY_VECTOR_MEMO:
+                self._vectors.popitem(last=False)
+
+    def _embed_now(self, embeddings, query: str):
+        vector = self._memo_get(embeddings, query)
+        if vector is None:
+            vector = np.asarray(embeddings.embed_query(query), dtype=np.float32)
+            self._memo_put(embeddings, query, vector)
+        return vector
+
+    # ======================================================
+    # واجهة الطلب (تُستدعى من threads الاسترجاع)
+    # ======================================================
+    def search(self, vs, query: str, k: int, selector=None):
+        """مواقع أقرب k متجه للسؤال في vs.index (-1 = لا نتيجة)، مثل index.search(...)[1][0]"""
+        if not self.enabled:
+            vector = self._embed_now(vs.embeddings, query)[np.newaxis, :].copy()
+            return _search(vs, vector, k, selector)[0]
+        return self._submit(vs.embeddings, vs, query, k, selector)
+
+    def embed(self, embeddings, query: str):
+        """متجه السؤال (نفس متجه الاسترجاع إن كان محسوباً، وإلا في دفعة مع الأسئلة الأخرى)"""
+        if not self.enabled:
+            return self._embed_now(embeddings, query)
+        vector = self._memo_get(embeddings, query)
+        if vector is not None:
+            return vector
+        return self._submit(embeddings, None, query, None, None)
+
+    def _submit(self, embeddings, vs, query: str, k, selector):
+        # vs = None → embedding فقط بدون بحث
+        future = Future()
+        with self._cond:
+            self._ensure_worker()
+            self._pending.append((embeddings, vs, query, k, selector, future))
+            self._cond.notify()
+        return future.result()
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="retrieval-batcher", daemon=True)
+            self._worker.start()
+
+    # ======================================================
+    # الـ Worker
+    # ======================================================
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+
+            # أول سؤال وصل → ننتظر نافذة قصيرة حتى تلحقه أسئلة أخرى
+            deadline = time.monotonic() + self.window
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self._process(batch)
+            except Exception as e:
+                # لا يُترك أي طلب معلقاً
+                self.stats["errors"] += 1
+                logging.error(f"❌ خطأ في دفعة الاسترجاع ({len(batch)} سؤال): {e}")
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _process(self, batch):
+        self.stats["requests"] += len(batch)
+        self.stats["batches"] += 1
+        self.stats["max_batch_size"] = max(self.stats["max_batch_size"], len(batch))
+
+        # 1) embeddings: تمريرة واحدة لكل موديل embeddings (الأسئلة المكررة أو المحفوظة لا تُعاد)
+        started = time.perf_counter()
+        vectors = {}
+        by_model = defaultdict(list)
+        for embeddings, _, query, *_ in batch:
+            vector = self._memo_get(embeddings, query)
+            if vector is not None:
+                vectors[(id(embeddings), query)] = vector
+            else:
+                by_model[id(embeddings)].append((embeddings, query))
+        for items in by_model.values():
+            embeddings = items[0][0]
+            queries = [q for q in dict.fromkeys(q for _, q in items) if (id(embeddings), q) not in vectors]
+            for query, vector in zip(queries, embed_queries(embeddings, queries)):
+                vectors[(id(embeddings), query)] = vector
+                self._memo_put(embeddings, query, vector)
+        embed_ms = (time.perf_counter() - started) * 1000
+
+        # 2) البحث: index.search واحد لكل (فهرس، k، قسم)
+        started = time.perf_counter()
+        groups = defaultdict(list)
+        for item in batch:
+            embeddings, vs, query, k, selector, future = item
+            if vs is None:
+                future.set_result(vectors[(id(embeddings), query)])
+                continue
+            groups[(id(vs.index), k, id(selector) if selector is not None else None)].append(item)
+        for items in groups.values():
+            embeddings, vs, _, k, selector, _ = items[0]
+            matrix = np.stack([vectors[(id(embeddings), query)] for _, _, query, *_ in items])
+            found = _search(vs, matrix, k, selector)
+            for row, (*_, future) in zip(found, items):
+                future.set_result(row)
+        search_ms = (time.perf_counter() - started) * 1000
+
+        self.stats["embed_ms"] += embed_ms
+        self.stats["search_ms"] += search_ms
+        if len(batch) > 1:
+            logging.info(
+                f"📦 Retrieval batch: {len(batch)} سؤال، {len(groups)} بحث "
+                f"(embed {embed_ms:.1f} ms، search {search_ms:.1f} ms)"
+            )
+
+    def snapshot(self) -> dict:
+        batches = self.stats["batches"]
+        return {
+            "enabled": self.enabled,
+            "window_ms": round(self.window * 1000, 1),
+            "max_batch": self.max_batch,
+            "queued": len(self._pending),
+            "mean_batch_size": round(self.stats["requests"] / batches, 2) if batches else 0.0,
+            "mean_embed_ms": round(self.stats["embed_ms"] / batches, 1) if batches else 0.0,
+            "mean_search_ms": round(self.stats["search_ms"] / batches, 1) if batches else 0.0,
+            **{k: v for k, v in self.stats.items() if k not in ("embed_ms", "search_ms")},
+        }
+
+
+# ======================================================
+# Instance واحد فقط للتطبيق
+# ======================================================
+retrieval_batcher = RetrievalBatcher(
+    window_ms=RETRIEVAL_BATCH_WINDOW_MS,
+    max_batch=RETRIEVAL_BATCH_MAX,
+    enabled=RETRIEVAL_BATCH_ENABLED,
+)
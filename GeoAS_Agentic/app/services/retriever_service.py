@@ -1,10 +1,17 @@
 # retriever_service.py
 from services.vectorstore_service import vectorstore_service
+from services.lexical_index import BM25Index
+from services.hybrid_retriever import HybridRetriever
+from services.fine_table import register_fine_table
+from config import CHUNKS_DIR
 import logging
 
 # قاموس لتخزين الـ retrievers الجاهزة في الذاكرة
 retrievers = {}
 
+# نسخة محتوى كل retriever (لكاش الإجابات: إعادة الفهرسة تُبطل الإجابات القديمة)
+retriever_versions = {}
+
 def _normalize_key(name: str) -> str:
     """
     (FIX) توحيد الاسم لتجنب مشاكل:
@@ -18,32 +25,65 @@ def _normalize_key(name: str) -> str:
         name = name[:-4]
     return name
 
-def register_pdf(name: str, path: str):
+def register_pdf(name: str, path: str, index_policy: str = None):
     """
     تسجيل ملف PDF وتحويله إلى محرك بحث سريع.
     تم رفع عدد النتائج المسترجعة (k) لضمان جلب المخالفة مع قيمة الغرامة.
+    index_policy: flat / hnsw / ivfpq / sq8 (الافتراضي من config)
     """
     try:
         name = _normalize_key(name)
 
         # 1. استدعاء الخدمة لتحميل أو إنشاء الـ VectorStore (FAISS)
-        vs = vectorstore_service.load_or_create(path, name)
+        vs = vectorstore_service.load_or_create(path, name, index_policy=index_policy)
 
         if vs:
             # 2. تحويل الـ VectorStore إلى Retriever
-            retrievers[name] = vs.as_retriever(
-                search_type="similarity",
-                search_kwargs={
-                    "k": 2
-                }
-            )
+            _make_retriever(name, vs)
             logging.info(f"✅ تم إنشاء محرك استرجاع سريع للملف: {name} بنجاح (k=2)")
+
+            # 3. جدول الغرامات المنظم (إن كان الـ PDF مرجع مخالفات)
+            register_fine_table(name, vectorstore_service.load_fine_table(path, name))
         else:
             logging.error(f"❌ فشل إنشاء الـ VectorStore للملف: {name}")
 
     except Exception as e:
         logging.error(f"❌ خطأ فني أثناء تسجيل ملف PDF: {e}")
 
+def register_corpus(name: str, index_policy: str = None):
+    """
+    تسجيل مجموعة وثائق مبنية مسبقاً بأداة ingest.py (بدون قراءة ملفات PDF).
+    """
+    try:
+        vs = vectorstore_service.open_corpus(name, index_policy=index_policy)
+        if vs:
+            _make_retriever(name, vs)
+            logging.info(f"✅ تم تسجيل مجموعة الوثائق: {name} ({vs.index.ntotal} chunk)")
+        else:
+            logging.error(f"❌ فشل فتح مجموعة الوثائق: {name}")
+
+    except Exception as e:
+        logging.error(f"❌ خطأ فني أثناء تسجيل مجموعة الوثائق: {e}")
+
+def _make_retriever(name: str, vs):
+    retriever_versions[name] = vectorstore_service.store_version(name)
+
+    # هجين FAISS + BM25 إذا توفر ملف الـ chunks المحفوظ
+    chunks_file = CHUNKS_DIR / f"{name}_chunks.json"
+    if chunks_file.exists():
+        retrievers[name] = HybridRetriever(
+            vs,
+            BM25Index.from_chunks_file(chunks_file),
+            k=2
+        )
+    else:
+        retrievers[name] = vs.as_retriever(
+            search_type="similarity",
+            search_kwargs={
+                "k": 2
+            }
+        )
+
 def retrieve(name: str, query: str) -> str:
     """
     استرجاع النصوص المتعلقة بالسؤال وتنسيقها بشكل يسهل على الموديل قراءته.
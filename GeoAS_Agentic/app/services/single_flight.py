@@ -0,0 +1,67 @@
+# single_flight.py
+# ======================================================
+# دمج الطلبات المتطابقة الجارية (single-flight):
+# أول طلب ينفذ الاسترجاع + الـ LLM، والطلبات المطابقة التي تصل
+# أثناء التنفيذ تنتظر نفس النتيجة بدل توليد إجابة جديدة
+#
+# - المفتاح يحدده المستدعي (rag_service: السؤال الموحد + pdf + مستوى الحماية + النية)
+# - التنفيذ لا يُلغى إذا انقطع اتصال صاحب الطلب الأول (غيره ينتظر النتيجة)
+# - المفتاح يُحذف فور انتهاء التنفيذ (النتائج اللاحقة من كاش الإجابات)
+# ======================================================
+import asyncio
+import logging
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights = {}
+        self.stats = {"leaders": 0, "shared": 0}
+
+    def _forget(self, key, future):
+        if self._flights.get(key) is future:
+            del self._flights[key]
+
+    def inflight(self, key):
+        return self._flights.get(key)
+
+    def track(self, key, future):
+        """تسجيل تنفيذ جارٍ (future يحلّه المستدعي بنفسه، مثل البث)"""
+        self.stats["leaders"] += 1
+        self._flights[key] = future
+        future.add_done_callback(lambda f: self._forget(key, f))
+        return future
+
+    async def join(self, key):
+        """انتظار تنفيذ جارٍ بنفس المفتاح، أو None إذا لا يوجد (أو فشل)"""
+        future = self._flights.get(key)
+        if future is None:
+            return None
+
+        self.stats["shared"] += 1
+        logging.info(f"🔗 single-flight: طلب مطابق جارٍ، انتظار نتيجته ({len(self._flights)} جارٍ)")
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if future.cancelled():
+                return None
+            raise
+        except Exception:
+            return None
+
+    async def do(self, key, fn):
+        """تنفيذ fn() مرة واحدة لكل مفتاح جارٍ ومشاركة النتيجة"""
+        result = await self.join(key)
+        if result is not None:
+            return result
+
+        task = self.track(key, asyncio.ensure_future(fn()))
+        return await asyncio.shield(task)
+
+    def __len__(self):
+        return len(self._flights)
+
+
+# ======================================================
+# Instance واحد فقط للتطبيق
+# ======================================================
+single_flight = SingleFlight()
@@ -0,0 +1,116 @@
+# structured_output.py
+# ======================================================
+# توليد مقيد بصيغة (Ollama format = JSON schema) لأسئلة الغرامات والحكم:
+# - الموديل يملأ حقول JSON فقط بدل كتابة النص الحر (توكنات أقل، لا إجابات بصيغة خاطئة)
+# - الناتج يُقرأ في كائن pydantic ثم يُعرض بالعربية بقالب ثابت
+#   (نفس صيغة الإجابة التي كانت مطلوبة من الموديل)
+# - لكل نية: حد أقصى لتوكنات الإجابة (num_predict)، و stop sequences للنص الحر
+#   (أسئلة general، أو كل النوايا إذا LLM_STRUCTURED_OUTPUT = False)
+# ======================================================
+import json
+import logging
+from typing import Literal, Optional
+
+from pydantic import BaseModel, ValidationError
+
+from services.fine_table import format_fine_answer
+from config import LLM_STRUCTURED_OUTPUT, LLM_OUTPUT_RESERVE, LLM_STOP_SEQUENCES
+
+
+NO_MATCH_MESSAGE = "لا توجد مخالفة مطابقة في المرجع المتاح."
+INSUFFICIENT_MESSAGE = "لا تتوفر معلومات كافية في المرجع المتاح."
+
+
+class PenaltyAnswer(BaseModel):
+    found: bool                         # هل توجد مخالفة مطابقة في السياق
+    violation: str = ""                 # كما وردت في المرجع
+    fine: str = ""                      # كما وردت في المرجع
+    additional: Optional[str] = None    # عقوبات إضافية محتملة (إن وُجدت)
+
+
+class PermissionAnswer(BaseModel):
+    verdict: Literal["not_allowed", "insufficient"]
+    violation: Optional[str] = None     # المخالفة التي تخص الفعل (من السياق)
+    fine: Optional[str] = None          # فقط إذا طُلبت الغرامة صراحة
+
+
+SCHEMAS = {
+    "penalty": PenaltyAnswer,
+    "permission": PermissionAnswer,
+}
+
+# تعليمات تُضاف لرسالة system (ثابتة لكل نية، فلا تكسر إعادة استخدام الـ KV-cache)
+FORMAT_INSTRUCTIONS = {
+    "penalty": """
+أجب بصيغة JSON فقط بالحقول:
+found (true إذا وُجدت مخالفة مطابقة)، violation، fine، additional (أو null).
+انسخ نص المخالفة والغرامة حرفياً من المرجع.""",
+
+    "permission": """
+أجب بصيغة JSON فقط بالحقول:
+verdict ("not_allowed" إذا وُجدت مخالفة تخص الفعل، وإلا "insufficient")،
+violation (نص المخالفة من المرجع أو null)، fine (فقط إذا طُلبت الغرامة صراحة، وإلا null).""",
+}
+
+
+def is_structured(intent: str) -> bool:
+    return LLM_STRUCTURED_OUTPUT and intent in SCHEMAS
+
+
+def json_schema(intent: str) -> dict:
+    return SCHEMAS[intent].model_json_schema()
+
+
+def system_prompt(system: str, intent: str, text_format: str = "") -> str:
+    """التعليمات + صيغة واحدة فقط: JSON للنوايا المقيدة، وإلا صيغة النص الحر (text_format)"""
+    if is_structured(intent):
+        return f"{system.rstrip()}\n{FORMAT_INSTRUCTIONS[intent]}"
+    if text_format:
+        return f"{system.rstrip()}\n{text_format}"
+    return system
+
+
+def generation_options(intent: str) -> dict:
+    """num_predict و stop لكل نية (الحد نفسه المحجوز للإجابة في ميزانية الـ Prompt)"""
+    options = {}
+    if intent in LLM_OUTPUT_RESERVE:
+        options["num_predict"] = LLM_OUTPUT_RESERVE[intent]
+    # الـ JSON ينتهي بنفسه مع الـ schema، والـ stop قد يقطعه في منتصف قيمة
+    if not is_structured(intent) and LLM_STOP_SEQUENCES.get(intent):
+        options["stop"] = list(LLM_STOP_SEQUENCES[intent])
+    return options
+
+
+# ======================================================
+# القراءة والعرض
+# ======================================================
+def parse(intent: str, raw: str):
+    """كائن pydantic أو None إذا لم يكن الناتج JSON صالحاً للـ schema"""
+    try:
+        return SCHEMAS[intent].model_validate(json.loads(raw))
+    except (json.JSONDecodeError, ValidationError, TypeError) as e:
+        logging.warning(f"⚠️ ناتج غير مطابق لصيغة {intent}: {e} | {raw[:200]!r}")
+        return None
+
+
+def render(answer) -> str:
+    if isinstance(answer, PenaltyAnswer):
+        if not answer.found or not answer.violation.strip() or not answer.fine.strip():
+            return NO_MATCH_MESSAGE
+        return format_fine_answer({
+            "violation": answer.violation.strip(),
+            "fine": answer.fine.strip(),
+            "additional": (answer.additional or "").strip(),
+        })
+
+    if isinstance(answer, PermissionAnswer):
+        if answer.verdict != "not_allowed":
+            return INSUFFICIENT_MESSAGE
+        lines = ["غير مسموح."]
+        if answer.violation and answer.violation.strip():
+            lines.append(f"المخالفة: {answer.violation.strip()}")
+        if answer.fine and answer.fine.strip():
+            lines.append(f"الغرامة: {answer.fine.strip()}")
+        return "\n".join(lines)
+
+    raise TypeError(f"نوع إجابة غير معروف: {type(answer).__name__}")
@@ -1,15 +1,48 @@
 # utils.py
 
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from playsound import playsound
 
+EARTH_RADIUS_M = 6371008.8
+
 def moved_enough(last_lat, last_lon, lat, lon, threshold):
     if last_lat is None or last_lon is None:
         return True
     return abs(lat - last_lat) > threshold or abs(lon - last_lon) > threshold
 
+def haversine_m(lat1, lon1, lat2, lon2):
+    """المسافة بالمتر بين نقطتين (lat/lon بالدرجات)"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+def moved_meters(last_lat, last_lon, lat, lon, threshold_m):
+    """مثل moved_enough لكن الحد بالمتر (درجة الطول تصغر مع خط العرض)"""
+    if last_lat is None or last_lon is None:
+        return True
+    return haversine_m(last_lat, last_lon, lat, lon) >= threshold_m
+
 def play_alert(sound_file):
     """تشغيل صوت التنبيه محليًا"""
     try:
         playsound(sound_file)
     except Exception as e:
-        print(f"❌ Audio Error: {e}")
\ No newline at end of file
+        print(f"❌ Audio Error: {e}")
+
+# تنبيه صوتي بدون انتظار: thread واحد للصوت، وتنبيه جديد أثناء تشغيل آخر يُدمج معه
+_alert_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="alert")
+_alert_lock = threading.Lock()
+_alert_future = None
+
+def play_alert_background(sound_file):
+    global _alert_future
+    with _alert_lock:
+        if _alert_future is not None and not _alert_future.done():
+            return False
+        _alert_future = _alert_executor.submit(play_alert, sound_file)
+        return True
\ No newline at end of file
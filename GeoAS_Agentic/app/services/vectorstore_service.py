@@ -1,5 +1,8 @@
 # vectorstore_service.py
 import hashlib
+import os
+import shutil
+import uuid
 from pathlib import Path
 import logging
 from unicodedata import name  # (تركته كما هو لتفادي حذف غير ضروري)
@@ -8,19 +11,70 @@ from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
-
-from config import VECTORSTORE_DIR, EMBEDDING_MODEL, CHUNKS_DIR
+from langchain_core.documents import Document
+import faiss
+
+from config import (
+    VECTORSTORE_DIR,
+    EMBEDDING_MODEL,
+    EMBEDDING_BACKEND,
+    ONNX_MODEL_DIR,
+    ONNX_INTRA_OP_THREADS,
+    CHUNKS_DIR,
+    EMBEDDING_CACHE_DIR,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    DEFAULT_INDEX_POLICY,
+    PDF_INDEX_POLICY,
+)
+from services.embedding_cache import EmbeddingCache, CachedEmbeddings
+from services.arabic_text import normalize_for_ingestion, find_protection_levels
+from services.fine_table import extract_fine_rows, FINE_TABLE_VERSION
+from services.lexicon import lexicon
+from services.index_policy import (
+    INDEX_POLICIES,
+    build_index,
+    compare_policies,
+    evaluate,
+    exact_vectors,
+    index_filename,
+    normalize_policy,
+)
+from services.lazy_docstore import (
+    LazyJsonlDocstore,
+    docstore_exists,
+    load_in_memory,
+    write_docstore,
+    write_docstore_rows,
+)
 import json
 
 
 logging.basicConfig(level=logging.INFO)
 
+# ======================================================
+# Manifest لكل VectorStore
+# - يحفظ بصمة ملف PDF وبصمة كل صفحة ومعرّفات الـ chunks التابعة لها
+# - أي تغيير في PIPELINE_VERSION (التقسيم/التنظيف/الوسوم) يفرض إعادة بناء كاملة
+# ======================================================
+MANIFEST_FILE = "manifest.json"
+INDEX_FILE = "index.faiss"
+LEGACY_PICKLE_FILE = "index.pkl"
+INDEX_REPORT_FILE = "index_report.json"
+CORPUS_KIND = "corpus"
+SHARD_INDEX_FILE = "index.faiss"
+SHARD_CHUNKS_FILE = "chunks.jsonl"
+FINE_TABLE_FILE = "fine_table.json"
+PIPELINE_VERSION = 4  # 2: توحيد النص العربي قبل التقسيم، 3: وسوم مستوى الحماية عبر الصفحات، 4: الكلمات المعكوسة حرفياً
+
 
 class VectorStoreService:
     def __init__(self):
         # لا نحمّل الموديل عند init
         self.embeddings = None
         self.model_name = EMBEDDING_MODEL
+        self.backend = EMBEDDING_BACKEND
+        # هوية المتجهات (الموديل + الـ backend): متجهات int8 لا تُخلط مع متجهات torch
+        self.embedding_id = self._embedding_id(self.backend)
         self.loaded_vectorstores = {}
         logging.info("VectorStoreService initialized (embeddings not loaded yet)")
 
@@ -30,20 +84,103 @@ class VectorStoreService:
     def get_embeddings(self):
         if self.embeddings is None:
             try:
-                logging.info(f"⏳ Loading HuggingFace Embeddings: {self.model_name} ...")
-                self.embeddings = HuggingFaceEmbeddings(model_name=self.model_name)
-                logging.info("✅ HuggingFace Embeddings loaded successfully")
+                self.embeddings = self._with_cache(self.load_base_embeddings())
             except Exception as e:
                 logging.error(f"❌ Failed to load embeddings: {e}")
                 self.embeddings = None
         return self.embeddings
 
+    def _embedding_id(self, backend: str) -> str:
+        return self.model_name if backend == "torch" else f"{self.model_name}#{backend}-int8"
+
+    def load_base_embeddings(self):
+        """الموديل بدون كاش (عمّال الإدخال المتوازي لا يتشاركون ملف الكاش)"""
+        if self.backend == "onnx":
+            try:
+                from services.onnx_embeddings import OnnxEmbeddings
+                logging.info(f"⏳ Loading ONNX int8 Embeddings: {self.model_name} ...")
+                base = OnnxEmbeddings.load(self.model_name, ONNX_MODEL_DIR, ONNX_INTRA_OP_THREADS)
+                logging.info("✅ ONNX Embeddings loaded successfully")
+                self.embedding_id = self._embedding_id("onnx")
+                return base
+            except Exception as e:
+                logging.warning(f"⚠️ تعذر تحميل ONNX Embeddings، سيتم استخدام PyTorch: {e}")
+
+        self.embedding_id = self._embedding_id("torch")
+        logging.info(f"⏳ Loading HuggingFace Embeddings: {self.model_name} ...")
+        base = HuggingFaceEmbeddings(model_name=self.model_name)
+        logging.info("✅ HuggingFace Embeddings loaded successfully")
+        return base
+
+    # ======================================================
+    # كاش Embeddings على القرص (إعادة البناء تحسب الـ chunks الجديدة فقط)
+    # ======================================================
+    def _with_cache(self, base):
+        try:
+            cache = EmbeddingCache(
+                EMBEDDING_CACHE_DIR,
+                self.embedding_id,
+                max_entries=EMBEDDING_CACHE_MAX_ENTRIES
+            )
+            return CachedEmbeddings(base, cache)
+        except Exception as e:
+            logging.warning(f"⚠️ تعذر تفعيل كاش Embeddings، سيتم العمل بدونه: {e}")
+            return base
+
     # ======================================================
     # اسم آمن للتخزين
     # ======================================================
     def _safe_name(self, name: str) -> str:
         return hashlib.md5(name.encode("utf-8")).hexdigest()
 
+    # ======================================================
+    # بصمات المحتوى (ملف كامل / نص صفحة)
+    # ======================================================
+    def _file_hash(self, path: str) -> str:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(block)
+        return h.hexdigest()
+
+    def _page_hash(self, page) -> str:
+        # مستوى الحماية الموروث من الصفحات السابقة جزء من بصمة الصفحة
+        # (تغيّر العنوان في صفحة سابقة يغيّر وسوم هذه الصفحة)
+        carried = page.metadata.get("section_level") or ""
+        return self._text_hash(f"{page.page_content}\n{carried}")
+
+    def _text_hash(self, text: str) -> str:
+        return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+    # ======================================================
+    # قراءة / كتابة الـ Manifest
+    # ======================================================
+    def _load_manifest(self, store_path: Path):
+        manifest_file = store_path / MANIFEST_FILE
+        if not manifest_file.exists():
+            return None
+        try:
+            with open(manifest_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logging.warning(f"⚠️ Manifest تالف وسيتم تجاهله: {e}")
+            return None
+
+    def _save_manifest(self, store_path: Path, manifest: dict):
+        manifest_file = store_path / MANIFEST_FILE
+        tmp_file = manifest_file.with_suffix(".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        # كتابة ذرّية حتى لا يبقى manifest ناقص عند انقطاع الكهرباء
+        os.replace(tmp_file, manifest_file)
+
+    def _manifest_compatible(self, manifest) -> bool:
+        return bool(
+            manifest
+            and manifest.get("model_name") == self.embedding_id
+            and manifest.get("pipeline_version") == PIPELINE_VERSION
+        )
+
     # ======================================================
     # حفظ Chunks في ملف JSON (مع Metadata كاملة)
     # ======================================================
@@ -64,10 +201,313 @@ class VectorStoreService:
 
         logging.info(f"🧩 تم حفظ {len(data)} Chunks في: {output_file}")
 
+    # ======================================================
+    # قراءة صفحات PDF الصالحة
+    # ======================================================
+    def _iter_pages(self, pdf_path: str):
+        # صفحة بصفحة (lazy_load) حتى لا يُحمّل ملف كبير كاملاً في الذاكرة
+        loader = PyPDFLoader(pdf_path)
+
+        # --------------------------------------------------
+        # حماية من الصفحات الفارغة أو التالفة
+        # --------------------------------------------------
+        for d in loader.lazy_load():
+            content = (d.page_content or "").strip()
+            if len(content) > 20:
+                yield d
+
+    def _load_pages(self, pdf_path: str):
+        return list(self._iter_pages(pdf_path))
+
+    # ======================================================
+    # مستوى الحماية الساري في بداية كل صفحة
+    # (العنوان "===مستوى الحماية: متوسطة===" يسري على الصفحات التالية حتى العنوان القادم)
+    # ======================================================
+    def _carry_section_levels(self, pages):
+        level = None
+        for p in pages:
+            p.metadata["section_level"] = level
+            levels = find_protection_levels(normalize_for_ingestion(p.page_content))
+            if levels:
+                level = levels[-1]
+            yield p
+
+    def stream_chunks(self, pdf_path: str, name: str):
+        """chunks جاهزة للتضمين صفحةً بصفحة (للإدخال الجماعي)"""
+        for page in self._carry_section_levels(self._iter_pages(pdf_path)):
+            yield from self._split_pages([page], name, report=False)
+
+    # ======================================================
+    # توحيد النص العربي بين التحميل والتقسيم
+    # (NFKC + ترتيب منطقي للأسطر البصرية + حذف التطويل + ضغط المسافات)
+    # ======================================================
+    def _normalize_pages(self, pages):
+        return [
+            Document(
+                page_content=normalize_for_ingestion(p.page_content),
+                metadata=dict(p.metadata)
+            )
+            for p in pages
+        ]
+
+    def _count_tokens(self, text: str) -> int:
+        # tokenizer الخاص بموديل الـ Embeddings إن كان محمّلاً، وإلا عدد الكلمات
+        embeddings = self.embeddings
+        base = getattr(embeddings, "underlying", embeddings)
+        tokenizer = getattr(getattr(base, "client", None), "tokenizer", None)
+        if tokenizer is not None:
+            try:
+                return len(tokenizer.tokenize(text))
+            except Exception:
+                pass
+        return len(text.split())
+
+    def _log_token_savings(self, pages, normalized_pages, chunks, name: str):
+        if not chunks:
+            return
+        before = sum(self._count_tokens(p.page_content or "") for p in pages)
+        after = sum(self._count_tokens(p.page_content or "") for p in normalized_pages)
+        logging.info(
+            f"🧹 توحيد النص ({name}): {before} → {after} token "
+            f"(توفير {(before - after) / len(chunks):.1f} token لكل chunk، {len(chunks)} chunk)"
+        )
+
+    # ======================================================
+    # تقسيم النص حسب نوع الـ PDF
+    # ======================================================
+    def _get_splitter(self, name: str):
+        if name == "مشروع اللائحة التنفيذية للمناطق المحمية":
+            return RecursiveCharacterTextSplitter(
+                chunk_size=700,
+                chunk_overlap=50,
+                separators=[
+                    "\n===",
+                    "\n— الفصل",
+                    "\n---",
+                    "\n",
+                    " "
+                ]
+            )
+
+        if name == "protected_areas_rules":
+            return RecursiveCharacterTextSplitter(
+                chunk_size=700,
+                chunk_overlap=50,
+                separators=[
+                    "\n===",
+                    "\n—",
+                    "\n",
+                    " "
+                ]
+            )
+
+        return RecursiveCharacterTextSplitter(
+            chunk_size=900,
+            chunk_overlap=120,
+            separators=["\n\n", "\n", " ", ""]
+        )
+
+    # ======================================================
+    # ✅ إضافة Metadata بسيطة ودلالية (خيار A)
+    # ======================================================
+    def _tag_chunks(self, chunks, name: str):
+        level_by_page = {}
+        for c in chunks:
+            text = (c.page_content or "")
+            carried = c.metadata.pop("section_level", None)
+            match = lexicon.scan(text)  # مرور واحد لكل الوسوم
+
+            # اسم الملف
+            c.metadata["pdf_name"] = name
+
+            # رقم الصفحة
+            c.metadata["page"] = c.metadata.get("page")
+
+            # -------------------------------
+            # ملف مخالفات المحميات
+            # -------------------------------
+            if name == "protected_areas_rules":
+
+                # آخر عنوان داخل الـ chunk، وإلا المستوى السابق في نفس الصفحة،
+                # وإلا المستوى الموروث من الصفحات السابقة
+                page = c.metadata.get("page")
+                levels = match.ordered_values("protection.")
+                level = levels[-1] if levels else level_by_page.get(page, carried)
+                level_by_page[page] = level
+                c.metadata["protection_level"] = level or "unknown"
+
+                # أول نوع حسب أولوية lexicon.json (صيد، رعي، احتطاب، تخييم، نار)
+                c.metadata["violation_type"] = match.first_value("violation.", "general")
+
+            # -------------------------------
+            # ملف اللائحة التنفيذية (العام)
+            # -------------------------------
+            elif name == "مشروع اللائحة التنفيذية للمناطق المحمية":
+
+                c.metadata["doc_type"] = "general_guidelines"
+
+                c.metadata["content_type"] = match.first_value("content.", "general")
+
+        return chunks
+
+    # ======================================================
+    # تقسيم + وسوم + تنظيف لمجموعة صفحات
+    # (التقسيم يتم لكل صفحة على حدة، لذلك نتيجة صفحة لا تتأثر بغيرها)
+    # ======================================================
+    def _split_pages(self, pages, name: str, report: bool = True):
+        if not pages:
+            return []
+
+        normalized = self._normalize_pages(pages)
+        splitter = self._get_splitter(name)
+        chunks = self._tag_chunks(splitter.split_documents(normalized), name)
+
+        # --------------------------------------------------
+        # تنظيف إضافي بعد التقسيم
+        # --------------------------------------------------
+        clean_chunks = []
+        for c in chunks:
+            text = (c.page_content or "").strip()
+            if len(text) > 30:
+                clean_chunks.append(c)
+
+        if report:
+            self._log_token_savings(pages, normalized, clean_chunks, name)
+        return clean_chunks
+
+    def _page_key(self, doc) -> str:
+        return str(doc.metadata.get("page"))
+
+    # ======================================================
+    # تبنّي VectorStore قديم (بدون manifest)
+    # نعيد تقسيم الصفحات (بدون Embeddings) ونقارن نصوص الـ chunks:
+    # الصفحات المطابقة تحتفظ بمتجهاتها، والباقي يُعاد بناؤه فقط
+    # ======================================================
+    def _adopt_legacy_store(self, vs, pages, name: str) -> dict:
+        stored = {}
+        for pos in sorted(vs.index_to_docstore_id):
+            doc_id = vs.index_to_docstore_id[pos]
+            doc = vs.docstore.search(doc_id)
+            if isinstance(doc, str):
+                continue
+            key = str(doc.metadata.get("page"))
+            stored.setdefault(key, []).append((doc_id, (doc.page_content or "").strip()))
+
+        previous = {}
+        for page in pages:
+            key = self._page_key(page)
+            entries = stored.pop(key, [])
+            fresh = [(c.page_content or "").strip() for c in self._split_pages([page], name)]
+            same = fresh == [text for _, text in entries]
+            previous[key] = {
+                "hash": self._page_hash(page) if same else None,
+                "ids": [doc_id for doc_id, _ in entries],
+            }
+
+        # صفحات موجودة في المخزن ولم تعد في الملف
+        for key, entries in stored.items():
+            previous[key] = {"hash": None, "ids": [doc_id for doc_id, _ in entries]}
+
+        return previous
+
+    # ======================================================
+    # حفظ المخزن + الـ manifest + ملف الـ chunks
+    # ======================================================
+    def _persist(self, vs, store_path: Path, name: str, pdf_hash: str, pages_state: dict):
+        self._save_store(vs, store_path)
+
+        self._save_manifest(store_path, {
+            "name": name,
+            "pdf_hash": pdf_hash,
+            "model_name": self.embedding_id,
+            "pipeline_version": PIPELINE_VERSION,
+            "pages": pages_state,
+        })
+
+        # 🧩 حفظ الـ chunks مع metadata بترتيب الصفحات
+        ordered = []
+        for key in sorted(pages_state, key=lambda k: (not k.isdigit(), int(k) if k.isdigit() else k)):
+            for doc_id in pages_state[key]["ids"]:
+                doc = vs.docstore.search(doc_id)
+                if not isinstance(doc, str):
+                    ordered.append(doc)
+        self.save_chunks_to_file(ordered, name)
+
+    # ======================================================
+    # بناء كامل
+    # ======================================================
+    def _build_full(self, pages, name: str, embeddings):
+        clean_chunks = self._split_pages(pages, name)
+        if not clean_chunks:
+            logging.error("❌ لا يوجد Chunks صالحة بعد التقسيم")
+            return None, None
+
+        logging.info(f"🏗️ إنشاء VectorStore من {len(clean_chunks)} قطعة نصية")
+
+        ids = [str(uuid.uuid4()) for _ in clean_chunks]
+        vs = FAISS.from_documents(clean_chunks, embeddings, ids=ids)
+
+        pages_state = {
+            self._page_key(p): {"hash": self._page_hash(p), "ids": []}
+            for p in pages
+        }
+        for doc_id, c in zip(ids, clean_chunks):
+            pages_state.setdefault(self._page_key(c), {"hash": None, "ids": []})["ids"].append(doc_id)
+
+        return vs, pages_state
+
+    # ======================================================
+    # تحديث تزايدي: إعادة تقسيم وتضمين الصفحات المتغيرة فقط
+    # ======================================================
+    def _update_incremental(self, vs, pages, name: str, previous: dict):
+        pages_state = {}
+        changed_pages = []
+        stale_ids = []
+
+        current_keys = set()
+        for page in pages:
+            key = self._page_key(page)
+            current_keys.add(key)
+            page_hash = self._page_hash(page)
+            old = previous.get(key)
+
+            if old and old.get("hash") == page_hash:
+                pages_state[key] = old
+                continue
+
+            changed_pages.append(page)
+            pages_state[key] = {"hash": page_hash, "ids": []}
+            if old:
+                stale_ids.extend(old.get("ids", []))
+
+        for key, old in previous.items():
+            if key not in current_keys:
+                stale_ids.extend(old.get("ids", []))
+
+        if not changed_pages and not stale_ids:
+            return vs, pages_state, 0
+
+        logging.info(
+            f"♻️ تحديث تزايدي: {len(changed_pages)} صفحة متغيرة من {len(pages)}، "
+            f"حذف {len(stale_ids)} متجه قديم"
+        )
+
+        if stale_ids:
+            vs.delete(stale_ids)
+
+        new_chunks = self._split_pages(changed_pages, name)
+        if new_chunks:
+            ids = [str(uuid.uuid4()) for _ in new_chunks]
+            vs.add_documents(new_chunks, ids=ids)
+            for doc_id, c in zip(ids, new_chunks):
+                pages_state.setdefault(self._page_key(c), {"hash": None, "ids": []})["ids"].append(doc_id)
+
+        return vs, pages_state, len(changed_pages)
+
     # ======================================================
     # تحميل أو إنشاء VectorStore
     # ======================================================
-    def load_or_create(self, pdf_path: str, name: str):
+    def load_or_create(self, pdf_path: str, name: str, index_policy: str = None):
         embeddings = self.get_embeddings()
         if embeddings is None:
             logging.error("❌ لا يمكن إنشاء VectorStore بدون Embeddings")
@@ -75,173 +515,347 @@ class VectorStoreService:
 
         safe_name = self._safe_name(name)
         store_path = VECTORSTORE_DIR / safe_name
+        policy = normalize_policy(index_policy or PDF_INDEX_POLICY.get(name, DEFAULT_INDEX_POLICY))
+        index_exists = store_path.exists() and (store_path / INDEX_FILE).exists()
+        manifest = self._load_manifest(store_path)
 
         # --------------------------------------------------
-        # 1) تحميل VectorStore موجود
-        # --------------------------------------------------
-        if store_path.exists() and (store_path / "index.faiss").exists():
-            try:
-                logging.info(f"🔄 تحميل VectorStore موجود مسبقاً: {name}")
-                vs = FAISS.load_local(
-                    str(store_path),
-                    embeddings,
-                    allow_dangerous_deserialization=True
-                )
-                return vs
-            except Exception as e:
-                logging.error(f"❌ فشل تحميل VectorStore موجود: {e}")
-                logging.info("♻️ سيتم إعادة إنشاء VectorStore...")
-
-        # --------------------------------------------------
-        # 2) التحقق من وجود الملف
+        # 1) التحقق من وجود الملف
         # --------------------------------------------------
         if not Path(pdf_path).exists():
+            if index_exists:
+                logging.warning(f"⚠️ الملف غير موجود، سيتم استخدام VectorStore المحفوظ: {name}")
+                return self._open_store(store_path, embeddings, policy)
             logging.error(f"❌ لم يتم العثور على الملف: {pdf_path}")
             return None
 
+        pdf_hash = self._file_hash(pdf_path)
+
+        # --------------------------------------------------
+        # 2) تحميل VectorStore موجود (نفس محتوى الـ PDF)
+        # --------------------------------------------------
+        if (
+            index_exists
+            and self._manifest_compatible(manifest)
+            and manifest.get("pdf_hash") == pdf_hash
+        ):
+            logging.info(f"🔄 تحميل VectorStore موجود مسبقاً: {name}")
+            vs = self._open_store(store_path, embeddings, policy)
+            if vs is not None:
+                return vs
+            logging.info("♻️ سيتم إعادة إنشاء VectorStore...")
+            index_exists = False
+
         store_path.mkdir(parents=True, exist_ok=True)
 
         try:
             logging.info(f"📄 معالجة ملف PDF: {pdf_path}")
 
-            loader = PyPDFLoader(pdf_path)
-            raw_docs = loader.load()
-
-            # --------------------------------------------------
-            # حماية من الصفحات الفارغة أو التالفة
-            # --------------------------------------------------
-            valid_docs = []
-            for d in raw_docs:
-                content = (d.page_content or "").strip()
-                if len(content) > 20:
-                    valid_docs.append(d)
-
-            if not valid_docs:
+            pages = list(self._carry_section_levels(self._load_pages(pdf_path)))
+            if not pages:
                 logging.error("❌ لا يوجد نص صالح داخل PDF بعد التنظيف")
                 return None
 
             # --------------------------------------------------
-            # تقسيم النص حسب نوع الـ PDF
+            # 3) تحديث تزايدي إن أمكن
             # --------------------------------------------------
-            if name == "مشروع اللائحة التنفيذية للمناطق المحمية":
-                splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=700,
-                    chunk_overlap=50,
-                    separators=[
-                        "\n===",
-                        "\n— الفصل",
-                        "\n---",
-                        "\n",
-                        " "
-                    ]
-                )
-
-            elif name == "protected_areas_rules":
-                splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=700,
-                    chunk_overlap=50,
-                    separators=[
-                        "\n===",
-                        "\n—",
-                        "\n",
-                        " "
-                    ]
-                )
-
-            else:
-                splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=900,
-                    chunk_overlap=120,
-                    separators=["\n\n", "\n", " ", ""]
+            vs = self._load_mutable(store_path, embeddings) if index_exists else None
+            previous = None
+
+            if vs is not None:
+                if self._manifest_compatible(manifest):
+                    previous = manifest.get("pages") or {}
+                elif manifest is None:
+                    logging.info(f"🧭 تبنّي VectorStore قديم بدون manifest: {name}")
+                    previous = self._adopt_legacy_store(vs, pages, name)
+
+            if vs is not None and previous is not None:
+                reusable = sum(
+                    1 for p in pages
+                    if (previous.get(self._page_key(p)) or {}).get("hash") == self._page_hash(p)
                 )
-
-            chunks = splitter.split_documents(valid_docs)
-
-            # ==================================================
-            # ✅ إضافة Metadata بسيطة ودلالية (خيار A)
-            # ==================================================
-            for c in chunks:
-                text = (c.page_content or "")
-
-                # اسم الملف
-                c.metadata["pdf_name"] = name
-
-                # رقم الصفحة
-                c.metadata["page"] = c.metadata.get("page")
-
-                # -------------------------------
-                # ملف مخالفات المحميات
-                # -------------------------------
-                if name == "protected_areas_rules":
-
-                    if "حماية عالية" in text:
-                        c.metadata["protection_level"] = "high"
-                    elif "حماية متوسطة" in text:
-                        c.metadata["protection_level"] = "medium"
-                    elif "حماية منخفضة" in text:
-                        c.metadata["protection_level"] = "low"
-                    else:
-                        c.metadata["protection_level"] = "unknown"
-
-                    if "صيد" in text:
-                        c.metadata["violation_type"] = "hunting"
-                    elif "رعي" in text:
-                        c.metadata["violation_type"] = "grazing"
-                    elif "احتطاب" in text:
-                        c.metadata["violation_type"] = "logging"
-                    elif "تخييم" in text:
-                        c.metadata["violation_type"] = "camping"
-                    elif "نار" in text:
-                        c.metadata["violation_type"] = "fire"
-                    else:
-                        c.metadata["violation_type"] = "general"
-
-                # -------------------------------
-                # ملف اللائحة التنفيذية (العام)
-                # -------------------------------
-                elif name == "مشروع اللائحة التنفيذية للمناطق المحمية":
-
-                    c.metadata["doc_type"] = "general_guidelines"
-
-                    if "محمية" in text:
-                        c.metadata["content_type"] = "reserve_info"
-                    elif "التعديات" in text:
-                        c.metadata["content_type"] = "violations_info"
-                    elif "الأنواع" in text:
-                        c.metadata["content_type"] = "biodiversity"
-                    else:
-                        c.metadata["content_type"] = "general"
+                if reusable:
+                    vs, pages_state, changed = self._update_incremental(vs, pages, name, previous)
+                    if vs.index.ntotal == 0:
+                        logging.error("❌ لا يوجد Chunks صالحة بعد التقسيم")
+                        return None
+                    self._persist(vs, store_path, name, pdf_hash, pages_state)
+                    logging.info(f"✅ تم تحديث VectorStore ({changed} صفحة): {name}")
+                    return self._open_store(store_path, embeddings, policy) or vs
 
             # --------------------------------------------------
-            # تنظيف إضافي بعد التقسيم
+            # 4) بناء كامل
             # --------------------------------------------------
-            clean_chunks = []
-            for c in chunks:
-                text = (c.page_content or "").strip()
-                if len(text) > 30:
-                    clean_chunks.append(c)
-
-            if not clean_chunks:
-                logging.error("❌ لا يوجد Chunks صالحة بعد التقسيم")
+            vs, pages_state = self._build_full(pages, name, embeddings)
+            if vs is None:
                 return None
 
-            logging.info(f"🏗️ إنشاء VectorStore من {len(clean_chunks)} قطعة نصية")
-
-            vs = FAISS.from_documents(clean_chunks, embeddings)
-            vs.save_local(str(store_path))
-
-            # 🧩 حفظ الـ chunks مع metadata
-            self.save_chunks_to_file(clean_chunks, name)
+            self._persist(vs, store_path, name, pdf_hash, pages_state)
 
             logging.info(f"✅ تم إنشاء وحفظ VectorStore بنجاح: {name}")
-            return vs
+            return self._open_store(store_path, embeddings, policy) or vs
 
         except Exception as e:
             logging.exception("❌ فشل إنشاء VectorStore")
             return None
 
+    # ======================================================
+    # صيغة التخزين (بدون pickle):
+    # - index.faiss           : فهرس FAISS يُفتح بـ mmap
+    # - docstore.jsonl + .idx : نصوص الـ chunks تُقرأ عند الحاجة فقط
+    # ======================================================
+    def _save_store(self, vs, store_path: Path):
+        index_file = store_path / INDEX_FILE
+        tmp_file = store_path / (INDEX_FILE + ".tmp")
+        faiss.write_index(vs.index, str(tmp_file))
+        os.replace(tmp_file, index_file)
+
+        # الفهارس المضغوطة مشتقة من الفهرس الدقيق، فتصبح قديمة بعد أي تغيير
+        for policy in INDEX_POLICIES:
+            derived = store_path / index_filename(policy)
+            if derived != index_file and derived.exists():
+                derived.unlink()
+
+        write_docstore(store_path, vs.index_to_docstore_id, vs.docstore)
+
+        legacy_file = store_path / LEGACY_PICKLE_FILE
+        if legacy_file.exists():
+            legacy_file.unlink()
+
+    def _read_index(self, store_path: Path, mmap: bool, filename: str = INDEX_FILE):
+        index_file = str(store_path / filename)
+        if mmap:
+            try:
+                return faiss.read_index(index_file, faiss.IO_FLAG_MMAP)
+            except Exception as e:
+                logging.warning(f"⚠️ تعذر فتح الفهرس بـ mmap، سيتم تحميله كاملاً: {e}")
+        return faiss.read_index(index_file)
+
+    # ======================================================
+    # فهرس الخدمة حسب السياسة (يُبنى من المتجهات المحفوظة بدون Embeddings)
+    # ======================================================
+    def _ensure_policy_index(self, store_path: Path, policy: str) -> str:
+        filename = index_filename(policy)
+        if policy == "flat" or (store_path / filename).exists():
+            return filename
+
+        exact = self._read_index(store_path, mmap=False)
+        candidate, used = build_index(policy, exact_vectors(exact))
+
+        tmp_file = store_path / (filename + ".tmp")
+        faiss.write_index(candidate, str(tmp_file))
+        os.replace(tmp_file, store_path / filename)
+
+        report = evaluate(exact, candidate, used)
+        with open(store_path / INDEX_REPORT_FILE, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+        logging.info(
+            f"📐 فهرس {used}: recall@{report['k']}={report['recall_at_k']} | "
+            f"{report['latency_ms']}ms مقابل {report['exact_latency_ms']}ms | "
+            f"{report['size_bytes']} بايت مقابل {report['exact_size_bytes']}"
+        )
+        return filename
+
+    # ======================================================
+    # مقارنة كل السياسات لمخزن مسجّل (recall + زمن + حجم)
+    # ======================================================
+    def index_report(self, name: str) -> list:
+        store_path = VECTORSTORE_DIR / self._safe_name(name)
+        if not (store_path / INDEX_FILE).exists():
+            return []
+        return compare_policies(self._read_index(store_path, mmap=False))
+
+    # ======================================================
+    # تحويل مخزن قديم (index.pkl) إلى الصيغة الجديدة مرة واحدة فقط
+    # ======================================================
+    def _migrate_legacy(self, store_path: Path, embeddings):
+        logging.info(f"🧭 تحويل VectorStore قديم إلى صيغة بدون pickle: {store_path.name}")
+        vs = FAISS.load_local(
+            str(store_path),
+            embeddings,
+            allow_dangerous_deserialization=True
+        )
+        self._save_store(vs, store_path)
+        return vs
+
+    # ======================================================
+    # فتح VectorStore للاستعلام (mmap + docstore كسول)
+    # ======================================================
+    def _open_store(self, store_path: Path, embeddings, policy: str = "flat"):
+        try:
+            if not docstore_exists(store_path):
+                self._migrate_legacy(store_path, embeddings)
+
+            filename = self._ensure_policy_index(store_path, policy)
+            docstore = LazyJsonlDocstore(store_path)
+            return FAISS(
+                embedding_function=embeddings,
+                index=self._read_index(store_path, mmap=True, filename=filename),
+                docstore=docstore,
+                index_to_docstore_id=docstore.index_to_docstore_id(),
+            )
+        except Exception as e:
+            logging.error(f"❌ فشل تحميل VectorStore موجود: {e}")
+            return None
+
+    # ======================================================
+    # تحميل VectorStore قابل للتعديل (لمسار التحديث التزايدي فقط)
+    # ======================================================
+    def _load_mutable(self, store_path: Path, embeddings):
+        try:
+            if not docstore_exists(store_path):
+                return self._migrate_legacy(store_path, embeddings)
+
+            docstore, index_to_docstore_id = load_in_memory(store_path)
+            return FAISS(
+                embedding_function=embeddings,
+                index=self._read_index(store_path, mmap=False),
+                docstore=docstore,
+                index_to_docstore_id=index_to_docstore_id,
+            )
+        except Exception as e:
+            logging.error(f"❌ فشل تحميل VectorStore موجود: {e}")
+            return None
+
+    # ======================================================
+    # مجموعات الوثائق (corpus) من أداة الإدخال الجماعي ingest.py
+    # كل عامل يكتب shard (index.faiss + chunks.jsonl بنفس الترتيب)،
+    # ثم تُدمج هنا في مخزن واحد بنفس صيغة مخازن الـ PDF
+    # ======================================================
+    def write_corpus(self, name: str, shard_dirs, sources: dict):
+        store_path = VECTORSTORE_DIR / self._safe_name(name)
+        tmp_path = store_path.with_name(store_path.name + ".building")
+        if tmp_path.exists():
+            shutil.rmtree(tmp_path)
+        tmp_path.mkdir(parents=True)
+
+        shard_dirs = [Path(d) for d in shard_dirs if (Path(d) / SHARD_INDEX_FILE).exists()]
+
+        merged = None
+        for shard in shard_dirs:
+            shard_index = faiss.read_index(str(shard / SHARD_INDEX_FILE))
+            if merged is None:
+                merged = faiss.IndexFlatL2(shard_index.d)
+            merged.add(exact_vectors(shard_index))
+
+        if merged is None or merged.ntotal == 0:
+            shutil.rmtree(tmp_path)
+            logging.error(f"❌ لا يوجد Chunks صالحة في المجموعة: {name}")
+            return 0
+
+        faiss.write_index(merged, str(tmp_path / INDEX_FILE))
+        ids = write_docstore_rows(tmp_path, self._iter_shard_rows(shard_dirs))
+        if len(ids) != merged.ntotal:
+            shutil.rmtree(tmp_path)
+            raise ValueError(f"عدد الـ chunks ({len(ids)}) لا يطابق عدد المتجهات ({merged.ntotal})")
+
+        self._save_manifest(tmp_path, {
+            "name": name,
+            "kind": CORPUS_KIND,
+            "model_name": self.embedding_id,
+            "pipeline_version": PIPELINE_VERSION,
+            "chunks": merged.ntotal,
+            "sources": sources,
+        })
+
+        if store_path.exists():
+            shutil.rmtree(store_path)
+        os.replace(tmp_path, store_path)
+
+        self._save_corpus_chunks(name, shard_dirs)
+        logging.info(f"✅ تم دمج {len(shard_dirs)} shard في مجموعة {name}: {merged.ntotal} chunk")
+        return merged.ntotal
+
+    def _iter_shard_rows(self, shard_dirs):
+        for shard in shard_dirs:
+            with open(shard / SHARD_CHUNKS_FILE, "r", encoding="utf-8") as f:
+                for line in f:
+                    row = json.loads(line)
+                    yield row["id"], row["text"], row["metadata"]
+
+    def _save_corpus_chunks(self, name: str, shard_dirs):
+        # نفس صيغة save_chunks_to_file لكن بالكتابة التدفقية (للفهرس اللفظي)
+        output_file = CHUNKS_DIR / f"{name}_chunks.json"
+        tmp_file = output_file.with_suffix(".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write("[\n")
+            for i, (_, text, metadata) in enumerate(self._iter_shard_rows(shard_dirs)):
+                if i:
+                    f.write(",\n")
+                row = {"chunk_id": i + 1, "text": (text or "").strip(), "metadata": metadata}
+                f.write(json.dumps(row, ensure_ascii=False))
+            f.write("\n]\n")
+        os.replace(tmp_file, output_file)
+
+    # ======================================================
+    # جدول الغرامات المنظم (يُستخرج مرة واحدة لكل نسخة من الـ PDF)
+    # ======================================================
+    def load_fine_table(self, pdf_path: str, name: str) -> list:
+        table_file = VECTORSTORE_DIR / self._safe_name(name) / FINE_TABLE_FILE
+        pdf_hash = self._file_hash(pdf_path) if Path(pdf_path).exists() else None
+
+        if table_file.exists():
+            try:
+                with open(table_file, "r", encoding="utf-8") as f:
+                    cached = json.load(f)
+                if cached.get("version") == FINE_TABLE_VERSION and pdf_hash in (None, cached.get("pdf_hash")):
+                    return cached.get("rows") or []
+            except Exception as e:
+                logging.warning(f"⚠️ جدول الغرامات المحفوظ تالف وسيُعاد استخراجه: {e}")
+
+        if pdf_hash is None:
+            return []
+
+        pages = self._normalize_pages(list(self._carry_section_levels(self._load_pages(pdf_path))))
+        rows = extract_fine_rows(pages)
+
+        table_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = table_file.with_suffix(".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"version": FINE_TABLE_VERSION, "pdf_hash": pdf_hash, "rows": rows}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, table_file)
+
+        logging.info(f"💰 تم استخراج جدول الغرامات ({name}): {len(rows)} مخالفة")
+        return rows
+
+    def store_version(self, name: str) -> str:
+        """بصمة قصيرة لمحتوى المخزن (تتغير عند إعادة الفهرسة)"""
+        manifest = self._load_manifest(VECTORSTORE_DIR / self._safe_name(name)) or {}
+        if manifest.get("kind") == CORPUS_KIND:
+            source = json.dumps(manifest.get("sources") or {}, sort_keys=True)
+        else:
+            source = manifest.get("pdf_hash") or ""
+        return self._text_hash(f"{self.embedding_id}|{PIPELINE_VERSION}|{source}")[:12]
+
+    def list_corpora(self) -> list:
+        names = []
+        for manifest_file in sorted(VECTORSTORE_DIR.glob(f"*/{MANIFEST_FILE}")):
+            manifest = self._load_manifest(manifest_file.parent)
+            if manifest and manifest.get("kind") == CORPUS_KIND and self._manifest_compatible(manifest):
+                names.append(manifest["name"])
+        return names
+
+    def open_corpus(self, name: str, index_policy: str = None):
+        embeddings = self.get_embeddings()
+        if embeddings is None:
+            logging.error("❌ لا يمكن فتح المجموعة بدون Embeddings")
+            return None
+
+        store_path = VECTORSTORE_DIR / self._safe_name(name)
+        manifest = self._load_manifest(store_path)
+        if not manifest or manifest.get("kind") != CORPUS_KIND:
+            logging.error(f"❌ لا توجد مجموعة بهذا الاسم: {name}")
+            return None
+        if not self._manifest_compatible(manifest):
+            logging.warning(f"⚠️ المجموعة {name} بُنيت بإعدادات قديمة، أعد تشغيل ingest.py")
+            return None
+
+        policy = normalize_policy(index_policy or PDF_INDEX_POLICY.get(name, DEFAULT_INDEX_POLICY))
+        return self._open_store(store_path, embeddings, policy)
+
 
 # ======================================================
 # Instance واحد فقط للخدمة
 # ======================================================
-vectorstore_service = VectorStoreService()
\ No newline at end of file
+vectorstore_service = VectorStoreService()
@@ -1,6 +1,7 @@
 from services.audio_utils import listen_to_mic, speak_text
 from services.rag_service import answer
 from services.retriever_service import retrievers
+from services.lexicon import lexicon
 import time
 
 def start_voice_assistant_standalone():
@@ -14,7 +15,7 @@ def start_voice_assistant_standalone():
         
         if query:
             print(f"🎤 سمعت: {query}")
-            if any(word in query for word in ["خروج", "إيقاف", "انهاء"]):
+            if lexicon.scan(query).has("command.exit"):
                 speak_text("مع السلامة.")
                 break
                 
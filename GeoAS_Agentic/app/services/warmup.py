@@ -0,0 +1,113 @@
+# warmup.py
+# ======================================================
+# تحميل المكونات الثقيلة في الخلفية بعد فتح المنفذ مباشرة:
+# - Embeddings ثم محركات الاسترجاع لكل PDF ولكل مجموعة وثائق (بالترتيب)
+# - Whisper و LLM و tokenizer الموديل (ميزانية الـ Prompt) بالتوازي معها
+# كل مكون يسجّل حالته في readiness (/healthz و /readyz)
+# ======================================================
+import asyncio
+import logging
+
+from services.readiness import readiness
+
+
+def retriever_component(name: str) -> str:
+    return f"retriever:{name}"
+
+
+def _warm_retrievers(pdf_paths, corpora):
+    # الاستيراد هنا حتى لا يبطئ تحميل الوحدة بدء التطبيق
+    from services.vectorstore_service import vectorstore_service
+    from services.retriever_service import register_pdf, register_corpus, retrievers, _normalize_key
+
+    readiness.loading("embeddings")
+    if vectorstore_service.get_embeddings() is None:
+        readiness.failed("embeddings", "تعذر تحميل موديل الـ Embeddings")
+        for name in [pdf.stem for pdf in pdf_paths] + corpora:
+            readiness.failed(retriever_component(name), "الـ Embeddings غير متاحة")
+        return
+    readiness.ready("embeddings", vectorstore_service.embedding_id)
+
+    for pdf in pdf_paths:
+        component = retriever_component(pdf.stem)
+        readiness.loading(component)
+        register_pdf(pdf.stem, str(pdf))
+        if _normalize_key(pdf.stem) in retrievers:
+            readiness.ready(component)
+        else:
+            readiness.failed(component, "فشل تسجيل ملف PDF")
+
+    # مجموعات الوثائق المبنية بأداة ingest.py
+    for name in corpora:
+        component = retriever_component(name)
+        readiness.loading(component)
+        register_corpus(name)
+        if name in retrievers:
+            readiness.ready(component, "corpus")
+        else:
+            readiness.failed(component, "فشل فتح مجموعة الوثائق")
+
+
+def _warm_whisper():
+    try:
+        from services.audio_utils import get_whisper_model
+        get_whisper_model()
+    except Exception as e:
+        readiness.failed("whisper", e)
+
+
+def _warm_tokenizer():
+    readiness.loading("tokenizer")
+    try:
+        from services.prompt_builder import load_tokenizer
+        readiness.ready("tokenizer", load_tokenizer())
+    except Exception as e:
+        readiness.failed("tokenizer", f"سيُستخدم تقدير تقريبي لعدد التوكنات: {e}")
+
+
+def _warm_llm():
+    try:
+        from services.llm_service import warm_llm
+        warm_llm()
+    except Exception as e:
+        readiness.failed("llm", e)
+
+
+def _list_corpora():
+    try:
+        from services.vectorstore_service import vectorstore_service
+        return vectorstore_service.list_corpora()
+    except Exception as e:
+        logging.error(f"❌ تعذر قراءة مجموعات الوثائق: {e}")
+        return []
+
+
+async def warm_up(pdf_paths):
+    pdf_paths = list(pdf_paths)
+    corpora = await asyncio.to_thread(_list_corpora)
+
+    readiness.register("embeddings")
+    for pdf in pdf_paths:
+        readiness.register(retriever_component(pdf.stem))
+    for name in corpora:
+        readiness.register(retriever_component(name))
+    readiness.register("whisper")
+    readiness.register("tokenizer")
+    readiness.register("llm")
+
+    logging.info(
+        f"⏳ تحميل المكونات في الخلفية ({len(pdf_paths)} PDF + {len(corpora)} مجموعة + Whisper + Tokenizer + LLM)..."
+    )
+    results = await asyncio.gather(
+        asyncio.to_thread(_warm_retrievers, pdf_paths, corpora),
+        asyncio.to_thread(_warm_whisper),
+        asyncio.to_thread(_warm_tokenizer),
+        asyncio.to_thread(_warm_llm),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logging.error(f"❌ خطأ أثناء التحميل في الخلفية: {result}")
+
+    state = readiness.snapshot()
+    logging.info(f"✅ انتهى التحميل في الخلفية: {state['progress']} (جاهز: {state['ready']})")
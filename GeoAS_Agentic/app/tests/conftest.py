@@ -0,0 +1,11 @@
+# conftest.py
+# ======================================================
+# الاختبارات تستورد الوحدات كما يستوردها التطبيق (from services.x / from config)
+# فمجلد app يُضاف لمسار الاستيراد:  cd GeoAS_Agentic/app && python -m pytest tests
+# ======================================================
+import sys
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parents[1]
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
@@ -0,0 +1,167 @@
+# test_add_points.py
+# ======================================================
+# /llm/add-points: صيغ الجسم (_parse_track)، حدود الإحداثيات والحجم،
+# والموقع الحالي = أحدث نقطة لكل جهاز فقط
+# ======================================================
+import json
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+from routers import chat
+from routers.chat import TrackPointIn, _parse_track
+from services.location_store import LocationStore
+
+
+POINTS = [
+    {"lat": 24.1, "lng": 46.1, "timestamp": "2026-01-01T10:00:00Z", "device_id": "d1"},
+    {"lat": 24.2, "lng": 46.2},
+]
+
+
+# ======================================================
+# _parse_track
+# ======================================================
+def _coords(points):
+    return [(p.lat, p.lng) for p in points]
+
+
+def test_parse_json_array():
+    points = _parse_track(json.dumps(POINTS).encode(), "application/json")
+    assert _coords(points) == [(24.1, 46.1), (24.2, 46.2)]
+    assert points[0].device_id == "d1"
+    assert points[0].timestamp.isoformat() == "2026-01-01T10:00:00+00:00"
+    assert points[1].timestamp is None
+
+
+def test_parse_points_object():
+    points = _parse_track(json.dumps({"points": POINTS}).encode(), "application/json")
+    assert _coords(points) == [(24.1, 46.1), (24.2, 46.2)]
+
+
+def test_parse_object_without_points_is_empty():
+    assert _parse_track(b'{"other": 1}', "application/json") == []
+
+
+@pytest.mark.parametrize("content_type", ["application/x-ndjson", "application/jsonl"])
+def test_parse_ndjson_skips_blank_lines(content_type):
+    body = "\n".join(json.dumps(p) for p in POINTS[:1]) + "\n\n  \n" + json.dumps(POINTS[1]) + "\n"
+    points = _parse_track(body.encode(), content_type)
+    assert _coords(points) == [(24.1, 46.1), (24.2, 46.2)]
+
+
+@pytest.mark.parametrize("body", [b'{"lat": 1', b'"points"', b'[1, 2]', "[]".encode("utf-16")])
+def test_parse_rejects_invalid_body(body):
+    with pytest.raises((ValueError, ValidationError)):
+        _parse_track(body, "application/json")
+
+
+@pytest.mark.parametrize("lat, lng", [(90.5, 0), (-91, 0), (0, 180.5), (0, -181)])
+def test_coordinates_out_of_range(lat, lng):
+    with pytest.raises(ValidationError):
+        TrackPointIn(lat=lat, lng=lng)
+    TrackPointIn(lat=max(-90, min(90, lat)), lng=max(-180, min(180, lng)))
+
+
+@pytest.mark.parametrize("content_type", ["application/json", "application/x-ndjson"])
+def test_too_many_points_rejected_before_validation(content_type, monkeypatch):
+    # نقاط غير صالحة: لو تم التحقق منها أولاً لكانت النتيجة ValidationError وليس 413
+    items = [{"lat": "x"}] * 4
+    body = "\n".join(map(json.dumps, items)) if "ndjson" in content_type else json.dumps(items)
+    monkeypatch.setattr(TrackPointIn, "model_validate", classmethod(lambda cls, item: pytest.fail("validated")))
+    with pytest.raises(HTTPException) as e:
+        _parse_track(body.encode(), content_type, max_points=3)
+    assert e.value.status_code == 413
+
+
+# ======================================================
+# المسار /llm/add-points
+# ======================================================
+class FakeDB:
+    def __init__(self):
+        self.saved = []
+
+    def find_zone(self, lat, lng):
+        return ("محمية", "عالي") if lat >= 25 else None
+
+    def save_points(self, rows):
+        self.saved.extend(rows)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = LocationStore(shards=4, ttl_seconds=300, persist_path=None)
+    monkeypatch.setattr(chat, "location_store", store)
+    return store
+
+
+@pytest.fixture
+def client(store, monkeypatch):
+    monkeypatch.setattr(chat.geofence, "_index", None)   # المحمية من db.find_zone
+    app = FastAPI()
+    app.include_router(chat.router)
+    app.state.db_gps = FakeDB()
+    return TestClient(app)
+
+
+def _point(device, hour, lat):
+    return {"lat": lat, "lng": 46.0, "timestamp": f"2026-01-01T{hour:02d}:00:00Z", "device_id": device}
+
+
+def test_only_newest_fix_per_device_updates_location(client, store, monkeypatch):
+    writes = []
+    put = store.put
+    monkeypatch.setattr(store, "put", lambda device_id, *args, **kwargs: writes.append(device_id) or put(device_id, *args, **kwargs))
+
+    # الترتيب في الطلب ليس ترتيب الزمن: أحدث نقطة لـ d1 في المنتصف
+    track = [_point("d1", 9, 24.0), _point("d1", 11, 25.0), _point("d1", 10, 24.0), _point("d2", 8, 24.0)]
+    response = client.post("/llm/add-points", json=track)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["count"] == 4
+    assert body["inside"] == 1
+    assert sorted(writes) == ["d1", "d2"]
+    assert body["latest"]["d1"]["inside"] is True
+    assert body["latest"]["d1"]["timestamp"].startswith("2026-01-01T11:00:00")
+    assert store.get("d1")["zone_name"] == "محمية"
+    assert store.get("d2")["inside"] is False
+    assert len(client.app.state.db_gps.saved) == 4
+
+
+def test_older_upload_does_not_replace_current_location(client, store):
+    client.post("/llm/add-points", json=[_point("d1", 12, 25.0)])
+    client.post("/llm/add-points", json=[_point("d1", 9, 24.0)])
+    assert store.get("d1")["inside"] is True
+    assert store.get("d1")["timestamp"].hour == 12
+
+
+def test_request_too_large_is_rejected_before_reading(client, monkeypatch):
+    monkeypatch.setattr(chat, "ADD_POINTS_MAX_BYTES", 100)
+    monkeypatch.setattr(chat, "_parse_track", lambda *args: pytest.fail("parsed"))
+    response = client.post("/llm/add-points", json=[_point("d1", 9, 24.0)] * 5)
+    assert response.status_code == 413
+    assert client.app.state.db_gps.saved == []
+
+
+def test_chunked_request_too_large_is_rejected(client, monkeypatch):
+    # بدون Content-Length: الحد يُفحص أثناء قراءة الجسم
+    monkeypatch.setattr(chat, "ADD_POINTS_MAX_BYTES", 100)
+    chunks = iter([json.dumps([_point("d1", 9, 24.0)] * 5).encode()])
+    response = client.post("/llm/add-points", content=chunks, headers={"content-type": "application/json"})
+    assert response.status_code == 413
+    assert client.app.state.db_gps.saved == []
+
+
+def test_too_many_points_is_413(client, monkeypatch):
+    monkeypatch.setattr(chat, "ADD_POINTS_MAX_BATCH", 2)
+    response = client.post("/llm/add-points", json=[_point("d1", 9, 24.0)] * 3)
+    assert response.status_code == 413
+
+
+def test_out_of_range_point_is_422(client):
+    response = client.post("/llm/add-points", json=[{"lat": 95, "lng": 46}])
+    assert response.status_code == 422
+    assert client.app.state.db_gps.saved == []
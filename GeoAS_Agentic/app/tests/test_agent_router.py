@@ -0,0 +1,109 @@
+# test_agent_router.py
+# ======================================================
+# route_text / aroute_text / route_text_stream: نفس القرار ونفس الإخراج
+# ======================================================
+import asyncio
+
+import pytest
+
+from services.agents.agent_router import AgentRouter
+
+
+class FakeLocation:
+    def __init__(self, location):
+        self.location = location
+
+    def get_location(self, request):
+        return dict(self.location)
+
+
+class FakePDFAgent:
+    def __init__(self, name):
+        self.name = name
+        self.calls = []
+
+    def _answer(self, query, *args):
+        self.calls.append((query, *args))
+        return f"{self.name}: {query}", "context"
+
+    def handle(self, query, *args):
+        return self._answer(query, *args)
+
+    async def ahandle(self, query, *args):
+        return self._answer(query, *args)
+
+    async def stream(self, query, *args):
+        response = self._answer(query, *args)
+        yield "token", response[0]
+        yield "done", response
+
+
+class FakePermissionAgent(FakePDFAgent):
+    def handle(self, query, pdf_agent, protection_level):
+        return self._answer(query, pdf_agent.name, protection_level)
+
+    async def ahandle(self, query, pdf_agent, protection_level):
+        return self._answer(query, pdf_agent.name, protection_level)
+
+    async def stream(self, query, pdf_agent, protection_level):
+        response = self._answer(query, pdf_agent.name, protection_level)
+        yield "token", response[0]
+        yield "done", response
+
+
+class FakePDFRouter:
+    def __init__(self):
+        self.agents = {True: FakePDFAgent("rules"), False: FakePDFAgent("general")}
+
+    def route(self, inside):
+        return self.agents[bool(inside)]
+
+
+INSIDE = {"inside": True, "zone_name": "محمية الإمام تركي", "protection_level": "high"}
+OUTSIDE = {"inside": False, "zone_name": None, "protection_level": None}
+
+
+def _router(location):
+    router = AgentRouter()
+    router.location_agent = FakeLocation(location)
+    router.permission_agent = FakePermissionAgent("permission")
+    router.pdf_router = FakePDFRouter()
+    return router
+
+
+async def _all_variants(router, query):
+    sync = router.route_text(None, query)
+    not_streamed = await router.aroute_text(None, query)
+    tokens, streamed = [], None
+    async for kind, payload in router.route_text_stream(None, query):
+        if kind == "token":
+            tokens.append(payload)
+        else:
+            streamed = payload
+    return sync, not_streamed, streamed, "".join(tokens)
+
+
+@pytest.mark.parametrize("location", [INSIDE, OUTSIDE])
+@pytest.mark.parametrize("query", ["كم غرامة الصيد؟", "هل التخييم مسموح؟", "ما هي المحمية؟"])
+def test_variants_agree(location, query):
+    sync, not_streamed, streamed, tokens = asyncio.run(_all_variants(_router(location), query))
+
+    assert sync == not_streamed == streamed
+    assert tokens == sync["response"]
+
+
+def test_inside_passes_protection_level_and_prefixes_location():
+    router = _router(INSIDE)
+    result = router.route_text(None, "كم غرامة الصيد؟")
+
+    assert router.pdf_router.agents[True].calls == [("كم غرامة الصيد؟", "high")]
+    assert result["response"].startswith("بحسب تواجدك في محمية محمية الإمام تركي")
+    assert result["inside_geofence"] is True
+
+
+def test_permission_goes_to_permission_agent():
+    router = _router(OUTSIDE)
+    result = router.route_text(None, "هل التخييم مسموح؟")
+
+    assert result["intent"] == "permission"
+    assert router.permission_agent.calls == [("هل التخييم مسموح؟", "general", None)]
@@ -0,0 +1,64 @@
+# test_arabic_text.py
+# ======================================================
+# توحيد نص الـ PDF عند الإدخال: الأسطر البصرية والكلمات المعكوسة حرفياً
+# ======================================================
+import re
+import unicodedata
+
+import pytest
+from pypdf import PdfReader
+
+from conftest import APP_DIR
+from services.arabic_text import normalize_for_ingestion, _visual_word_to_logical
+
+
+RULES_PDF = APP_DIR / "data" / "protected_areas_rules.pdf"
+
+# أسطر الغرامات كما يجب أن تكون بعد التوحيد: "<العدد> ألفًا / آلاف / ألف ريال سعودي [عن كل كائن]"
+FINE_LINE_RE = re.compile(r"^الغرامة: ([ء-ي]+ )*?(ألفًا|آلاف|ألف) ريال سعودي( عن كل كائن)?$")
+
+
+def _rules_lines():
+    reader = PdfReader(str(RULES_PDF))
+    lines = []
+    for page in reader.pages:
+        lines.extend(normalize_for_ingestion(page.extract_text()).split("\n"))
+    return lines
+
+
+@pytest.mark.parametrize("visual, logical", [
+    ("ﺎًﻔأﻟ", "ألفًا"),      # معكوسة حرفياً + حرفان متبادلان
+    ("ﻒﻋﺎﻀُﺗ", "تُضاعف"),   # التشكيل يبقى على حرفه
+    ("ﺴﺔﺧﻤ", "خمسة"),
+    ("يدﻮﺳﻌ", "سعودي"),
+    ("نوﺮﺸﻋو", "وعشرون"),
+])
+def test_character_reversed_words_are_restored(visual, logical):
+    restored = _visual_word_to_logical(visual)
+    assert unicodedata.normalize("NFKC", restored) == logical
+
+
+@pytest.mark.parametrize("word", ["اﻟﻐﺮاﻣﺔ", "ﻣﺨﺎﻟﻔﺎت", "ﺳﻌﻮدي", "أدوات", "محمية"])
+def test_logical_words_are_untouched(word):
+    assert _visual_word_to_logical(word) == word
+
+
+def test_rules_pdf_fine_lines_are_logical():
+    fines = [line for line in _rules_lines() if line.startswith("الغرامة")]
+    assert len(fines) == 27
+    for line in fines:
+        assert FINE_LINE_RE.match(line), line
+        assert "اًفأل" not in line
+
+
+def test_rules_pdf_medium_ostrich_fine():
+    lines = _rules_lines()
+    start = lines.index("===مستوى الحماية: متوسطة===")
+    ostrich = lines.index("المخالفة: صيد نعام", start)
+    assert lines[ostrich + 1] == "الغرامة: خمسة وعشرون ألفًا ريال سعودي عن كل كائن"
+
+
+def test_rules_pdf_notes_are_logical():
+    notes = [line for line in _rules_lines() if line.startswith("ملاحظة")]
+    assert notes
+    assert all(line.startswith("ملاحظة: تُضاعف الغرامة") for line in notes)
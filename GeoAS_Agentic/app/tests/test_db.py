@@ -0,0 +1,63 @@
+# test_db.py
+# ======================================================
+# Database.save_points: الدفعة كلها في عبارة INSERT واحدة (ذرية مع autocommit)
+# ======================================================
+from datetime import datetime
+
+import pytest
+
+from services import db as db_module
+from services.db import Database
+
+
+class FakeCursor:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    autocommit = True
+
+    def cursor(self):
+        return FakeCursor()
+
+
+@pytest.fixture
+def db():
+    # بدون اتصال بـ PostgreSQL
+    db = Database.__new__(Database)
+    db.conn = FakeConnection()
+    return db
+
+
+@pytest.fixture
+def statements(monkeypatch):
+    calls = []
+
+    def execute_values(cur, query, rows, template=None, page_size=100):
+        # نفس تقسيم psycopg2: عبارة INSERT لكل page_size صف
+        calls.extend(rows[i:i + page_size] for i in range(0, len(rows), page_size))
+
+    monkeypatch.setattr(db_module, "execute_values", execute_values)
+    return calls
+
+
+def _points(n):
+    return [(24.0 + i * 1e-5, 46.0, datetime(2026, 1, 1), i % 2 == 0, None) for i in range(n)]
+
+
+@pytest.mark.parametrize("n", [1, 999, 1001, 5000])
+def test_save_points_is_one_statement(db, statements, n):
+    db.save_points(_points(n))
+    assert len(statements) == 1
+    assert len(statements[0]) == n
+    # ترتيب الأعمدة في القالب: lon ثم lat
+    assert statements[0][0][:2] == (46.0, 24.0)
+
+
+def test_save_no_points(db, statements):
+    db.save_points([])
+    assert statements == []
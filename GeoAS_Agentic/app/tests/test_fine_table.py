@@ -0,0 +1,90 @@
+# test_fine_table.py
+# ======================================================
+# جدول الغرامات: الاستخراج من المرجع والتحقق من السجلات قبل الإجابة المباشرة
+# ======================================================
+import pytest
+from langchain_core.documents import Document
+from pypdf import PdfReader
+
+from conftest import APP_DIR
+from services.arabic_text import normalize_for_ingestion
+from services.fine_table import (
+    FineTable,
+    extract_fine_rows,
+    format_fine_answer,
+    garbled_words,
+    parse_fine_amount,
+)
+
+
+def _pages(text):
+    return [Document(page_content=text, metadata={"page": 0})]
+
+
+@pytest.mark.parametrize("fine, amount", [
+    ("خمسة آلاف ريال سعودي", 5000),
+    ("ألف ريال سعودي", 1000),
+    ("خمسة وثلاثون ألفًا ريال سعودي عن كل كائن", 35000),
+    ("اثنا عشر ألفًا ريال سعودي", 12000),
+    ("5,000 ريال", 5000),
+])
+def test_parse_fine_amount(fine, amount):
+    assert parse_fine_amount(fine) == amount
+
+
+@pytest.mark.parametrize("fine", [
+    "خمسة وثلاثون اًفأل ريال سعودي",
+    "سةخم نورشعو اًفأل ريال يدوسع",
+    "غرامة مالية",
+    "خمسة آلاف",
+])
+def test_unparseable_fine_amount(fine):
+    assert parse_fine_amount(fine) is None
+
+
+def test_garbled_words():
+    assert garbled_words("خمسة وثلاثون اًفأل ريال") == ["اًفأل"]
+    assert garbled_words("سةخم نورشعو") == ["سةخم"]
+    assert garbled_words("عشرون ألفًا، ريال سعودي عن كل كائن") == []
+
+
+def test_rules_pdf_rows_are_valid():
+    reader = PdfReader(str(APP_DIR / "data" / "protected_areas_rules.pdf"))
+    pages = [
+        Document(page_content=normalize_for_ingestion(page.extract_text()), metadata={"page": i})
+        for i, page in enumerate(reader.pages)
+    ]
+    rows = extract_fine_rows(pages)
+
+    assert len(rows) == 27
+    assert not [r for r in rows if r.get("invalid")]
+    ostrich = next(r for r in rows if r["violation"] == "صيد نعام")
+    assert (ostrich["protection_level"], ostrich["amount"]) == ("medium", 25000)
+
+
+GARBLED = """===مستوى الحماية: متوسطة===
+المخالفة: صيد نعام
+الغرامة: سةخم نورشعو اًفأل ريال يدوسع نع لك نئاك
+---
+المخالفة: الرعي داخل محمية رسمية
+الغرامة: ثمانية آلاف ريال سعودي
+---
+"""
+
+
+def test_garbled_row_is_marked_invalid():
+    rows = extract_fine_rows(_pages(GARBLED))
+
+    assert [bool(r.get("invalid")) for r in rows] == [True, False]
+    assert rows[1]["amount"] == 8000
+
+
+def test_invalid_row_is_never_served():
+    table = FineTable(extract_fine_rows(_pages(GARBLED)))
+
+    # السؤال يطابق السجل غير الصالح → None (RAG + LLM)، وليس سجلاً آخر
+    assert table.lookup("كم غرامة صيد النعام؟", "medium") is None
+    assert table.stats["invalid"] == 1
+
+    row = table.lookup("كم غرامة الرعي؟", "medium")
+    assert format_fine_answer(row).startswith("المخالفة: الرعي داخل محمية رسمية\nالغرامة: ثمانية آلاف")
@@ -0,0 +1,133 @@
+# test_geofence.py
+# ======================================================
+# GeofenceIndex / Geofence: نفس نتائج ST_Contains في PostGIS
+# (التداخل → الأصغر id، الحد = خارج المحمية)، الفهرس الفارغ، وإعادة التحميل
+# ======================================================
+import pytest
+import shapely
+
+from services.geofence import Geofence, GeofenceIndex
+
+
+def _zone(zone_id, name, lon_min, lat_min, lon_max, lat_max, level="عالي"):
+    geom = shapely.box(lon_min, lat_min, lon_max, lat_max)
+    return (zone_id, name, level, shapely.to_wkb(geom), shapely.geometry.mapping(geom))
+
+
+# مربعان متداخلان في [1, 2] × [1, 2]، الأكبر id مضاف أولاً
+ZONES = [
+    _zone(7, "الكبرى", 0, 0, 2, 2),
+    _zone(3, "الصغرى", 1, 1, 3, 3, level="متوسط"),
+]
+
+
+class FakeDB:
+    def __init__(self, rows, signature="v1"):
+        self.rows = rows
+        self.signature = signature
+        self.loads = 0
+
+    def get_zones_signature(self):
+        return self.signature
+
+    def get_zones(self):
+        self.loads += 1
+        return list(self.rows)
+
+
+@pytest.fixture
+def index():
+    return GeofenceIndex(ZONES, signature="v1")
+
+
+def test_point_inside_one_zone(index):
+    assert index.lookup(0.5, 0.5)["id"] == 7
+    assert index.lookup(2.5, 2.5)["id"] == 3
+
+
+def test_overlap_picks_lowest_id(index):
+    zone = index.lookup(1.5, 1.5)
+    assert zone == {"id": 3, "name": "الصغرى", "protection_level": "متوسط"}
+
+
+@pytest.mark.parametrize("lon, lat", [(0, 0.5), (2, 0.5), (0.5, 0), (0, 0), (3, 3)])
+def test_point_on_boundary_is_outside(index, lon, lat):
+    assert index.lookup(lon, lat) is None
+
+
+def test_boundary_of_one_zone_inside_another(index):
+    # (1, 1.5) على حد الصغرى وداخل الكبرى
+    assert index.lookup(1, 1.5)["id"] == 7
+
+
+def test_lookup_many_keeps_point_order(index):
+    zones = index.lookup_many([2.5, 5, 0.5, 1.5], [2.5, 5, 0.5, 1.5])
+    assert [z["id"] if z else None for z in zones] == [3, None, 7, 3]
+
+
+def test_empty_index():
+    index = GeofenceIndex([])
+    assert len(index) == 0
+    assert index.lookup(0.5, 0.5) is None
+    assert index.lookup_many([0.5, 1], [0.5, 1]) == [None, None]
+    assert index.lookup_many([], []) == []
+    assert index.near_zone(7, 0.5, 0.5, 100) is False
+    assert index.geojson == {"type": "FeatureCollection", "features": []}
+
+
+def test_near_zone(index):
+    # 0.0005° ≈ 56 m خارج الحد الشرقي للصغرى
+    assert index.near_zone(3, 3.0005, 2, meters=100)
+    assert not index.near_zone(3, 3.0005, 2, meters=20)
+    assert not index.near_zone(99, 1.5, 1.5, meters=100)
+
+
+def test_geofence_before_load_returns_nothing():
+    fence = Geofence(refresh_seconds=60)
+    assert not fence.ready
+    assert fence.lookup(0.5, 0.5) is None
+    assert fence.lookup_many([(0.5, 0.5)]) == [None]
+    assert fence.zones_geojson() is None
+
+
+def test_geofence_lookup_takes_lat_lon():
+    fence = Geofence(refresh_seconds=60)
+    fence.load(FakeDB(ZONES))
+    assert fence.lookup(lat=2.5, lon=2.5)["id"] == 3
+    assert [z["id"] for z in fence.lookup_many([(0.5, 0.5), (1.5, 1.5)])] == [7, 3]
+
+
+def test_refresh_reloads_only_when_signature_changes():
+    db = FakeDB(ZONES)
+    fence = Geofence(refresh_seconds=60)
+    fence.load(db)
+    first = fence.index
+
+    assert fence.refresh(db) is False
+    assert fence.index is first
+    assert db.loads == 1
+
+    db.rows = [_zone(9, "جديدة", 10, 10, 11, 11)]
+    db.signature = "v2"
+    assert fence.refresh(db) is True
+    assert db.loads == 2
+
+    # الفهرس الجديد يحل محل القديم بالكامل، والقديم لم يتغير لمن يقرأ منه
+    assert fence.index is not first
+    assert fence.index.signature == "v2"
+    assert fence.lookup(lat=10.5, lon=10.5)["id"] == 9
+    assert fence.lookup(lat=0.5, lon=0.5) is None
+    assert first.lookup(0.5, 0.5)["id"] == 7
+    assert fence.stats["reloads"] == 2
+
+
+def test_reload_to_empty_table():
+    db = FakeDB(ZONES)
+    fence = Geofence(refresh_seconds=60)
+    fence.load(db)
+
+    db.rows, db.signature = [], "empty"
+    assert fence.refresh(db) is True
+    assert fence.ready
+    assert fence.lookup(lat=0.5, lon=0.5) is None
+    assert fence.snapshot()["zones"] == 0
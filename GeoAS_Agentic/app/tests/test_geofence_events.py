@@ -0,0 +1,243 @@
+# test_geofence_events.py
+# ======================================================
+# GeofenceEvents.observe بأوقات صريحة (ts=): dwell، hysteresis عند الخروج، zone_changed
+# ======================================================
+import pytest
+import shapely
+
+from services import geofence_events as events_module
+from services.geofence import Geofence
+from services.geofence_events import EventHub, GeofenceEvents
+
+
+T0 = 1_000_000.0   # نقاط قديمة: لا تنبيه صوتي إلا في اختبار التنبيه
+DWELL = 3
+HYSTERESIS_M = 15
+
+# 0.0001° ≈ 11 m (داخل الـ hysteresis)، 0.001° ≈ 111 m (خارجها)
+NEAR, FAR = 0.0001, 0.001
+
+
+class FakeDB:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def get_zones_signature(self):
+        return "v1"
+
+    def get_zones(self):
+        return self.rows
+
+
+def _zone(zone_id, name, lon_min, lat_min, lon_max, lat_max):
+    geom = shapely.box(lon_min, lat_min, lon_max, lat_max)
+    return (zone_id, name, "عالي", shapely.to_wkb(geom), shapely.geometry.mapping(geom))
+
+
+@pytest.fixture
+def fence(monkeypatch):
+    # محميتان متلاصقتان: A = [0, 1] و B = [1, 2] على خط الطول، نفس العرض [0, 1]
+    fence = Geofence(refresh_seconds=60)
+    fence.load(FakeDB([_zone(1, "A", 0, 0, 1, 1), _zone(2, "B", 1, 0, 2, 1)]))
+    monkeypatch.setattr(events_module, "geofence", fence)
+    return fence
+
+
+@pytest.fixture
+def alerts(monkeypatch):
+    played = []
+    monkeypatch.setattr(events_module, "play_alert_background", lambda path: played.append(path) or True)
+    return played
+
+
+@pytest.fixture
+def tracker(fence, alerts):
+    return GeofenceEvents(EventHub(queue_size=10), hysteresis_m=HYSTERESIS_M, dwell_seconds=DWELL)
+
+
+def _observe(tracker, lon, t, lat=0.5, device="d1"):
+    return [e["type"] for e in tracker.observe(device, lat, lon, ts=T0 + t)]
+
+
+def _zone_of(tracker, device="d1"):
+    zone = tracker.devices[device]["zone"]
+    return zone["name"] if zone else None
+
+
+def _enter_a(tracker):
+    assert _observe(tracker, 0.5, 0) == []
+    assert _observe(tracker, 0.5, DWELL) == ["enter"]
+
+
+def test_enter_confirmed_after_dwell(tracker):
+    assert _observe(tracker, 0.5, 0) == []
+    assert _observe(tracker, 0.5, DWELL - 1) == []
+    assert _zone_of(tracker) is None
+
+    event = tracker.observe("d1", 0.5, 0.5, ts=T0 + DWELL)[0]
+    assert event["type"] == "enter"
+    assert event["zone"]["name"] == "A"
+    assert event["previous_zone"] is None
+    assert event["timestamp"].startswith("1970-01-12T13:46:4")
+    assert _zone_of(tracker) == "A"
+
+
+def test_short_visit_is_suppressed(tracker):
+    assert _observe(tracker, 0.5, 0) == []
+    assert _observe(tracker, 5, 1) == []        # عودة للخارج قبل انتهاء الـ dwell
+    assert _observe(tracker, 5, 10) == []
+    assert _zone_of(tracker) is None
+    assert tracker.stats["suppressed"] == 1
+    assert len(tracker.hub) == 0 and tracker.hub.stats["published"] == 0
+
+
+def test_dwell_restarts_when_candidate_changes(tracker):
+    assert _observe(tracker, 0.5, 0) == []      # مرشح A
+    assert _observe(tracker, 1.5, 2) == []      # مرشح B: الـ dwell يبدأ من جديد
+    assert _observe(tracker, 1.5, 4) == []
+    assert _observe(tracker, 1.5, 2 + DWELL) == ["enter"]
+    assert _zone_of(tracker) == "B"
+
+
+def test_jitter_near_boundary_is_not_an_exit(tracker):
+    _enter_a(tracker)
+    # خارج A بحوالي 11 m (ليست داخل B: العرض خارج [0, 1])
+    for t in range(DWELL + 1, DWELL + 20):
+        assert _observe(tracker, 0.5, t, lat=1 + NEAR) == []
+    assert _zone_of(tracker) == "A"
+    assert tracker.devices["d1"]["candidate"] is None
+
+
+def test_exit_needs_distance_and_dwell(tracker):
+    _enter_a(tracker)
+    assert _observe(tracker, 0.5, 10, lat=1 + FAR) == []
+    assert _observe(tracker, 0.5, 11, lat=1 + NEAR) == []   # رجع لمسافة الـ hysteresis → يلغي الخروج
+    assert _observe(tracker, 0.5, 12, lat=1 + FAR) == []
+    assert _observe(tracker, 0.5, 12 + DWELL - 1, lat=1 + FAR) == []
+    assert _observe(tracker, 0.5, 12 + DWELL, lat=1 + FAR) == ["exit"]
+    assert _zone_of(tracker) is None
+
+
+def test_exit_event_carries_previous_zone(tracker):
+    _enter_a(tracker)
+    tracker.observe("d1", 1 + FAR, 0.5, ts=T0 + 10)
+    event = tracker.observe("d1", 1 + FAR, 0.5, ts=T0 + 10 + DWELL)[0]
+    assert event["type"] == "exit"
+    assert event["zone"] is None
+    assert event["previous_zone"]["name"] == "A"
+
+
+def test_zone_changed_between_adjacent_zones(tracker):
+    _enter_a(tracker)
+    # داخل B مباشرة بعد الحد المشترك: hysteresis لا تمنع الانتقال لمحمية أخرى
+    assert _observe(tracker, 1 + NEAR, 10) == []
+    events = tracker.observe("d1", 0.5, 1 + NEAR, ts=T0 + 10 + DWELL)
+    assert [e["type"] for e in events] == ["zone_changed"]
+    assert events[0]["zone"]["name"] == "B"
+    assert events[0]["previous_zone"]["name"] == "A"
+
+
+def test_devices_are_independent(tracker):
+    assert _observe(tracker, 0.5, 0, device="d1") == []
+    assert _observe(tracker, 1.5, 0, device="d2") == []
+    assert _observe(tracker, 0.5, DWELL, device="d1") == ["enter"]
+    assert _observe(tracker, 5, DWELL, device="d2") == []
+    assert _zone_of(tracker, "d1") == "A"
+    assert _zone_of(tracker, "d2") is None
+
+
+def test_precomputed_zone_skips_lookup(tracker, fence):
+    fence.stats["lookups"] = 0
+    zone = {"id": 2, "name": "B", "protection_level": "عالي"}
+    tracker.observe("d1", 0.5, 0.5, zone=zone, ts=T0)
+    tracker.observe("d1", 0.5, 0.5, zone=zone, ts=T0 + DWELL)
+    assert fence.stats["lookups"] == 0
+    assert _zone_of(tracker) == "B"
+
+
+def test_events_published_and_alerts_only_for_recent_fixes(tracker, alerts):
+    queue = tracker.hub.subscribe()
+    _enter_a(tracker)                            # نقاط قديمة: حدث بدون تنبيه
+    assert queue.get_nowait()["type"] == "enter"
+    assert alerts == []
+
+    now = events_module.time.time()
+    tracker.observe("d2", 0.5, 0.5, ts=now - DWELL)
+    tracker.observe("d2", 0.5, 0.5, ts=now)
+    assert queue.get_nowait()["device_id"] == "d2"
+    assert len(alerts) == 1
+    assert tracker.stats["alerts"] == 1
+
+
+# ======================================================
+# حذف الأجهزة المنتهية
+# ======================================================
+def test_stale_devices_are_pruned(tracker, monkeypatch):
+    clock = [events_module.time.time()]
+    monkeypatch.setattr(events_module.time, "time", lambda: clock[0])
+    tracker.ttl_seconds = 300
+
+    _observe(tracker, 0.5, 0, device="old")
+    clock[0] += 200
+    _observe(tracker, 0.5, 0, device="recent")
+    clock[0] += 150                                 # old: 350 ث، recent: 150 ث
+    _observe(tracker, 5, 0, device="new")
+
+    assert set(tracker.devices) == {"recent", "new"}
+    assert set(tracker.states()) == {"recent", "new"}
+    assert tracker.stats["pruned"] == 1
+
+
+def test_old_track_points_do_not_prune_their_device(tracker):
+    # مسار مرفوع متأخراً: وقت النقاط قديم، لكن الجهاز نشط الآن
+    _enter_a(tracker)
+    assert tracker.prune(force=True) == 0
+    assert _zone_of(tracker) == "A"
+
+
+def test_prune_is_rate_limited(tracker, monkeypatch):
+    clock = [events_module.time.time()]
+    monkeypatch.setattr(events_module.time, "time", lambda: clock[0])
+    tracker.ttl_seconds = 10
+    _observe(tracker, 0.5, 0, device="old")
+
+    clock[0] += events_module.PRUNE_EVERY_SECONDS - 1
+    assert tracker.prune() == 0
+    clock[0] += 1
+    assert tracker.prune() == 1
+
+
+# ======================================================
+# WebSocket /llm/geofence/events
+# ======================================================
+@pytest.fixture
+def ws_client(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from routers import chat
+
+    hub = EventHub(queue_size=10)
+    monkeypatch.setattr(chat, "event_hub", hub)
+    app = FastAPI()
+    app.include_router(chat.router)
+    return TestClient(app), hub
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = events_module.time.monotonic() + timeout
+    while events_module.time.monotonic() < deadline and not condition():
+        events_module.time.sleep(0.01)
+    return condition()
+
+
+def test_websocket_unsubscribes_on_disconnect_without_events(ws_client):
+    client, hub = ws_client
+    with client.websocket_connect("/llm/geofence/events") as ws:
+        assert ws.receive_json()["type"] == "snapshot"
+        ws.send_text("ping")                        # رسائل العميل لا تنهي الاشتراك
+        assert _wait_for(lambda: len(hub) == 1)
+
+        # قطع الاتصال والجلسة ما زالت مفتوحة (بدون إلغاء الـ handler):
+        # لم يُنشر أي حدث، ومع ذلك يُلغى الاشتراك فوراً
+        ws.close()
+        assert _wait_for(lambda: len(hub) == 0)
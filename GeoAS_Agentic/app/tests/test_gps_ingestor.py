@@ -0,0 +1,148 @@
+# test_gps_ingestor.py
+# ======================================================
+# GPSIngestor.should_save: قرار الحفظ (first / zone / heartbeat / moved / None)
+# و ingest: النقاط المحفوظة فقط تدخل الدفعة، والمحمية من PostGIS إذا لم يُحمّل الـ Geofence
+# ======================================================
+import asyncio
+
+import pytest
+
+from services import gps_ingestor as ingestor_module
+from services.gps_ingestor import GPSIngestor
+
+
+LAT, LON = 24.0, 46.0
+MIN_INTERVAL = 5
+MOVE_M = 10
+HEARTBEAT = 60
+
+# 0.0001° من خط العرض ≈ 11 m، و 0.00005° ≈ 5.5 m
+FAR_LAT = LAT + 0.0001
+NEAR_LAT = LAT + 0.00005
+
+
+@pytest.fixture
+def ingestor():
+    return GPSIngestor(min_interval=MIN_INTERVAL, move_threshold_m=MOVE_M, heartbeat=HEARTBEAT,
+                       batch_size=3, flush_seconds=10, device_id="d1")
+
+
+def _saved_at(ingestor, now=0.0, inside=False, lat=LAT, lon=LON):
+    ingestor._last_saved = (lat, lon, now, inside)
+
+
+def test_first_fix_is_saved(ingestor):
+    assert ingestor.should_save(LAT, LON, inside=False, now=0) == "first"
+
+
+@pytest.mark.parametrize("was_inside, inside", [(False, True), (True, False)])
+def test_zone_change_is_saved_immediately(ingestor, was_inside, inside):
+    _saved_at(ingestor, inside=was_inside)
+    # نفس المكان وبعد أقل من min_interval: الدخول / الخروج يكفي
+    assert ingestor.should_save(LAT, LON, inside=inside, now=0.1) == "zone"
+
+
+def test_stationary_device_saves_on_heartbeat(ingestor):
+    _saved_at(ingestor)
+    assert ingestor.should_save(LAT, LON, inside=False, now=HEARTBEAT - 1) is None
+    assert ingestor.should_save(LAT, LON, inside=False, now=HEARTBEAT) == "heartbeat"
+
+
+def test_movement_needs_distance_and_interval(ingestor):
+    _saved_at(ingestor)
+    assert ingestor.should_save(FAR_LAT, LON, inside=False, now=MIN_INTERVAL - 1) is None
+    assert ingestor.should_save(NEAR_LAT, LON, inside=False, now=MIN_INTERVAL) is None
+    assert ingestor.should_save(FAR_LAT, LON, inside=False, now=MIN_INTERVAL) == "moved"
+
+
+def test_zone_change_wins_over_heartbeat(ingestor):
+    _saved_at(ingestor, inside=False)
+    assert ingestor.should_save(FAR_LAT, LON, inside=True, now=HEARTBEAT * 2) == "zone"
+
+
+ZONE = {"id": 1, "name": "المحمية", "protection_level": "عالي"}
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    """الموقع الحالي (inside لكل قراءة) وأحداث الـ Geofence بدل الخدمات الحقيقية"""
+    calls = {"stored": [], "observed": []}
+    monkeypatch.setattr(ingestor_module.geofence_events, "observe",
+                        lambda device_id, lat, lon, zone, **kwargs: calls["observed"].append(zone) or [])
+    monkeypatch.setattr(ingestor_module.location_store, "put",
+                        lambda device_id, inside, *args, **kwargs: calls["stored"].append((inside, args)))
+    return calls
+
+
+def test_ingest_buffers_only_saved_fixes(ingestor, recorded):
+    reasons = [
+        ingestor.ingest(LAT, LON, None, now=0),
+        ingestor.ingest(FAR_LAT, LON, None, now=1),
+        ingestor.ingest(FAR_LAT, LON, ZONE, now=2),
+        ingestor.ingest(FAR_LAT, LON, ZONE, now=3),
+        ingestor.ingest(LAT, LON, ZONE, now=2 + MIN_INTERVAL),
+    ]
+
+    assert reasons == ["first", None, "zone", None, "moved"]
+    # الموقع الحالي يتحدث مع كل قراءة، والحفظ فقط عند الحاجة
+    assert [inside for inside, _ in recorded["stored"]] == [False, False, True, True, True]
+    assert [row[3] for row in ingestor._buffer] == [False, True, True]
+    assert ingestor.stats["saved"] == 3 and ingestor.stats["skipped"] == 2
+    assert ingestor.stats["zone_changes"] == 1
+    assert ingestor.due_flush(now=0)
+
+
+class FakeDB:
+    def __init__(self, zone_row=None, error=None):
+        self.zone_row = zone_row
+        self.error = error
+        self.lookups = []
+
+    def find_zone(self, lat, lon):
+        self.lookups.append((lat, lon))
+        if self.error:
+            raise self.error
+        return self.zone_row
+
+
+@pytest.fixture
+def unloaded_geofence(monkeypatch):
+    # التحميل الأول فشل (PostGIS fallback): geofence.ready = False
+    monkeypatch.setattr(ingestor_module.geofence, "_index", None)
+    monkeypatch.setattr(ingestor_module.geofence, "lookup", lambda lat, lon: pytest.fail("geofence lookup"))
+
+
+def test_unloaded_geofence_uses_postgis_zone(ingestor, recorded, unloaded_geofence):
+    db = FakeDB(zone_row=("المحمية", "عالي"))
+    assert asyncio.run(ingestor.ingest_point(db, LAT, LON)) == "first"
+
+    assert db.lookups == [(LAT, LON)]
+    assert recorded["stored"] == [(True, ("المحمية", "عالي"))]
+    assert ingestor._buffer[0][3] is True
+    # المحمية من PostGIS بدون id / حدود → لا أحداث دخول أو خروج
+    assert recorded["observed"] == []
+
+
+def test_unloaded_geofence_outside_zones(ingestor, recorded, unloaded_geofence):
+    assert asyncio.run(ingestor.ingest_point(FakeDB(), LAT, LON)) == "first"
+    assert recorded["stored"] == [(False, (None, None))]
+
+
+def test_zone_lookup_failure_skips_fix(ingestor, recorded, unloaded_geofence):
+    db = FakeDB(error=RuntimeError("db down"))
+    assert asyncio.run(ingestor.ingest_point(db, LAT, LON)) is None
+
+    assert recorded["stored"] == []
+    assert ingestor._buffer == []
+    assert ingestor.stats["zone_errors"] == 1
+
+
+def test_loaded_geofence_skips_postgis(ingestor, recorded, monkeypatch):
+    monkeypatch.setattr(ingestor_module.geofence, "_index", object())
+    monkeypatch.setattr(ingestor_module.geofence, "lookup", lambda lat, lon: ZONE)
+    db = FakeDB()
+
+    asyncio.run(ingestor.ingest_point(db, LAT, LON))
+    assert db.lookups == []
+    assert recorded["observed"] == [ZONE]
+    assert recorded["stored"][0][0] is True
@@ -0,0 +1,48 @@
+# test_lexicon.py
+# ======================================================
+# Lexicon: مطابقة بعد التوحيد، والكلمة المطابقة بكتابة النص الأصلي (source_text / first_text)
+# ======================================================
+import pytest
+
+from services.lexicon import Lexicon, normalize, normalize_spans
+
+
+LEXICON = Lexicon({
+    "reserve_name.turki": {"terms": ["الإمام تركي"], "value": "الإمام تركي"},
+    "reserve_name.abdulaziz": {"terms": ["الامام عبدالعزيز"], "value": "الامام عبدالعزيز"},
+    "intent.penalty": {"terms": ["غرامة"]},
+})
+
+
+@pytest.mark.parametrize("text", [
+    "", "  محميّة   الإمامِ تركي!! ", "ﻻ ﺇﻟﻪ", "café", "café", "هٔ", "غرامةٌ — صيد،الغزال",
+])
+def test_normalize_spans_matches_normalize(text):
+    normalized, spans = normalize_spans(text)
+    assert normalized == normalize(text)
+    assert len(spans) == len(normalized)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("محمية الامام تركي", "الامام تركي"),
+    ("محمية الإمامِ تركي", "الإمامِ تركي"),
+    ("محمية  الإمام   عبدالعزيز", "الإمام   عبدالعزيز"),
+    ("ما غرامة الصيد في محمية الإمام تركي؟", "الإمام تركي"),
+])
+def test_first_text_keeps_original_spelling(text, expected):
+    match = LEXICON.scan(text)
+    assert match.first_text("reserve_name.") == expected
+    assert match.first_value("reserve_name.") in ("الإمام تركي", "الامام عبدالعزيز")
+
+
+def test_first_text_priority_and_default():
+    # الأولوية بترتيب الفئات، لا بترتيب الظهور في النص
+    match = LEXICON.scan("الامام عبدالعزيز ثم الامام تركي")
+    assert match.first_text("reserve_name.") == "الامام تركي"
+    assert LEXICON.scan("محمية أخرى").first_text("reserve_name.", "-") == "-"
+
+
+def test_source_text_of_each_hit():
+    text = "كم غرامةُ الصيد في محمية الامام تركي"
+    match = LEXICON.scan(text)
+    assert [match.source_text(hit) for hit in match.hits] == ["غرامةُ", "الامام تركي"]
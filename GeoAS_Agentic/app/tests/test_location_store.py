@@ -0,0 +1,184 @@
+# test_location_store.py
+# ======================================================
+# LocationStore: put / get من الذاكرة فقط، والقرص (SQLite) من thread الخلفية
+# (write-behind + قراءة تحديثات workers الأخرى)
+# ======================================================
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from services.location_store import LocationStore
+
+
+REFRESH = 0.05
+
+
+class RecordingConnection:
+    """نفس اتصال SQLite مع تسجيل الـ thread الذي يستخدمه"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.threads = set()
+
+    def __getattr__(self, name):
+        self.threads.add(threading.current_thread().name)
+        return getattr(self.conn, name)
+
+
+def _store(path, refresh_seconds=REFRESH):
+    return LocationStore(shards=4, ttl_seconds=300, refresh_seconds=refresh_seconds, persist_path=path)
+
+
+def _entry(inside, age_seconds):
+    updated = time.time() - age_seconds
+    return {"inside": inside, "zone_name": None, "protection_level": None,
+            "timestamp": datetime.utcfromtimestamp(updated), "updated": updated}
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def path(tmp_path):
+    return tmp_path / "locations.sqlite3"
+
+
+@pytest.fixture
+def stores():
+    opened = []
+    yield opened
+    for store in opened:
+        store.close()
+
+
+def test_memory_only_store():
+    store = LocationStore(shards=4, ttl_seconds=300, persist_path=None)
+    store.put("d1", True, "المحمية", "عالي")
+    assert store.get("d1")["zone_name"] == "المحمية"
+    assert store.get("d2") is None
+    store.close()
+    assert store.snapshot()["persistent"] is False
+
+
+def test_put_and_get_never_touch_sqlite_on_caller_thread(path, stores):
+    store = _store(path)
+    stores.append(store)
+    recorder = RecordingConnection(store._db)
+    store._db = recorder
+
+    for i in range(50):
+        store.put("d1", i % 2 == 0, timestamp=datetime(2026, 1, 1, 10, 0, i))
+        assert store.get("d1") is not None
+
+    assert _wait_for(lambda: store.stats["disk_writes"] >= 1 and not store._dirty)
+    time.sleep(REFRESH * 3)   # قراءة دورية واحدة على الأقل من القرص
+    assert recorder.threads == {"location-store"}
+
+
+def test_locations_survive_restart(path, stores):
+    store = _store(path)
+    for i in range(20):
+        store.put("d1", False, timestamp=datetime(2026, 1, 1, 10, 0, i))
+    store.put("d1", True, "المحمية", "عالي", timestamp=datetime(2026, 1, 1, 11))
+    store.put("d2", False)
+    store.close()   # يكتب ما تبقى قبل الإغلاق
+
+    restarted = _store(path)
+    stores.append(restarted)
+    entry = restarted.get("d1")
+    assert entry["inside"] is True
+    assert entry["zone_name"] == "المحمية"
+    assert entry["timestamp"] == datetime(2026, 1, 1, 11)
+    assert restarted.get("d2")["inside"] is False
+
+
+def test_other_worker_updates_are_picked_up(path, stores):
+    writer, reader = _store(path), _store(path)
+    stores.extend([writer, reader])
+    assert reader.get("d1") is None
+
+    writer.put("d1", True, "المحمية", "عالي")
+    assert _wait_for(lambda: reader.get("d1") is not None)
+    assert reader.get("d1")["zone_name"] == "المحمية"
+
+    writer.put("d1", False)
+    assert _wait_for(lambda: reader.get("d1")["inside"] is False)
+
+
+def test_row_written_late_with_older_stamp_is_not_missed(path, stores):
+    # الـ sync الدوري بعيد: الكتابة والقراءة يدوياً بترتيب محدد
+    a, b = _store(path, refresh_seconds=60), _store(path, refresh_seconds=60)
+    stores.extend([a, b])
+
+    stamped_first = _entry(True, age_seconds=2)     # put في A قبل B ...
+    b._db_flush({"dev-b": _entry(False, age_seconds=1)})
+    b._db_sync()                                    # B يقرأ صفه (الأحدث updated)
+    a._db_flush({"dev-a": stamped_first})           # ... لكن وصل القرص بعده
+    b._db_sync()
+
+    assert b.get("dev-a") is not None
+    assert b.get("dev-a")["inside"] is True
+
+
+def test_seq_survives_expired_rows(path, stores):
+    # حذف الصفوف المنتهية عند الفتح لا يعيد أرقام seq مستخدمة
+    a = _store(path, refresh_seconds=60)
+    a._db_flush({"old": _entry(False, age_seconds=1000), "dev": _entry(False, age_seconds=1)})
+    a.close()
+
+    b, c = _store(path, refresh_seconds=60), _store(path, refresh_seconds=60)
+    stores.extend([b, c])
+    b._db_flush({"new": _entry(True, age_seconds=0)})
+    c._db_sync()
+    assert c.get("new") is not None
+
+
+def test_store_file_from_previous_version(path, stores):
+    conn = sqlite3.connect(str(path))
+    conn.execute("CREATE TABLE locations (device_id TEXT PRIMARY KEY, inside INTEGER, zone_name TEXT, "
+                 "protection_level TEXT, timestamp TEXT, updated REAL)")
+    conn.execute("INSERT INTO locations VALUES ('d1', 1, 'المحمية', 'عالي', ?, ?)",
+                 (datetime.utcnow().isoformat(), time.time()))
+    conn.commit()
+    conn.close()
+
+    store = _store(path)
+    stores.append(store)
+    assert store.get("d1")["zone_name"] == "المحمية"
+    store.put("d2", False)
+    assert _wait_for(lambda: store.stats["disk_writes"] == 1)
+
+
+def test_newer_local_location_wins_over_older_disk_row(path, stores):
+    writer, reader = _store(path), _store(path)
+    stores.extend([writer, reader])
+
+    writer.put("d1", True, "قديم")
+    reader.put("d1", False)                     # أحدث (updated أكبر)
+    time.sleep(REFRESH * 4)
+    assert reader.get("d1")["inside"] is False
+
+
+def test_expired_location_is_unknown():
+    store = LocationStore(shards=4, ttl_seconds=0.05, persist_path=None)
+    store.put("d1", True)
+    time.sleep(0.1)
+    assert store.get("d1") is None
+    assert store.stats["expired"] == 1
+
+
+def test_newer_only_keeps_newer_fix():
+    store = LocationStore(shards=4, persist_path=None)
+    store.put("d1", True, timestamp=datetime(2026, 1, 1, 12))
+    kept = store.put("d1", False, timestamp=datetime(2026, 1, 1, 9), newer_only=True)
+    assert kept["inside"] is True
+    assert store.get("d1")["timestamp"].hour == 12
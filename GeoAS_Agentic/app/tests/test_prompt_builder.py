@@ -0,0 +1,60 @@
+# test_prompt_builder.py
+# ======================================================
+# الـ tokenizer: يُحمّل في warmup فقط (ملف محلي أولاً)، والطلب لا ينتظر الشبكة أبداً
+# ======================================================
+import sys
+
+import pytest
+
+from services import prompt_builder, warmup
+from services.readiness import Readiness
+
+
+@pytest.fixture
+def no_tokenizer(monkeypatch):
+    monkeypatch.setattr(prompt_builder, "_tokenizer", None)
+    # أي محاولة استيراد / تحميل أثناء الطلب تفشل فوراً
+    monkeypatch.setitem(sys.modules, "tokenizers", None)
+
+
+@pytest.fixture
+def states(monkeypatch):
+    readiness = Readiness()
+    monkeypatch.setattr(warmup, "readiness", readiness)
+    return readiness
+
+
+def test_request_before_warmup_uses_estimate(no_tokenizer):
+    text = "ما غرامة صيد الغزال في المحمية؟"
+    assert prompt_builder.get_tokenizer() is None
+    assert prompt_builder.count_tokens(text) == int(len(text) / prompt_builder.CHARS_PER_TOKEN) + 1
+    assert prompt_builder.trim_to_tokens(text, 100) == text
+
+
+def test_warmup_failure_is_reported_not_raised(no_tokenizer, states):
+    warmup._warm_tokenizer()
+    component = states.snapshot()["components"]["tokenizer"]
+    assert component["status"] == "failed"
+    assert "تقدير تقريبي" in component["detail"]
+    assert prompt_builder.get_tokenizer() is None
+
+
+def test_tokenizer_loaded_from_local_file(tmp_path, monkeypatch, states):
+    tokenizers = pytest.importorskip("tokenizers")
+    from tokenizers.models import WordLevel
+    from tokenizers.pre_tokenizers import Whitespace
+
+    tokenizer = tokenizers.Tokenizer(WordLevel({"غرامة": 0, "صيد": 1, "[UNK]": 2}, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = Whitespace()
+    path = tmp_path / "tokenizer.json"
+    tokenizer.save(str(path))
+
+    monkeypatch.setattr(prompt_builder, "_tokenizer", None)
+    monkeypatch.setattr(prompt_builder, "LLM_TOKENIZER_PATH", path)
+    monkeypatch.setattr(prompt_builder, "LLM_TOKENIZER", "no/such-model")
+
+    warmup._warm_tokenizer()
+    assert states.snapshot()["components"]["tokenizer"] == {
+        "status": "ready", "detail": str(path), "load_seconds": pytest.approx(0, abs=5),
+    }
+    assert prompt_builder.count_tokens("غرامة صيد") == 2
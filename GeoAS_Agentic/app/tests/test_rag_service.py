@@ -0,0 +1,50 @@
+# test_rag_service.py
+# ======================================================
+# _finalize: الـ Guard وكاش الإجابات بعد التوليد
+# ======================================================
+import pytest
+
+from services import rag_service
+from services.answer_cache import AnswerCache
+from services.llm_service import LLM_BUSY_MESSAGE, LLM_ERROR_MESSAGE, LLM_UNAVAILABLE_MESSAGE
+
+
+SCOPE = ("protected_areas_rules", "penalty", "high", "v1")
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = AnswerCache(persist_path=None, embed_query=lambda text: None)
+    monkeypatch.setattr(rag_service, "answer_cache", cache)
+    return cache
+
+
+def _plan(intent="penalty"):
+    return {"context": "--- [الفقرة 1] ---\nالمخالفة: صيد غزال", "scope": SCOPE, "intent": intent}
+
+
+@pytest.mark.parametrize("failure", [LLM_BUSY_MESSAGE, LLM_ERROR_MESSAGE, LLM_UNAVAILABLE_MESSAGE])
+def test_llm_failure_on_penalty_question_is_not_rewritten_or_cached(cache, failure):
+    query = "كم غرامة صيد الغزال؟"
+    response, _ = rag_service._finalize(query, _plan(), failure)
+
+    assert response == failure
+    assert len(cache) == 0
+    assert cache.get(query, SCOPE) is None
+
+
+def test_penalty_answer_without_fine_is_replaced_and_cached(cache):
+    query = "كم غرامة صيد الغزال؟"
+    response, _ = rag_service._finalize(query, _plan(), "لا أعرف")
+
+    assert response == "لا توجد مخالفة مطابقة في المرجع المتاح."
+    assert cache.get(query, SCOPE)[0] == response
+
+
+def test_valid_penalty_answer_is_cached(cache):
+    query = "كم غرامة صيد الغزال؟"
+    answer = "المخالفة: صيد غزال\nالغرامة: خمسة وثلاثون ألفًا ريال سعودي عن كل كائن"
+    response, _ = rag_service._finalize(query, _plan(), answer)
+
+    assert response == answer
+    assert cache.get(query, SCOPE)[0] == answer
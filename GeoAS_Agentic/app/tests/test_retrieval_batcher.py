@@ -0,0 +1,59 @@
+# test_retrieval_batcher.py
+# ======================================================
+# متجه السؤال يُحسب مرة واحدة: الاسترجاع ثم كاش الإجابات (embed) يشتركان فيه
+# ======================================================
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from services.retrieval_batcher import RetrievalBatcher
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = []
+
+    def _vector(self, text):
+        rng = np.random.default_rng(sum(map(ord, text)))
+        return rng.random(8).tolist()
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        self.calls.append([text])
+        return self._vector(text)
+
+
+@pytest.fixture
+def store():
+    embeddings = CountingEmbeddings()
+    vs = FAISS.from_texts(["صيد غزال", "رعي داخل المحمية", "التخييم بدون تصريح"], embeddings)
+    embeddings.calls.clear()
+    return vs, embeddings
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_embed_reuses_the_retrieval_vector(store, enabled):
+    vs, embeddings = store
+    batcher = RetrievalBatcher(window_ms=1, max_batch=8, enabled=enabled)
+
+    found = batcher.search(vs, "كم غرامة صيد الغزال؟", k=2)
+    vector = batcher.embed(embeddings, "كم غرامة صيد الغزال؟")
+
+    assert len(found) == 2
+    assert embeddings.calls == [["كم غرامة صيد الغزال؟"]]
+    np.testing.assert_allclose(vector, embeddings._vector("كم غرامة صيد الغزال؟"), rtol=1e-6)
+
+
+def test_embed_without_retrieval_is_batched(store):
+    vs, embeddings = store
+    batcher = RetrievalBatcher(window_ms=1, max_batch=8)
+
+    vector = batcher.embed(embeddings, "سؤال جديد")
+
+    assert vector.shape == (8,)
+    assert batcher.stats["batches"] == 1
+    assert embeddings.calls == [["سؤال جديد"]]
@@ -0,0 +1,42 @@
+# test_structured_output.py
+# ======================================================
+# system_prompt: صيغة إجابة إلزامية واحدة فقط في رسالة system
+# ======================================================
+import pytest
+
+from services import structured_output
+from services.rag_service import PROMPT_TEMPLATE, TEXT_FORMAT
+
+
+RULES = "protected_areas_rules"
+
+
+def _prompt(intent):
+    return structured_output.system_prompt(PROMPT_TEMPLATE[RULES], intent, TEXT_FORMAT[RULES])
+
+
+def test_structured_penalty_prompt_has_json_format_only(monkeypatch):
+    monkeypatch.setattr(structured_output, "LLM_STRUCTURED_OUTPUT", True)
+    prompt = _prompt("penalty")
+
+    assert "أجب بصيغة JSON فقط" in prompt
+    assert "صيغة الإجابة (إلزامية)" not in prompt
+    assert "المخالفة: (كما وردت في المرجع)" not in prompt
+    assert "اكتب فقط" not in prompt
+
+
+@pytest.mark.parametrize("structured, intent", [(False, "penalty"), (True, "general")])
+def test_free_text_prompt_keeps_text_format(monkeypatch, structured, intent):
+    monkeypatch.setattr(structured_output, "LLM_STRUCTURED_OUTPUT", structured)
+    prompt = _prompt(intent)
+
+    assert "JSON" not in prompt
+    assert prompt.endswith(TEXT_FORMAT[RULES])
+    assert "صيغة الإجابة (إلزامية)" in prompt
+
+
+def test_prompt_without_text_format_is_unchanged(monkeypatch):
+    monkeypatch.setattr(structured_output, "LLM_STRUCTURED_OUTPUT", False)
+    system = PROMPT_TEMPLATE["مشروع اللائحة التنفيذية للمناطق المحمية"]
+
+    assert structured_output.system_prompt(system, "general") == system
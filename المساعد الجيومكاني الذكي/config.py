@@ -33,6 +33,11 @@ DB_CONFIG = {
 
 
 EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+EMBEDDING_CACHE_DIR = VECTORSTORE_DIR / "embedding_cache"
+EMBEDDING_CACHE_MAX_ENTRIES = 50000
+
+
+LEXICON_PATH = BASE_DIR / "lexicon.json"
 
 
 VOSK_MODEL_PATH = str(MODELS_DIR / "vosk" / "vosk-model-ar-mgb2-0.4")
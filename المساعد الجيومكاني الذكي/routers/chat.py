@@ -8,6 +8,7 @@ import logging
 from services.audio_utils import speak_text
 from services.rag_service import answer
 from services.retriever_service import retrievers
+from services.lexicon import lexicon
 
 
 router = APIRouter(prefix="/llm")
@@ -96,14 +97,11 @@ async def voice_interaction(
         logging.error(f"خطأ في جلب السياق الجغرافي: {e}")
 
     
-    stat_keywords = ["كم عدد", "إحصائية", "أكثر مخالفة", "غرامات", "أرقام", "مخالفات", "تقرير", "بيانات"]
+    # مرور واحد على السؤال: نية الإحصائيات + اسم المحمية (lexicon.json)
+    match = lexicon.scan(query)
     
-    
-    if any(k in query for k in stat_keywords):
-        target_keyword = None
-        
-        for name in ["تركي", "عبدالعزيز", "خالد", "التنهات", "النبقية"]:
-            if name in query: target_keyword = name; break
+    if match.has("intent.stats"):
+        target_keyword = match.first_value("query_reserve.")
         
        
         if not target_keyword and current_area_context:
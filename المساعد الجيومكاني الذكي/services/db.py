@@ -2,6 +2,8 @@ import psycopg2
 import logging
 from datetime import datetime
 
+from services.lexicon import lexicon
+
 class Database:
     def __init__(self, db_config):
         try:
@@ -76,9 +78,10 @@ class Database:
         
         if not name: return ""
         
-        keywords = ["الإمام تركي", "الملك عبدالعزيز", "الملك خالد", "التنهات", "الامام عبدالعزيز"]
-        for k in keywords:
-            if k in name: return k
+        # الاسم المختصر يُستخدم في ILIKE على بيانات المخالفات (الهمزة تفرق هناك):
+        # الكلمة المفتاحية بنفس كتابتها في الاسم، لا بكتابة lexicon.json
+        keyword = lexicon.scan(name).first_text("reserve_name.")
+        if keyword: return keyword
         return name.replace("محمية", "").strip()
 
     def save_point(self, lat, lon, region_name):
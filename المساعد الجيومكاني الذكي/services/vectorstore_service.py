@@ -5,14 +5,18 @@ from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
-from config import VECTORSTORE_DIR, EMBEDDING_MODEL
+from config import VECTORSTORE_DIR, EMBEDDING_MODEL, EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_MAX_ENTRIES
+from services.embedding_cache import EmbeddingCache, CachedEmbeddings
 
 logging.basicConfig(level=logging.INFO)
 
 class VectorStoreService:
     def __init__(self):
         
-        self.embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+        self.embeddings = CachedEmbeddings(
+            HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL),
+            EmbeddingCache(EMBEDDING_CACHE_DIR, EMBEDDING_MODEL, max_entries=EMBEDDING_CACHE_MAX_ENTRIES)
+        )
         self.loaded_vectorstores = {}
 
     def _safe_name(self, name: str) -> str:
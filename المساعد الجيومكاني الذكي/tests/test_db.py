@@ -0,0 +1,36 @@
+# test_db.py
+# ======================================================
+# _simplify_name: الاسم المختصر يدخل في ILIKE على بيانات المخالفات
+# فلا بد أن يبقى بنفس كتابة الاسم الأصلي (الإمام ≠ الامام هناك)
+# ======================================================
+import pytest
+
+from services.db import Database
+
+
+@pytest.fixture
+def db():
+    # بدون اتصال بقاعدة البيانات: _simplify_name لا تحتاجه
+    return Database.__new__(Database)
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("محمية الإمام تركي بن عبدالله الملكية", "الإمام تركي"),
+    ("محمية الامام عبدالعزيز بن محمد الملكية", "الامام عبدالعزيز"),
+    ("محمية الملك عبدالعزيز الملكية", "الملك عبدالعزيز"),
+    ("محمية الملك خالد الملكية", "الملك خالد"),
+    ("محمية التنهات الملكية", "التنهات"),
+    # الكتابة الأخرى للهمزة: تُطابق في lexicon، وترجع بكتابة الاسم نفسه
+    ("محمية الامام تركي بن عبدالله الملكية", "الامام تركي"),
+    ("محمية الإمام عبدالعزيز بن محمد الملكية", "الإمام عبدالعزيز"),
+    ("محمية الإمامِ تركي", "الإمامِ تركي"),
+    # بدون كلمة مفتاحية → الاسم بدون كلمة "محمية"
+    ("محمية عروق بني معارض", "عروق بني معارض"),
+])
+def test_simplify_name_keeps_spelling(db, name, expected):
+    assert db._simplify_name(name) == expected
+
+
+def test_simplify_name_empty(db):
+    assert db._simplify_name("") == ""
+    assert db._simplify_name(None) == ""
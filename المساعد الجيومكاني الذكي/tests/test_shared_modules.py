@@ -0,0 +1,24 @@
+# test_shared_modules.py
+# ======================================================
+# وحدات منسوخة من GeoAS_Agentic/app/services: يجب أن تبقى مطابقة حرفياً
+# (تعديل نسخة واحدة فقط = سلوك مختلف بين التطبيقين)
+# ======================================================
+from pathlib import Path
+
+import pytest
+
+
+APP_DIR = Path(__file__).resolve().parents[1]
+GEOAS_DIR = APP_DIR.parent / "GeoAS_Agentic" / "app"
+
+SHARED_MODULES = [
+    "services/embedding_cache.py",
+    "services/lexicon.py",
+]
+
+
+@pytest.mark.parametrize("module", SHARED_MODULES)
+def test_shared_module_is_identical(module):
+    ours = (APP_DIR / module).read_bytes()
+    theirs = (GEOAS_DIR / module).read_bytes()
+    assert ours == theirs, f"{module} يختلف عن نسخة GeoAS_Agentic/app، انسخ التعديل للنسختين"